@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared address normalization
+One set of precompiled rules for unit/suite removal, street-type and
+directional canonicalization and ZIP extraction, used by the Google
+address cleanup, the HUD, the Address Match window and the parcel index.
+Results are LRU-cached per address string, so the same listing address
+seen again (and again) is parsed once.
+
+    normalize("The Maverick, 4225 11th Avenue NE Apt 2B, Seattle, WA 98105, USA")
+    -> street '4225 11th Avenue NE', unit '2B', city 'SEATTLE', state 'WA',
+       zip '98105', key '4225 11TH AVE NE'
+"""
+
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+ADDRESS_CACHE_SIZE = int(os.getenv("ADDRESS_CACHE_SIZE", "65536"))
+
+_SUFFIXES = {
+    "STREET": "ST", "STR": "ST", "AVENUE": "AVE", "AV": "AVE", "ROAD": "RD", "DRIVE": "DR",
+    "BOULEVARD": "BLVD", "PLACE": "PL", "COURT": "CT", "LANE": "LN", "TERRACE": "TER",
+    "PARKWAY": "PKWY", "HIGHWAY": "HWY", "CIRCLE": "CIR", "SQUARE": "SQ", "TRAIL": "TRL",
+    "WAY": "WAY", "LOOP": "LOOP",
+}
+_DIRECTIONS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+_ORDINALS = {
+    "FIRST": "1ST", "SECOND": "2ND", "THIRD": "3RD", "FOURTH": "4TH", "FIFTH": "5TH",
+    "SIXTH": "6TH", "SEVENTH": "7TH", "EIGHTH": "8TH", "NINTH": "9TH", "TENTH": "10TH",
+}
+_WORDS = {**_SUFFIXES, **_DIRECTIONS, **_ORDINALS}
+# Words after which a trailing bare number is a unit ("123 Main St 334"), not part of the street
+_UNIT_AFTER = (set(_SUFFIXES.values()) | set(_DIRECTIONS.values())) - {"HWY"}
+
+_UNIT_WORDS = r"(?:APT|APARTMENT|UNIT|STE|SUITE|BLDG|BUILDING|FLOOR|FL|RM|ROOM|SPC|SPACE)"
+# "#34", "Apt. 4B", "Unit #12", "Suite A-1"; the \b keeps "STEWART" and "FLORENCE" intact
+_UNIT_RE = re.compile(rf"(?:\s*#\s*|\s+{_UNIT_WORDS}\b\.?\s*#?\s*)([\w-]+)", re.I)
+_UNIT_PART_RE = re.compile(rf"^(?:#\s*|{_UNIT_WORDS}\b\.?\s*#?\s*)([\w-]+)$", re.I)
+# "123 Main St 334" / "123 Main St - 00A" / "123 Main St A101"
+_TRAILING_UNIT_RE = re.compile(r"\s+(?:-\s*)?([A-Z]?\d{1,4}[A-Z]?)$", re.I)
+_STATE_ZIP_RE = re.compile(r"^([A-Z]{2})(?:\s+(\d{5})(?:-\d{4})?)?$")
+_ZIP_RE = re.compile(r"^(\d{5})(?:-\d{4})?$")
+_SPACES_RE = re.compile(r"\s+")
+_NON_WORD_RE = re.compile(r"\W")
+
+NormalizedAddress = namedtuple("NormalizedAddress", "name street unit tail city state zip key")
+_EMPTY = NormalizedAddress(None, "", None, (), None, None, None, "")
+
+
+def _is_unit(m) -> bool:
+    """A unit word only starts a unit after a house number and street name, and not
+    when what follows it is the street type ('12 Floor St', '1 Fl Way')"""
+    if m.group(0).lstrip().startswith("#"):
+        return True
+    token = m.group(1).upper()
+    return len(m.string[:m.start()].split()) >= 2 and _WORDS.get(token, token) not in _UNIT_AFTER
+
+
+def _strip_street_unit(street: str):
+    """'4225 11th Ave NE Apt 2B' -> ('4225 11th Ave NE', '2B')"""
+    unit = None
+    units = [m for m in _UNIT_RE.finditer(street) if _is_unit(m)]
+    if units:
+        unit = units[0].group(1)
+        street = _UNIT_RE.sub(lambda m: "" if _is_unit(m) else m.group(0), street)
+    m = _TRAILING_UNIT_RE.search(street)
+    if m and len(street[:m.start()].split()) >= 3:
+        before = street[:m.start()].split()[-1].upper().rstrip(".")
+        if _WORDS.get(before, before) in _UNIT_AFTER:
+            unit = unit or m.group(1)
+            street = street[:m.start()]
+    return _SPACES_RE.sub(" ", street).strip(" -"), unit
+
+
+def _canonical(street: str) -> str:
+    words = street.upper().replace(".", " ").split()
+    return " ".join(_WORDS.get(w, w) for w in words)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def normalize(address: Optional[str]) -> NormalizedAddress:
+    """Split an address into building name, street (without unit), unit, city/state/ZIP and a match key"""
+    parts = [p.strip() for p in str(address or "").split(",") if p.strip()]
+    if not parts:
+        return _EMPTY
+    # "Building Name, 123 Main St, ..." -> the first part that starts with a house number
+    idx = next((i for i, p in enumerate(parts) if p[0].isdigit()), 0)
+    name = ", ".join(parts[:idx]) or None
+    street, unit = _strip_street_unit(" " + parts[idx])
+    tail = []
+    for part in parts[idx + 1:]:
+        m = _UNIT_PART_RE.match(part)
+        if m:
+            # ", Apt 302" / ", #5" on its own
+            unit = unit or m.group(1)
+        else:
+            tail.append(part)
+
+    city = state = zip_code = None
+    rest = [p.upper() for p in tail]
+    if rest and rest[-1] in ("USA", "US", "UNITED STATES"):
+        rest = rest[:-1]
+    if rest and _ZIP_RE.match(rest[-1]):
+        zip_code = _ZIP_RE.match(rest.pop()).group(1)
+    m = _STATE_ZIP_RE.match(rest[-1]) if rest else None
+    if m:
+        state, zip_code = m.group(1), m.group(2) or zip_code
+        rest.pop()
+        city = rest[-1] if rest else None
+    return NormalizedAddress(name, street, unit, tuple(tail), city, state, zip_code, _canonical(street))
+
+
+def address_key(address: str) -> str:
+    """Street part of an address, normalized for matching ('4225 11th Avenue Northeast #3' -> '4225 11TH AVE NE')"""
+    return normalize(address).key
+
+
+def address_city(address: str) -> Optional[str]:
+    """City from a Google formatted address ('..., Seattle, WA 98105, USA' -> 'SEATTLE')"""
+    return normalize(address).city
+
+
+def extract_zip(address: str) -> Optional[str]:
+    """'..., Seattle, WA 98105-1234, USA' -> '98105'"""
+    return normalize(address).zip
+
+
+def strip_unit(address: str, drop_name: bool = False) -> str:
+    """Address without its unit, keeping city/state ('123 Main St #4, Seattle, WA' -> '123 Main St, Seattle, WA').
+    drop_name also removes a building name in front of the street."""
+    if not address:
+        return address
+    n = normalize(address)
+    parts = ([] if drop_name or not n.name else [n.name]) + [n.street] + list(n.tail)
+    return ", ".join(p for p in parts if p)
+
+
+def match_key(address: str) -> str:
+    """Canonical street + city/state/ZIP as lowercase letters and digits, for similarity scores"""
+    n = normalize(address)
+    return _NON_WORD_RE.sub("", " ".join(filter(None, (n.key, n.city, n.state, n.zip))).lower())
+
+
+def normalize_many(addresses: Iterable[Optional[str]]) -> List[NormalizedAddress]:
+    """normalize() over a list; repeated addresses are parsed once"""
+    return [normalize(a) for a in addresses]
+
+
+def strip_units(addresses: Iterable[str], drop_name: bool = False) -> List[str]:
+    return [strip_unit(a, drop_name) for a in addresses]
@@ -4,31 +4,12 @@ This will strip apartment/unit numbers from addresses already in the database
 """
 
 import mysql.connector
-import re
+
+from address_normalize import strip_unit
 
 def strip_unit_from_address(address):
     """Remove unit numbers from address"""
-    if not address:
-        return address
-    
-    # Remove patterns like: #34, Unit 123, Apt A, Suite X, space+digits at end, etc.
-    patterns = [
-        r'\s+\d{1,4}(?:A|B|C|D)?,\s+',  # " 334, " or " 101, " before city
-        r'\s+-\s*\d+[A-Za-z]?,\s+',  # " - 00A, " before city
-        r'\s*#\d+.*$',  # #34 at end
-        r'\s*Unit\s+[A-Za-z0-9]+.*$',  # Unit 123
-        r'\s*Apt\.?\s+[A-Za-z0-9]+.*$',  # Apt A or Apt. A
-        r'\s*Suite\s+[A-Za-z0-9]+.*$',  # Suite X
-        r'\s*Ste\.?\s+[A-Za-z0-9]+.*$',  # Ste X
-        r',\s*Apt\.?\s+[A-Za-z0-9]+',  # , Apt 302
-        r'\s+[A-Za-z]?\d{2,4}[A-Za-z]?$',  # Space followed by 2-4 digits at very end
-    ]
-    
-    cleaned = address
-    for pattern in patterns:
-        cleaned = re.sub(pattern, ', ' if ', ' in pattern else '', cleaned, flags=re.IGNORECASE)
-    
-    return cleaned.strip()
+    return strip_unit(address)
 
 
 def main():
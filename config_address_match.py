@@ -11,6 +11,7 @@ from mimetypes import guess_extension
 from urllib.parse import urlparse
 import traceback as tb
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Third-party deps
 import requests
@@ -22,7 +23,18 @@ import paramiko
 # Address Match window
 
 from config_core import *
+from config_auth import CFG
+from rate_limiter import TokenBucket
 
+# Global dictionary to store address match completion callbacks
+ADDRESS_MATCH_CALLBACKS = {}
+
+# Auto Update: rows looked up in parallel, and find_or_create_place.php calls per minute (Google Places quota)
+ADDRESS_MATCH_CONCURRENCY = max(1, int(os.getenv("ADDRESS_MATCH_CONCURRENCY", "4")))
+ADDRESS_MATCH_RATE_PER_MIN = float(os.getenv("ADDRESS_MATCH_RATE_PER_MIN", "60"))
+
+
+def show_address_match_window(job_id, parent, manual_open=False):
     """Show a compact window with all addresses from the JSON for address matching."""
     from tkinter import messagebox
     import json
@@ -34,13 +46,14 @@ from config_core import *
         return
     
     # Create a shared DB connection helper to avoid creating connections for every query
-    _db_pool = {"conn": None}
+    _db_pool = {"conns": {}}
     
     def get_db_connection():
-        """Get or create a shared DB connection for this window session."""
-        if _db_pool["conn"] is None or not _db_pool["conn"].is_connected():
+        """Get or create this thread's DB connection for this window session (Auto Update runs rows in parallel)."""
+        conn = _db_pool["conns"].get(threading.get_ident())
+        if conn is None or not conn.is_connected():
             try:
-                _db_pool["conn"] = mysql.connector.connect(
+                conn = _db_pool["conns"][threading.get_ident()] = mysql.connector.connect(
                     host=CFG["MYSQL_HOST"],
                     user=CFG["MYSQL_USER"],
                     password=CFG["MYSQL_PASSWORD"],
@@ -53,16 +66,16 @@ from config_core import *
             except Exception as e:
                 log_to_file(f"[Address Match] DB connection failed: {e}")
                 return None
-        return _db_pool["conn"]
+        return conn
     
     def close_db_connection():
-        """Close the shared DB connection when window closes."""
-        if _db_pool["conn"] is not None:
+        """Close the DB connections when window closes."""
+        for conn in list(_db_pool["conns"].values()):
             try:
-                _db_pool["conn"].close()
+                conn.close()
             except Exception:
                 pass
-            _db_pool["conn"] = None
+        _db_pool["conns"].clear()
     
     # Find JSON file for this job
     date_str = datetime.now().strftime("%Y-%m-%d")
@@ -1164,8 +1177,9 @@ from config_core import *
                                 google_address = listing.get("google_address", "")
                                 if google_address and ga_formatted:
                                     import difflib
-                                    norm_input = re.sub(r'\W', '', google_address.lower())
-                                    norm_candidate = re.sub(r'\W', '', ga_formatted.lower())
+                                    from address_normalize import match_key
+                                    norm_input = match_key(google_address)
+                                    norm_candidate = match_key(ga_formatted)
                                     match_ratio = difflib.SequenceMatcher(None, norm_input, norm_candidate).ratio()
                                     prefilled_match_score = f"{int(match_ratio * 100)}%"
                                 
@@ -1551,7 +1565,12 @@ from config_core import *
     tree.bind("<Button-3>", on_row_right_click)
     
     # Auto-update state
-    auto_update_running = {"active": False, "current_index": 0}
+    auto_update_running = {"active": False, "current_index": 0, "in_flight": 0, "done": 0, "total": 0,
+                           "started": 0.0, "run_id": 0, "stop": threading.Event(), "pool": None,
+                           "draining": False}
+    # Worker completions, applied on the Tk thread by drain_auto_update_events()
+    auto_update_events = queue.Queue()
+    auto_update_bucket = TokenBucket(ADDRESS_MATCH_RATE_PER_MIN, burst=ADDRESS_MATCH_CONCURRENCY)
     
     def update_job_status_to_done():
         """Update the queue_websites job status to 'done' when all address matches are completed."""
@@ -1576,125 +1595,168 @@ from config_core import *
             log_to_file(f"[Address Match] Error updating job status to done: {e}")
             print(f"[Address Match] Error updating job status: {e}")
     
+    def _auto_update_eligible(row_id):
+        """Rows Auto Update should look up: not finished, have an Apt ID and no PreGAID."""
+        try:
+            status_val = tree.set(row_id, "✓")  # safer than index
+        except Exception:
+            status_val = ""
+        try:
+            preloaded_ga_val = tree.set(row_id, "PreGAID")
+        except Exception:
+            preloaded_ga_val = ""
+        try:
+            apt_id_val = tree.set(row_id, "Apt ID")
+        except Exception:
+            apt_id_val = ""
+        return (status_val not in ("✓", "X", "❌", "⏳")
+                and apt_id_val not in ("", "-")
+                and preloaded_ga_val in ("", "-"))
+
+    def _auto_update_row(run_id, stop_event, row_id, google_address, preloaded_ga_id):
+        """Worker: wait for a rate-limit token, look the row up, report back through the UI queue."""
+        try:
+            if auto_update_bucket.acquire(cancel_event=stop_event):
+                run_for_address(row_id, google_address, preloaded_ga_id)
+            else:
+                # Stopped before its turn: leave it for the next run
+                tree.set(row_id, "✓", "▶")
+        except Exception as e:
+            log_to_file(f"[Address Match] Auto-update worker error: {e}")
+        finally:
+            auto_update_events.put(run_id)
+
+    def _stop_auto_update_workers():
+        auto_update_running["active"] = False
+        auto_update_running["stop"].set()
+        pool = auto_update_running["pool"]
+        auto_update_running["pool"] = None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def update_auto_update_status():
+        """Progress line next to the Auto Update checkbox: done/total, rows in flight, elapsed and ETA."""
+        state = auto_update_running
+        try:
+            if not state["active"] and not state["in_flight"]:
+                auto_update_status_var.set("")
+                return
+            elapsed = time.time() - state["started"]
+            done, total = state["done"], max(state["total"], state["done"])
+            eta = (elapsed / done) * (total - done) if done else 0
+            auto_update_status_var.set(
+                f"{done}/{total} • {state['in_flight']} running • elapsed {_fmt_secs(elapsed)}"
+                + (f" • ETA {_fmt_secs(eta)}" if done else ""))
+        except Exception:
+            pass
+
+    def drain_auto_update_events():
+        """Tk thread: apply worker completions, refill free worker slots and refresh the ETA."""
+        auto_update_running["draining"] = False
+        while True:
+            try:
+                run_id = auto_update_events.get_nowait()
+            except queue.Empty:
+                break
+            # Completions from a stopped run don't count towards the current one
+            if run_id == auto_update_running["run_id"]:
+                auto_update_running["in_flight"] -= 1
+                auto_update_running["done"] += 1
+        if auto_update_running["active"]:
+            process_next_row()
+        update_auto_update_status()
+        if auto_update_running["active"] or auto_update_running["in_flight"]:
+            try:
+                window.after(200, drain_auto_update_events)
+                auto_update_running["draining"] = True
+            except Exception:
+                pass
+
     def process_next_row():
-        """Process the next eligible row in auto-update mode (skip rows with PreGAID and rows without Apt ID)."""
+        """Hand the next eligible rows (no PreGAID, with Apt ID) to free workers; finish when none are left."""
         if not auto_update_running["active"]:
             return
 
         all_rows = tree.get_children()
-        current_idx = auto_update_running["current_index"]
+        while auto_update_running["in_flight"] < ADDRESS_MATCH_CONCURRENCY:
+            # Advance to the next row that is not terminal and has no preloaded GA ID
+            current_idx = auto_update_running["current_index"]
+            while current_idx < len(all_rows) and not _auto_update_eligible(all_rows[current_idx]):
+                current_idx += 1
+            auto_update_running["current_index"] = current_idx
+            if current_idx >= len(all_rows):
+                break
 
-        # Advance to the next row that is not terminal and has no preloaded GA ID
-        while current_idx < len(all_rows):
             row_id = all_rows[current_idx]
             try:
-                status_val = tree.set(row_id, "✓")  # safer than index
+                idx_str = tree.set(row_id, "#")
+                idx = int(idx_str) if idx_str else (current_idx + 1)
             except Exception:
-                status_val = ""
+                idx = current_idx + 1
 
             try:
-                preloaded_ga_val = tree.set(row_id, "PreGAID")
+                google_address = tree.set(row_id, "Google")
+                preloaded_ga_id = tree.set(row_id, "PreGAID")
             except Exception:
-                preloaded_ga_val = ""
-            
-            try:
-                apt_id_val = tree.set(row_id, "Apt ID")
-            except Exception:
-                apt_id_val = ""
-
-            # Skip if row already has a terminal status
-            if status_val in ("✓", "X", "❌"):
-                current_idx += 1
-                continue
-            
-            # Skip if row has no Apt ID
-            if apt_id_val in ("", "-"):
-                current_idx += 1
-                continue
+                # Fallback using values by index if needed
+                vals = tree.item(row_id, "values")
+                google_address = vals[3] if len(vals) > 3 else ""  # Google is 4th column (index 3)
+                preloaded_ga_id = vals[2] if len(vals) > 2 else None  # PreGAID is 3rd column (index 2)
 
-            # Skip if PreGAID exists
-            if preloaded_ga_val not in ("", "-"):
-                current_idx += 1
-                continue
-
-            # Found an eligible row to process
-            break
-
-        # Update the shared index pointer
-        auto_update_running["current_index"] = current_idx
+            log_to_file(f"[Address Match] Auto-update processing row {idx}/{len(all_rows)} (no PreGAID)")
+            tree.set(row_id, "✓", "⏳")
+            auto_update_running["current_index"] = current_idx + 1
+            auto_update_running["in_flight"] += 1
+            auto_update_running["pool"].submit(_auto_update_row, auto_update_running["run_id"],
+                                               auto_update_running["stop"], row_id, google_address, preloaded_ga_id)
 
-        # If no eligible rows remain, finish
-        if current_idx >= len(all_rows):
-            auto_update_running["active"] = False
-            auto_update_running["current_index"] = 0
-            try:
-                auto_update_var.set(False)
-            except Exception:
-                pass
-            log_to_file("[Address Match] Auto-update completed (no eligible rows left)")
-            
-            # Check if there are any rows without PreGAID
-            has_empty_pregaid = False
-            for check_row_id in tree.get_children():
-                try:
-                    check_pregaid = tree.set(check_row_id, "PreGAID")
-                    if check_pregaid in ("", "-"):
-                        has_empty_pregaid = True
-                        break
-                except Exception:
-                    pass
-            
-            # Only mark as done if no empty PreGAID rows remain
-            if not has_empty_pregaid:
-                log_to_file("[Address Match] No more empty PreGAID rows - marking job as done")
-                update_job_status_to_done()
-                # Notify Activity Window if a callback was registered
-                try:
-                    cb = ADDRESS_MATCH_CALLBACKS.get(str(job_id)) or ADDRESS_MATCH_CALLBACKS.get(job_id)
-                    if cb:
-                        cb(int(new_api_calls_count.get()))
-                        # Clear callback so it won't be called twice
-                        ADDRESS_MATCH_CALLBACKS.pop(str(job_id), None)
-                        ADDRESS_MATCH_CALLBACKS.pop(job_id, None)
-                except Exception as _cb_e:
-                    log_to_file(f"[Address Match] Callback error: {_cb_e}")
-                # Close the Address Match window after marking done
-                try:
-                    window.destroy()
-                except Exception:
-                    pass
-            else:
-                log_to_file("[Address Match] Still have empty PreGAID rows - not marking as done")
+        # Wait for rows still in flight before finishing
+        if auto_update_running["in_flight"] or auto_update_running["current_index"] < len(all_rows):
             return
 
-        # Process the selected row
-        row_id = all_rows[current_idx]
-        try:
-            idx_str = tree.set(row_id, "#")
-            idx = int(idx_str) if idx_str else (current_idx + 1)
-        except Exception:
-            idx = current_idx + 1
-
+        # No eligible rows remain: finish
+        _stop_auto_update_workers()
+        auto_update_running["current_index"] = 0
         try:
-            google_address = tree.set(row_id, "Google")
-            preloaded_ga_id = tree.set(row_id, "PreGAID")
+            auto_update_var.set(False)
         except Exception:
-            # Fallback using values by index if needed
-            vals = tree.item(row_id, "values")
-            google_address = vals[3] if len(vals) > 3 else ""  # Google is 4th column (index 3)
-            preloaded_ga_id = vals[2] if len(vals) > 2 else None  # PreGAID is 3rd column (index 2)
+            pass
+        log_to_file(f"[Address Match] Auto-update completed (no eligible rows left): {auto_update_running['done']} rows "
+                    f"in {_fmt_secs(time.time() - auto_update_running['started'])}")
 
-        log_to_file(f"[Address Match] Auto-update processing row {idx}/{len(all_rows)} (no PreGAID)")
+        # Check if there are any rows without PreGAID
+        has_empty_pregaid = False
+        for check_row_id in tree.get_children():
+            try:
+                check_pregaid = tree.set(check_row_id, "PreGAID")
+                if check_pregaid in ("", "-"):
+                    has_empty_pregaid = True
+                    break
+            except Exception:
+                pass
 
-        # Create a wrapper that calls process_next_row after completion
-        def run_and_continue():
-            run_for_address(row_id, google_address, preloaded_ga_id)
-            # Wait a bit then process next row
-            auto_update_running["current_index"] = current_idx + 1
-            window.after(2000, process_next_row)  # 2 second delay between rows
+        # Only mark as done if no empty PreGAID rows remain
+        if not has_empty_pregaid:
+            log_to_file("[Address Match] No more empty PreGAID rows - marking job as done")
+            update_job_status_to_done()
+            # Notify Activity Window if a callback was registered
+            try:
+                cb = ADDRESS_MATCH_CALLBACKS.get(str(job_id)) or ADDRESS_MATCH_CALLBACKS.get(job_id)
+                if cb:
+                    cb(int(new_api_calls_count.get()))
+                    # Clear callback so it won't be called twice
+                    ADDRESS_MATCH_CALLBACKS.pop(str(job_id), None)
+                    ADDRESS_MATCH_CALLBACKS.pop(job_id, None)
+            except Exception as _cb_e:
+                log_to_file(f"[Address Match] Callback error: {_cb_e}")
+            # Close the Address Match window after marking done
+            try:
+                window.destroy()
+            except Exception:
+                pass
+        else:
+            log_to_file("[Address Match] Still have empty PreGAID rows - not marking as done")
 
-        threading.Thread(target=run_and_continue, daemon=True).start()
-    
     def toggle_auto_update():
         """Toggle auto-update mode."""
         if is_loading["active"]:
@@ -1706,13 +1768,21 @@ from config_core import *
             return
         if auto_update_var.get():
             # Start auto-update
-            auto_update_running["active"] = True
-            auto_update_running["current_index"] = 0
-            log_to_file("[Address Match] Auto-update started")
+            _stop_auto_update_workers()
+            auto_update_running.update(
+                active=True, current_index=0, in_flight=0, done=0, started=time.time(),
+                total=sum(1 for r in tree.get_children() if _auto_update_eligible(r)),
+                run_id=auto_update_running["run_id"] + 1, stop=threading.Event(),
+                pool=ThreadPoolExecutor(max_workers=ADDRESS_MATCH_CONCURRENCY, thread_name_prefix="address-match"))
+            log_to_file(f"[Address Match] Auto-update started: {auto_update_running['total']} rows, "
+                        f"{ADDRESS_MATCH_CONCURRENCY} workers, {ADDRESS_MATCH_RATE_PER_MIN:g}/min")
             process_next_row()
+            if not auto_update_running["draining"]:
+                drain_auto_update_events()
         else:
-            # Stop auto-update
-            auto_update_running["active"] = False
+            # Stop auto-update; rows already in flight finish on their own
+            _stop_auto_update_workers()
+            update_auto_update_status()
             log_to_file("[Address Match] Auto-update stopped")
     
     # Bottom buttons
@@ -1724,7 +1794,7 @@ from config_core import *
         try:
             # Stop auto-update if running
             try:
-                auto_update_running["active"] = False
+                _stop_auto_update_workers()
                 auto_update_var.set(False)
             except Exception:
                 pass
@@ -1950,6 +2020,9 @@ from config_core import *
         cursor="hand2"
     )
     auto_update_check.pack(side="left", padx=10)
+    auto_update_status_var = tk.StringVar(master=window, value="")
+    tk.Label(btn_frame, textvariable=auto_update_status_var, bg="#1E1E1E", fg="#95A5A6",
+             font=("Segoe UI", 9)).pack(side="left", padx=(0, 10))
     
     # Show No Apt ID checkbox
     show_no_apt_id_var = tk.BooleanVar(master=window, value=False)
@@ -1980,6 +2053,7 @@ from config_core import *
     
     def on_window_close():
         """Clean up resources before closing window."""
+        _stop_auto_update_workers()
         close_db_connection()
         window.destroy()
     
@@ -1989,5 +2063,3 @@ from config_core import *
     
     # Also bind window close event (X button)
     window.protocol("WM_DELETE_WINDOW", on_window_close)
-
-def show_insert_db_window(job_id, parent, table=None):
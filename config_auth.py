@@ -405,6 +405,9 @@ REMOTE_IMAGES_PARENT = os.getenv(
     "/home/daniel/trustyhousing.com/app/public"
 )
 
+# Public URL the uploaded /img folder is served from (used to verify uploads)
+PUBLIC_IMAGES_URL = os.getenv("PUBLIC_IMAGES_URL", "https://trustyhousing.com/img")
+
 IMPORTER_URL = os.getenv("IMPORTER_URL", "https://172.104.206.182/xxxxx.php")
 IMPORTER_VERIFY_TLS = os.getenv("IMPORTER_VERIFY_TLS", "0") in ("1", "true", "True")
 
@@ -7,6 +7,9 @@ Extracted from config_utils.py (lines 6673-9428)
 
 from config_core import *
 from config_hud_api import hud_push
+from config_sftp import get_sftp_pool, SFTPDirSync
+from listing_upsert import bulk_upsert_listings, deactivate_missing, listing_domain, NetworkStatsDeltas
+from config_address_match import show_address_match_window
 from config_auth import (
     BASE_DIR, CFG, LOG_PATH, TELEGRAM_ENABLED, TELEGRAM_BOT_TOKEN, 
     TELEGRAM_CHAT_ID, ERROR_NOTIFY_COOLDOWN_SEC
@@ -351,12 +354,11 @@ def sftp_upload_file(local_path: Path, host: str, port: int, user: str, password
         log_file("SFTP disabled; skipping file upload.")
         return False
     try:
-        transport, sftp = _sftp_connect(host, port, user, password)
-        _sftp_ensure_dir(sftp, remote_dir)
+        pool = get_sftp_pool(host, port, user, password)
+        pool.ensure_dir(remote_dir)
         rname = remote_name if remote_name else local_path.name
         remote_path = f"{remote_dir.rstrip('/')}/{rname}"
-        sftp.put(str(local_path), remote_path)
-        sftp.close(); transport.close()
+        pool.put(local_path, remote_path)
         log_file(f"SFTP upload OK: {local_path} -> {remote_path}")
         hud_push(f"↑ JSON uploaded: {rname}")
         return True
@@ -365,32 +367,29 @@ def sftp_upload_file(local_path: Path, host: str, port: int, user: str, password
         notify_telegram_error(title="SFTP file upload failed", details=str(e), context=f"local={local_path} remote_dir={remote_dir}")
         return False
 
-def sftp_upload_dir(local_dir: Path, host: str, port: int, user: str, password: str, remote_dir: str, remote_subdir: Optional[str] = None) -> bool:
+def sftp_upload_dir(local_dir: Path, host: str, port: int, user: str, password: str, remote_dir: str, remote_subdir: Optional[str] = None, progress_callback=None) -> bool:
     if not SFTP_ENABLED:
         log_file("SFTP disabled; skipping dir upload.")
         return False
     try:
-        transport, sftp = _sftp_connect(host, port, user, password)
+        pool = get_sftp_pool(host, port, user, password)
         # If remote_subdir is provided, upload into that fixed directory name under remote_dir;
         # otherwise, mirror the local directory name under the remote_dir.
         target_root = f"{remote_dir.rstrip('/')}/{remote_subdir or local_dir.name}"
-        _sftp_ensure_dir(sftp, target_root)
+        pool.ensure_dir(target_root)
 
-        import os
+        items = []
         for root, dirs, files in os.walk(local_dir):
-            rel = os.path.relpath(root, local_dir)
-            remote_sub = target_root if rel == "." else f"{target_root}/{rel.replace('\\', '/')}"
-            _sftp_ensure_dir(sftp, remote_sub)
+            rel = Path(root).relative_to(local_dir).as_posix()
+            remote_sub = target_root if rel == "." else f"{target_root}/{rel}"
             for fname in files:
-                lpath = Path(root) / fname
-                rpath = f"{remote_sub}/{fname}"
-                try:
-                    sftp.put(str(lpath), rpath)
-                except Exception as e:
-                    log_file(f"SFTP put failed: {lpath} -> {rpath}: {e}")
+                items.append((Path(root) / fname, f"{remote_sub}/{fname}"))
+
+        result = pool.upload_many(items, progress_callback=progress_callback)
+        for lpath, err in result["errors"].items():
+            log_file(f"SFTP put failed: {lpath}: {err}")
 
-        sftp.close(); transport.close()
-        log_file(f"SFTP folder upload OK: {local_dir} -> {target_root}")
+        log_file(f"SFTP folder upload OK: {local_dir} -> {target_root} ({result['uploaded']} files, {result['failed']} failed)")
         hud_push(f"↑ Images folder uploaded: {remote_subdir or local_dir.name}")
         return True
     except Exception as e:
@@ -398,6 +397,36 @@ def sftp_upload_dir(local_dir: Path, host: str, port: int, user: str, password:
         notify_telegram_error(title="SFTP folder upload failed", details=str(e), context=f"local_dir={local_dir} remote_dir={remote_dir}")
         return False
 
+def sftp_sync_dir(local_dir: Path, host: str, port: int, user: str, password: str, remote_dir: str, remote_subdir: Optional[str] = None, progress_callback=None, verify_base_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Like sftp_upload_dir, but only sends files that are new or changed since the last sync.
+    Returns the upload result (uploaded/unchanged/failed counts, uploaded_files) or None on failure.
+    With verify_base_url, every file sent is HEAD-checked at <verify_base_url>/<name> and
+    failures are left in the manifest for re-upload (result["verify"]).
+    """
+    if not SFTP_ENABLED:
+        log_file("SFTP disabled; skipping dir sync.")
+        return None
+    try:
+        pool = get_sftp_pool(host, port, user, password)
+        target_root = f"{remote_dir.rstrip('/')}/{remote_subdir or local_dir.name}"
+        pool.ensure_dir(target_root)
+        syncer = SFTPDirSync(pool, local_dir, target_root)
+        result = syncer.sync(progress_callback=progress_callback)
+        for lpath, err in result["errors"].items():
+            log_file(f"SFTP put failed: {lpath}: {err}")
+        if verify_base_url and result["uploaded_files"]:
+            result["verify"] = syncer.verify([l for l, _ in result["uploaded_files"]], verify_base_url)
+            for url, status in result["verify"]["failed"]:
+                log_file(f"Public check failed (HTTP {status}): {url}")
+
+        log_file(f"SFTP folder sync OK: {local_dir} -> {target_root} ({result['uploaded']} sent, {result['unchanged']} unchanged, {result['failed']} failed)")
+        hud_push(f"↑ Images folder synced: {remote_subdir or local_dir.name} ({result['uploaded']} new)")
+        return result
+    except Exception as e:
+        log_file(f"SFTP folder sync FAILED ({local_dir}): {e}")
+        notify_telegram_error(title="SFTP folder sync failed", details=str(e), context=f"local_dir={local_dir} remote_dir={remote_dir}")
+        return None
+
 # ----------------------------
 # Shared helpers for other modules
 # ----------------------------
@@ -666,253 +695,54 @@ def show_insert_db_window(job_id, parent, table=None):
             if cursor is None:
                 raise Exception(f"Database connection failed after {max_attempts} attempts: {last_err}")
             
-            # Helper: normalize image URLs to a single comma-separated string
-            def norm_img_urls(value):
-                if isinstance(value, list):
-                    return ",".join([str(x).strip() for x in value if str(x).strip()])
-                return str(value or "").strip()
-
-            # Helper: parse available_date into YYYY-MM-DD if possible, else None
-            def parse_available_date(val):
-                if not val:
-                    return None
-                s = str(val).strip()
-                sl = s.lower()
-                if sl in ("now", "today", "available now", "immediate"):
-                    return None
-                for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%m-%d-%y"):
-                    try:
-                        return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-                    except Exception:
-                        continue
-                return None
-
-            # Helper: parse integer from various string formats like "$1,750" or "1,200 sqft"
-            def to_int(val, default=0):
-                try:
-                    if val is None:
-                        return default
-                    if isinstance(val, (int,)):
-                        return int(val)
-                    if isinstance(val, float):
-                        return int(round(val))
-                    s = str(val)
-                    digits = ''.join(ch for ch in s if ch.isdigit())
-                    return int(digits) if digits else default
-                except Exception:
-                    return default
+            stats_deltas = NetworkStatsDeltas()
 
-            # Helper: parse float from strings like "1.5 bath" or "2"
-            def to_float(val, default=0.0):
-                try:
-                    if val is None:
-                        return default
-                    if isinstance(val, (int, float)):
-                        return float(val)
-                    s = str(val)
-                    # Keep digits and dot
-                    cleaned = ''.join(ch for ch in s if (ch.isdigit() or ch == '.'))
-                    return float(cleaned) if cleaned else default
-                except Exception:
-                    return default
-
-            # Helper: return numeric string (for VARCHAR columns) preserving decimals when requested
-            def to_num_str(val, allow_decimal: bool = False, default: str = "0") -> str:
+            # Bulk path: prefetch existing rows for the whole batch, plan in memory,
+            # write with multi-row statements inside one transaction
+            ui_append("Matching listings against the database...")
+            try:
+                conn.start_transaction()
+                result = bulk_upsert_listings(cursor, listings, int(job_id))
+                conn.commit()
+            except Exception:
                 try:
-                    if val is None:
-                        return default
-                    s = str(val)
-                    if allow_decimal:
-                        cleaned = ''.join(ch for ch in s if (ch.isdigit() or ch == '.'))
-                        # Normalize multiple dots
-                        parts = cleaned.split('.')
-                        if len(parts) > 2:
-                            cleaned = parts[0] + '.' + ''.join(parts[1:])
-                        return cleaned if cleaned else default
-                    else:
-                        digits = ''.join(ch for ch in s if ch.isdigit())
-                        return digits if digits else default
+                    conn.rollback()
                 except Exception:
-                    return default
+                    pass
+                raise
 
-            # Track current keys for deactivation
-            current_urls = set()
-            current_full_addresses = set()
-            current_domains = set()
-
-            for i, listing in enumerate(listings, 1):
-                # Extract listing data from JSON
-                full_address = listing.get("full_address") or listing.get("address") or ""
-                price = to_int(listing.get("price"), 0)  # INT column in DB
-                bedrooms = to_num_str(listing.get("bedrooms"), allow_decimal=False, default="0")  # VARCHAR(100)
-                bathrooms = to_num_str(listing.get("bathrooms"), allow_decimal=True, default="0")   # VARCHAR(100), keep 1.5
-                sqft = to_num_str(listing.get("sqft"), allow_decimal=False, default="0")            # VARCHAR(50)
-                description = listing.get("description") or ""
-                img_urls = norm_img_urls(listing.get("img_urls") or listing.get("img_url") or "")
-                available = listing.get("available") or ""
-                available_date = parse_available_date(listing.get("available_date"))
-                building_name = listing.get("building_name") or listing.get("Building_Name") or None
-                city = listing.get("city") or None
-                state = listing.get("state") or None
-                listing_website = listing.get("listing_website") or listing.get("url") or listing.get("link") or None
-                listing_id_from_json = listing.get("listing_id") or None
-
-                # Track keys for later deactivation within same source domain
-                if listing_website:
-                    try:
-                        from urllib.parse import urlparse as _urlparse
-                        dom = _urlparse(listing_website).netloc
-                        if dom:
-                            current_domains.add(dom)
-                    except Exception:
-                        pass
-                    current_urls.add(listing_website)
-                if full_address:
-                    current_full_addresses.add(full_address)
-
-                # Determine network id from JSON or fallback to job id
-                try:
-                    this_network_id = int(listing.get("network_id") or int(job_id))
-                except Exception:
-                    this_network_id = int(job_id)
-
-                # Determine lookup strategy: prefer listing_website, fallback to full_address
-                existing = None
-                if listing_website:
-                    cursor.execute("SELECT id, price, active FROM apartment_listings WHERE listing_website = %s", (listing_website,))
-                    existing = cursor.fetchone()
-                if not existing and full_address:
-                    cursor.execute("SELECT id, price, active FROM apartment_listings WHERE full_address = %s", (full_address,))
-                    existing = cursor.fetchone()
-
-                if existing:
-                    listing_id, old_price, _active = existing
-
-                    # Price change detection (persist to history table and UI)
-                    if (old_price or 0) != (price or 0):
-                        try:
-                            change_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            cursor.execute(
-                                """
-                                INSERT INTO apartment_listings_price_changes
-                                (apartment_listings_id, new_price, time)
-                                VALUES (%s, %s, %s)
-                                """,
-                                (listing_id, str(price), change_time)
-                            )
-                            
-                            # Track in network_daily_stats
-                            try:
-                                today = datetime.now().strftime('%Y-%m-%d')
-                                cursor.execute("""
-                                    INSERT INTO network_daily_stats 
-                                    (network_id, date, price_changes, apartments_added, apartments_subtracted, total_listings)
-                                    VALUES (%s, %s, 1, 0, 0, 0)
-                                    ON DUPLICATE KEY UPDATE 
-                                    price_changes = price_changes + 1
-                                """, (this_network_id, today))
-                            except Exception as stats_err:
-                                log_to_file(f"[Insert DB] network_daily_stats update failed: {stats_err}")
-                        except Exception as pc_err:
-                            log_to_file(f"[Insert DB] Price change insert failed for id {listing_id}: {pc_err}")
-                        price_change_count += 1
-                        status = f"💰 PRICE CHANGE: {(full_address or listing_website)[:60]} ({old_price} → {price})"
-                    else:
-                        status = f"✓ UPDATED: {(full_address or listing_website)[:60]}"
-
-                    # Update all fields except price (price is constant)
-                    cursor.execute(
-                        """
-                        UPDATE apartment_listings
-                        SET bedrooms=%s, bathrooms=%s, sqft=%s,
-                            description=%s, img_urls=%s, available=%s, available_date=%s,
-                            time_updated=NOW(), active='yes', network_id=%s, listing_id=%s
-                        WHERE id=%s
-                        """,
-                        (bedrooms, bathrooms, sqft, description, img_urls, available, available_date, this_network_id, listing_id_from_json, listing_id)
-                    )
-                else:
-                    # Insert new listing (minimal, using existing schema columns)
-                    cursor.execute(
-                        """
-                        INSERT INTO apartment_listings
-                        (active, bedrooms, bathrooms, sqft, price, img_urls, available, available_date,
-                         description, Building_Name, full_address, city, state, listing_website,
-                         time_created, time_updated, network_id, listing_id)
-                        VALUES ('yes', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), %s, %s)
-                        """,
-                        (bedrooms, bathrooms, sqft, price, img_urls, available, available_date,
-                         description, building_name, full_address, city, state, listing_website, this_network_id, listing_id_from_json)
-                    )
-                    new_count += 1
-                    status = f"✨ NEW: {(full_address or listing_website or 'unknown')[:60]} ({price})"
-                    
-                    # Track new listing in network_daily_stats
-                    try:
-                        today = datetime.now().strftime('%Y-%m-%d')
-                        cursor.execute("""
-                            INSERT INTO network_daily_stats 
-                            (network_id, date, price_changes, apartments_added, apartments_subtracted, total_listings)
-                            VALUES (%s, %s, 0, 1, 0, 0)
-                            ON DUPLICATE KEY UPDATE 
-                            apartments_added = apartments_added + 1
-                        """, (this_network_id, today))
-                    except Exception as stats_err:
-                        log_to_file(f"[Insert DB] network_daily_stats new listing update failed: {stats_err}")
+            # network_daily_stats deltas are collected here and written once per network at the end
+            stats_deltas.add_plan(result["plan"])
 
-                conn.commit()
-                processed += 1
+            timings = result["timings"]
+            log_to_file(f"[Insert DB] Bulk upsert: {result['new']} new, {result['updated']} updated, "
+                        f"{result['price_changes']} price changes "
+                        f"(prefetch {timings['prefetch']:.2f}s, write {timings['write']:.2f}s)")
 
-                # Update UI
+            new_count = result["new"]
+            price_change_count = result["price_changes"]
+            processed = len(result["rows"])
+            for _kind, status in result["plan"]["statuses"]:
                 ui_append(status)
 
-                # Update stats
-                ui_set_stats(new_count=new_count, price_changes=price_change_count, total=f"{processed}/{len(listings)}")
-                ui_set_progress(processed)
+            # Track current keys for deactivation
+            current_urls = {r["listing_website"] for r in result["rows"] if r["listing_website"]}
+            current_full_addresses = {r["full_address"] for r in result["rows"] if r["full_address"]}
+            current_domains = {listing_domain(u) for u in current_urls} - {""}
 
-                # Calculate ETA
-                elapsed = time.time() - start_time
-                if processed > 0:
-                    avg_time = elapsed / processed
-                    remaining = len(listings) - processed
-                    eta_seconds = avg_time * remaining
-                    ui_set_eta(f"~{int(eta_seconds)}s left")
+            ui_set_stats(new_count=new_count, price_changes=price_change_count, total=f"{processed}/{len(listings)}")
+            ui_set_progress(processed)
+            ui_set_eta(f"{time.time() - start_time:.1f}s")
 
             # Mark inactive listings for this network_id (network_xx):
             # Any active row with the same network_id as current job but not present in this JSON becomes inactive.
             log_to_file(f"[Insert DB] ⚠️ CHECKPOINT 1: About to check inactive listings for network {job_id}")
             ui_append(f"⚠️ Checking inactive listings for network {job_id}...")
             try:
-                cursor.execute(
-                    "SELECT id, listing_website, full_address FROM apartment_listings WHERE active='yes' AND network_id=%s",
-                    (int(job_id),)
-                )
-                rows = cursor.fetchall() or []
-                deactivated_here = 0
-                for lid, url, fa in rows:
-                    present = False
-                    if url and url in current_urls:
-                        present = True
-                    elif fa and fa in current_full_addresses:
-                        present = True
-                    if not present:
-                        cursor.execute("UPDATE apartment_listings SET active='no', time_updated=NOW() WHERE id=%s", (lid,))
-                        inactive_count += 1
-                        deactivated_here += 1
-                
-                # Track removed listings in network_daily_stats
-                if deactivated_here > 0:
-                    try:
-                        today = datetime.now().strftime('%Y-%m-%d')
-                        cursor.execute("""
-                            INSERT INTO network_daily_stats 
-                            (network_id, date, price_changes, apartments_added, apartments_subtracted, total_listings)
-                            VALUES (%s, %s, 0, 0, %s, 0)
-                            ON DUPLICATE KEY UPDATE 
-                            apartments_subtracted = apartments_subtracted + %s
-                        """, (int(job_id), today, deactivated_here, deactivated_here))
-                    except Exception as stats_err:
-                        log_to_file(f"[Insert DB] network_daily_stats removal update failed: {stats_err}")
+                # One set-based UPDATE against the batch keys instead of one UPDATE per missing row
+                deactivated_here = deactivate_missing(cursor, int(job_id), current_urls, current_full_addresses)
+                inactive_count += deactivated_here
+                stats_deltas.add(int(job_id), subtracted=deactivated_here)
                 
                 conn.commit()
                 log_to_file(f"[Insert DB] ⚠️ CHECKPOINT 2: Committed deactivation changes. Deactivated: {deactivated_here}")
@@ -924,25 +754,14 @@ def show_insert_db_window(job_id, parent, table=None):
             ui_set_stats(inactive=inactive_count)
             ui_set_eta("Done!")
             
-            # Write final stats to network_daily_stats for TODAY
-            # If a row exists for this network_id + date, REPLACE the values with this run's totals
-            log_to_file(f"[Insert DB] ⚠️ ABOUT TO WRITE STATS: network={job_id}, today={datetime.now().strftime('%Y-%m-%d')}, price_changes={price_change_count}, new={new_count}, removed={inactive_count}, total={processed}")
+            # Write this run's stats to network_daily_stats for TODAY: one upsert per network,
+            # adding the run's deltas and setting total_listings to the current active count
+            log_to_file(f"[Insert DB] ⚠️ ABOUT TO WRITE STATS: network={job_id}, today={datetime.now().strftime('%Y-%m-%d')}, price_changes={price_change_count}, new={new_count}, removed={inactive_count}")
             try:
-                today = datetime.now().strftime('%Y-%m-%d')
-                log_to_file(f"[Insert DB] Writing final stats to network_daily_stats for network {job_id} on {today}: price_changes={price_change_count}, new={new_count}, removed={inactive_count}")
-                cursor.execute("""
-                    INSERT INTO network_daily_stats 
-                    (network_id, date, price_changes, apartments_added, apartments_subtracted, total_listings)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE 
-                    price_changes = %s,
-                    apartments_added = %s,
-                    apartments_subtracted = %s,
-                    total_listings = %s
-                """, (int(job_id), today, price_change_count, new_count, inactive_count, processed,
-                      price_change_count, new_count, inactive_count, processed))
+                written = stats_deltas.write(cursor)
                 conn.commit()
-                log_to_file(f"[Insert DB] ✅ Successfully wrote stats for network {job_id} - affected rows: {cursor.rowcount}")
+                for net_id, st in written.items():
+                    log_to_file(f"[Insert DB] ✅ Stats for network {net_id}: +{st['added']} new, {st['price_changes']} price changes, -{st['subtracted']} removed, {st['total']} active")
                 log_to_file(f"[Insert DB] ⚠️ CHECKPOINT 4: Stats INSERT completed successfully")
             except Exception as final_stats_err:
                 log_to_file(f"[Insert DB] ❌ FAILED to write final stats for network {job_id}: {final_stats_err}")
@@ -1007,14 +826,14 @@ def show_insert_db_window(job_id, parent, table=None):
                 mark_step_status('error', 'failed')
             log_to_file(f"[Insert DB] run_with_completion finished for job {job_id}, ok={ok}")
 
-        # Start processing in background thread
-        try:
-            log_to_file(f"[Insert DB] Creating background thread for job {job_id}")
-            t = threading.Thread(target=run_with_completion, daemon=True)
-            t.start()
-            log_to_file(f"[Insert DB] Background thread started successfully for job {job_id}")
-        except Exception as start_err:
-            log_to_file(f"[Insert DB] Failed to start thread: {start_err}")
-            log_exception("Thread start error")
-            ui_append(f"\n❌ Failed to start processing thread: {start_err}")
+    # Start processing in background thread
+    try:
+        log_to_file(f"[Insert DB] Creating background thread for job {job_id}")
+        t = threading.Thread(target=run_with_completion, daemon=True)
+        t.start()
+        log_to_file(f"[Insert DB] Background thread started successfully for job {job_id}")
+    except Exception as start_err:
+        log_to_file(f"[Insert DB] Failed to start thread: {start_err}")
+        log_exception("Thread start error")
+        ui_append(f"\n❌ Failed to start processing thread: {start_err}")
 
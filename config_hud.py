@@ -4616,28 +4616,7 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                         status_win.after(0, lambda: set_status_summary(idx, _sum_text, "#2ECC71"))
                                         return
 
-                                    def strip_unit(address):
-                                        """Remove unit numbers from address - matches PHP stripUnitFromAddress logic"""
-                                        if not address:
-                                            return address
-                                        import re
-                                        # Patterns from PHP stripUnitFromAddress function - fixed for Python
-                                        patterns = [
-                                            r'\b(apt|apartment|unit|suite|ste|bldg|building|floor|fl)\s*\.?\s*[a-z0-9\-]+',  # apt 4B, unit 123, etc.
-                                            r'\s*#\s*[a-z0-9\-]+',  # #34, #503, #A anywhere
-                                            r'\s+[a-z]\d+[a-z]?,\s',  # Letter+digit combos like "b2," or "2a,"
-                                            r'\s+\d+[a-z]\d*,\s',  # Digit+letter combos
-                                        ]
-                                        cleaned = address
-                                        for pattern in patterns:
-                                            cleaned = re.sub(pattern, ' ', cleaned, flags=re.IGNORECASE)
-                                        
-                                        # Clean up multiple commas/spaces (from PHP)
-                                        cleaned = re.sub(r',\s*,', ',', cleaned)
-                                        cleaned = re.sub(r'\s+', ' ', cleaned)
-                                        cleaned = cleaned.strip(', ')
-                                        
-                                        return cleaned
+                                    from address_normalize import strip_unit
                                     
                                     for listing in listings:
                                         full_address = strip_unit(listing.get("full_address") or listing.get("address") or "")
@@ -7824,12 +7803,15 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                 import time
                 import mysql.connector
                 from pathlib import Path
+                from parcel_manifest import get_parcel_manifest, EXTRACTED, LINKED, PENDING
                 import subprocess
                 import os
                 import json
                 
                 parcels_dir = Path(r"C:\Users\dokul\Desktop\robot\th_poller\Captures\parcels")
                 parcels_dir.mkdir(parents=True, exist_ok=True)
+                # Pick up images saved before the manifest existed (or by other tools)
+                get_parcel_manifest().sync(parcels_dir)
                 
                 # ============================================================
                 # RETRY: Process any existing JSON files first before new captures
@@ -7960,6 +7942,47 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                     
                     return total_retried
                 
+                # Resolve addresses the offline parcel index knows before driving the browser
+                try:
+                    from parcel_index import get_parcel_index
+                    parcel_index = get_parcel_index()
+                    if parcel_index is not None:
+                        metro = self._metro_combo.get() if hasattr(self, '_metro_combo') else 'Seattle'
+                        if not metro or metro == 'All':
+                            metro = 'Seattle'
+                        conn = get_external_db()
+                        cursor = conn.cursor(dictionary=True)
+                        cursor.execute("""
+                            SELECT ga.id, JSON_UNQUOTE(JSON_EXTRACT(ga.json_dump, '$.result.formatted_address')) AS address
+                            FROM google_addresses ga
+                            INNER JOIN major_metros mm ON mm.id = ga.metro_id
+                            WHERE ga.king_county_parcels_id IS NULL
+                            AND ga.json_dump IS NOT NULL
+                            AND mm.metro_name = %s
+                        """, (metro,))
+                        rows = cursor.fetchall()
+                        cursor.close()
+                        conn.close()
+                        
+                        local_records = []
+                        for row in rows:
+                            record = parcel_index.lookup(row['address'] or '')
+                            if record is not None:
+                                record['google_addresses_id'] = row['id']
+                                local_records.append(record)
+                        if local_records:
+                            from process_with_openai import insert_to_database
+                            inserted = insert_to_database(local_records)
+                            # Parcels that already existed are linked by the matcher below
+                            manifest = get_parcel_manifest()
+                            for record in local_records:
+                                manifest.mark_extracted(parcels_dir / f"parcels_{record['google_addresses_id']}.png", record)
+                            log_to_file(f"[Auto Capture] Parcel index: {len(local_records)} of {len(rows)} addresses resolved locally, {inserted} inserted")
+                            self._root.after(0, lambda n=len(local_records), t=len(rows): self._parcel_activity_log(f"📚 Parcel index: {n} of {t} addresses resolved without the browser"))
+                except Exception as index_err:
+                    log_to_file(f"[Auto Capture] Parcel index error: {index_err}")
+                    self._root.after(0, lambda e=str(index_err): self._parcel_activity_log(f"⚠️ Parcel index error: {e}"))
+                
                 # Run matcher at startup to link any unlinked parcels
                 try:
                     self._root.after(0, lambda: self._parcel_activity_log("🔗 Running parcel matcher at startup..."))
@@ -7984,25 +8007,18 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                     """Update statistics in activity window - safely checks if window exists"""
                     try:
                         if hasattr(self, '_parcel_activity_window') and self._parcel_activity_window.winfo_exists():
-                            all_images = list(parcels_dir.glob("parcels_*.png"))
-                            # Only count base files (exclude _skipped, _processed, and DEBUG)
-                            captured_only = [img for img in all_images 
-                                           if not img.stem.endswith('_processed') 
-                                           and not img.stem.endswith('_skipped')
-                                           and not img.stem.startswith('DEBUG_')]
-                            unprocessed = [img for img in all_images 
-                                         if not img.stem.endswith('_processed') 
-                                         and not img.stem.endswith('_skipped')
-                                         and not img.stem.startswith('DEBUG_')]
-                            processed = [img for img in all_images if img.stem.endswith('_processed')]
+                            # Per-status counts from the parcel manifest (indexed, no folder scan)
+                            counts = get_parcel_manifest().counts()
+                            pending = counts.get(PENDING, 0)
+                            processed = counts.get(EXTRACTED, 0) + counts.get(LINKED, 0)
                             
                             if hasattr(self, '_parcel_stats'):
                                 if 'captured' in self._parcel_stats:
-                                    self._parcel_stats['captured'].config(text=str(len(captured_only)))
+                                    self._parcel_stats['captured'].config(text=str(pending))
                                 if 'processed' in self._parcel_stats:
-                                    self._parcel_stats['processed'].config(text=str(len(processed)))
+                                    self._parcel_stats['processed'].config(text=str(processed))
                                 if 'pending' in self._parcel_stats:
-                                    self._parcel_stats['pending'].config(text=str(len(unprocessed)))
+                                    self._parcel_stats['pending'].config(text=str(pending))
                     except:
                         pass
                 
@@ -8019,6 +8035,287 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                 capture_times = []  # List of individual capture durations
                 addr_start_time = None  # Track individual capture start
                 
+                # Capture -> OpenAI batch hand-off: at most one batch in flight, and
+                # capturing pauses once this many images wait for processing
+                openai_batch_thread = [None]
+                openai_backlog_max = int(os.getenv('PARCEL_OPENAI_BACKLOG_MAX', '60'))
+                
+                def _run_openai_batch(unprocessed):
+                    """Vision-extract and insert a batch of captured popups (background thread)"""
+                    log_to_file(f"[Auto Capture] Found {len(unprocessed)} unprocessed images - processing batch...")
+                    self._root.after(0, lambda: self._parcel_activity_log(f"📦 Processing batch of {len(unprocessed)} images..."))
+                    self._root.after(0, lambda: self._safe_stats_update('status', text="🔄 Processing with OpenAI..."))
+                    
+                    # Create loader overlay for OpenAI processing
+                    loader_frame = None
+                    loader_start_time = time.time()
+                    loader_cancelled = [False]  # Use list for mutable closure
+                    
+                    def create_loader():
+                        nonlocal loader_frame
+                        try:
+                            if not activity_win.winfo_exists():
+                                return
+                            
+                            loader_frame = tk.Frame(activity_win, bg="#1C2833", relief="raised", bd=2)
+                            loader_frame.place(relx=0.5, rely=0.5, anchor="center", width=280, height=180)
+                            
+                            # Title
+                            tk.Label(loader_frame, text="🤖 OpenAI Processing", font=("Segoe UI", 11, "bold"),
+                                    bg="#1C2833", fg="#3498DB").pack(pady=(10, 5))
+                            
+                            # Details
+                            tk.Label(loader_frame, text=f"Processing {len(unprocessed)} images...",
+                                    font=("Segoe UI", 9), bg="#1C2833", fg="#ECF0F1").pack(pady=2)
+                            
+                            # Estimated time (approx 2-3 sec per image for API call)
+                            est_secs = len(unprocessed) * 2.5
+                            est_str = f"~{int(est_secs//60)}:{int(est_secs%60):02d}" if est_secs >= 60 else f"~{int(est_secs)}s"
+                            tk.Label(loader_frame, text=f"Est. time: {est_str}",
+                                    font=("Segoe UI", 9), bg="#1C2833", fg="#F39C12").pack(pady=2)
+                            
+                            # Progress bar (indeterminate)
+                            progress = ttk.Progressbar(loader_frame, mode='indeterminate', length=200)
+                            progress.pack(pady=10)
+                            progress.start(15)  # Animation speed
+                            
+                            # Elapsed time label
+                            elapsed_lbl = tk.Label(loader_frame, text="Elapsed: 0:00",
+                                                  font=("Consolas", 9), bg="#1C2833", fg="#BDC3C7")
+                            elapsed_lbl.pack(pady=2)
+                            
+                            # Status label
+                            status_lbl = tk.Label(loader_frame, text="🔄 Sending to OpenAI Vision API...",
+                                                 font=("Segoe UI", 8), bg="#1C2833", fg="#7F8C8D")
+                            status_lbl.pack(pady=2)
+                            
+                            # Update elapsed time every second
+                            def update_elapsed():
+                                if loader_cancelled[0] or not loader_frame or not loader_frame.winfo_exists():
+                                    return
+                                elapsed = time.time() - loader_start_time
+                                elapsed_lbl.config(text=f"Elapsed: {int(elapsed//60)}:{int(elapsed%60):02d}")
+                                # Update status based on time
+                                if elapsed < 5:
+                                    status_lbl.config(text="🔄 Sending images to OpenAI...")
+                                elif elapsed < 15:
+                                    status_lbl.config(text="🔄 OpenAI analyzing images...")
+                                elif elapsed < 30:
+                                    status_lbl.config(text="🔄 Extracting parcel data...")
+                                elif elapsed < 60:
+                                    status_lbl.config(text="🔄 Parsing response & saving...")
+                                else:
+                                    status_lbl.config(text="🔄 Still processing... please wait")
+                                activity_win.after(1000, update_elapsed)
+                            
+                            activity_win.after(1000, update_elapsed)
+                        except Exception as loader_err:
+                            log_to_file(f"[Auto Capture] Loader error: {loader_err}")
+                    
+                    def destroy_loader():
+                        nonlocal loader_frame
+                        loader_cancelled[0] = True
+                        try:
+                            if loader_frame and loader_frame.winfo_exists():
+                                loader_frame.destroy()
+                        except:
+                            pass
+                        loader_frame = None
+                    
+                    self._root.after(0, create_loader)
+                    
+                    # Run OpenAI processing
+                    try:
+                        api_key = os.getenv('OPENAI_API_KEY')
+                        if not api_key:
+                            log_to_file("[Auto Capture] ERROR: OPENAI_API_KEY not set")
+                            self._root.after(0, destroy_loader)
+                            self._root.after(0, lambda: self._parcel_activity_log("❌ ERROR: OPENAI_API_KEY environment variable not set!"))
+                            self._auto_capture_running = False  # Stop completely
+                            return
+                        
+                        # Validate API key format
+                        if not api_key.startswith('sk-'):
+                            log_to_file(f"[Auto Capture] ERROR: Invalid API key format: {api_key[:20]}...")
+                            self._root.after(0, destroy_loader)
+                            self._root.after(0, lambda: self._parcel_activity_log("❌ ERROR: Invalid OpenAI API key format!"))
+                            self._auto_capture_running = False  # Stop completely
+                            return
+                        
+                        log_to_file(f"[Auto Capture] Using API key: {api_key[:20]}...{api_key[-4:]}")
+                        self._root.after(0, lambda k=api_key: self._parcel_activity_log(f"🔑 API Key: {k[:20]}...{k[-4:]}"))
+                        
+                        # Run process_with_openai.py and stream output to activity window
+                        # Pass environment variables to subprocess
+                        env = os.environ.copy()
+                        openai_start = time.time()
+                        result = subprocess.run(
+                            ['python', 'process_with_openai.py'],
+                            capture_output=True,
+                            text=True,
+                            encoding='utf-8',  # Force UTF-8 encoding to handle emojis
+                            errors='replace',  # Replace invalid characters instead of crashing
+                            timeout=180,  # 3 minute timeout
+                            env=env  # Pass environment variables including API key
+                        )
+                        openai_duration = time.time() - openai_start
+                        
+                        # Destroy loader
+                        self._root.after(0, destroy_loader)
+                        
+                        # Log timing
+                        self._root.after(0, lambda d=openai_duration: self._parcel_activity_log(
+                            f"⏱️ OpenAI API took {d:.1f}s ({d/len(unprocessed):.1f}s/img)"))
+                        
+                        log_to_file(f"[Auto Capture] OpenAI processing complete: {result.returncode}")
+                        
+                        # Check if processing was successful
+                        if result.returncode != 0:
+                            log_to_file(f"[Auto Capture] ERROR: OpenAI processing failed with code {result.returncode}")
+                            self._root.after(0, lambda: self._parcel_activity_log(f"❌ OpenAI processing failed! Return code: {result.returncode}"))
+                            
+                            # Show stdout (errors are printed there)
+                            is_fatal_error = False
+                            if result.stdout:
+                                log_to_file(f"[Auto Capture] Error output: {result.stdout}")
+                                output_lines = result.stdout.split('\n')
+                                for line in output_lines:
+                                    if line.strip():
+                                        # Check for fatal errors that shouldn't retry
+                                        if 'invalid_api_key' in line.lower() or 'incorrect api key' in line.lower() or 'authentication' in line.lower():
+                                            is_fatal_error = True
+                                        # Use a proper closure to capture the line value
+                                        def log_line(msg=line):
+                                            self._parcel_activity_log(f"🔴 {msg}")
+                                        self._root.after(0, log_line)
+                            
+                            # Show stderr if any
+                            if result.stderr:
+                                log_to_file(f"[Auto Capture] Stderr: {result.stderr}")
+                                stderr_lines = result.stderr.split('\n')
+                                for line in stderr_lines:
+                                    if line.strip():
+                                        def log_err(msg=line):
+                                            self._parcel_activity_log(f"⚠️ {msg}")
+                                        self._root.after(0, log_err)
+                            
+                            # Stop on fatal errors, pause on retryable errors
+                            if is_fatal_error:
+                                log_to_file("[Auto Capture] FATAL ERROR: Stopping automation (bad API key or auth issue)")
+                                self._root.after(0, lambda: self._parcel_activity_log("❌ FATAL ERROR: Invalid API key! Stopping automation."))
+                                self._root.after(0, lambda: self._safe_stats_update('status', text="❌ Fatal error - stopped"))
+                                self._auto_capture_running = False  # Stop completely
+                                return
+                            else:
+                                self._root.after(0, lambda: self._safe_stats_update('status', text="❌ Processing failed"))
+                                time.sleep(0.5)
+                                return  # Retried on the next capture loop pass
+                        
+                        # Show detailed output in activity window
+                        db_insert_error = False
+                        inserted_count = 0
+                        skipped_count = 0
+                        failed_count = 0
+                        extraction_error = False
+                        error_details = []
+                        
+                        if result.stdout:
+                            log_to_file(f"[Auto Capture] Output: {result.stdout}")
+                            # Parse and display key information
+                            success_lines = result.stdout.split('\n')
+                            for line in success_lines:
+                                if line.strip():
+                                    # Check for CRITICAL database errors (not API tracking logs)
+                                    if '❌ Database error:' in line or 'Failed to connect' in line:
+                                        db_insert_error = True
+                                        error_details.append(line.strip())
+                                    # Check for extraction errors
+                                    if 'ERROR: OpenAI returned no data' in line:
+                                        extraction_error = True
+                                        error_details.append("OpenAI extraction returned no data")
+                                    # Extract counts from summary line: "8 inserted, 10 skipped (duplicates), 0 failed"
+                                    if 'Database insert complete:' in line or 'inserted,' in line:
+                                        try:
+                                            # Parse: "8 inserted, 10 skipped (duplicates), 0 failed"
+                                            import re
+                                            inserted_match = re.search(r'(\d+)\s+inserted', line)
+                                            skipped_match = re.search(r'(\d+)\s+skipped', line)
+                                            failed_match = re.search(r'(\d+)\s+failed', line)
+                                            if inserted_match:
+                                                inserted_count = int(inserted_match.group(1))
+                                            if skipped_match:
+                                                skipped_count = int(skipped_match.group(1))
+                                            if failed_match:
+                                                failed_count = int(failed_match.group(1))
+                                        except Exception as parse_err:
+                                            log_to_file(f"[Auto Capture] Error parsing counts: {parse_err}")
+                                    # Fallback: old format
+                                    if 'Total inserted to database:' in line:
+                                        try:
+                                            inserted_count = int(line.split(':')[-1].strip())
+                                        except:
+                                            pass
+                                    def log_success(msg=line):
+                                        self._parcel_activity_log(msg)
+                                    self._root.after(0, log_success)
+                        
+                        if result.stderr:
+                            log_to_file(f"[Auto Capture] Errors: {result.stderr}")
+                            success_stderr = result.stderr.split('\n')
+                            for line in success_stderr:
+                                if line.strip():
+                                    def log_warn(msg=line):
+                                        self._parcel_activity_log(f"⚠️ {msg}")
+                                    self._root.after(0, log_warn)
+                        
+                        # Determine success status
+                        # Success = any inserts OR all were skipped (duplicates already in DB)
+                        total_processed = inserted_count + skipped_count
+                        is_success = (inserted_count > 0) or (skipped_count > 0 and failed_count == 0)
+                        
+                        if db_insert_error or extraction_error:
+                            error_msg = "; ".join(error_details) if error_details else "Unknown error"
+                            self._root.after(0, lambda m=error_msg: self._parcel_activity_log(f"❌ Batch FAILED: {m}"))
+                            self._root.after(0, lambda: self._safe_stats_update('status', text="❌ DB error - check connection"))
+                        elif failed_count > 0:
+                            self._root.after(0, lambda f=failed_count: self._parcel_activity_log(f"⚠️ Batch completed with {f} insert failures"))
+                            self._root.after(0, lambda: self._safe_stats_update('status', text="⚠️ Partial failure"))
+                        elif is_success:
+                            summary = f"✅ Batch complete: {inserted_count} new, {skipped_count} duplicates"
+                            self._root.after(0, lambda s=summary: self._parcel_activity_log(s))
+                            self._root.after(0, lambda: self._safe_stats_update('status', text="✅ Batch complete, continuing..."))
+                            
+                            # Run matcher to link any unlinked parcels
+                            try:
+                                self._root.after(0, lambda: self._parcel_activity_log("🔗 Running parcel matcher..."))
+                                from link_parcels_by_number import link_parcels_from_json
+                                link_result = link_parcels_from_json()
+                                if link_result and link_result.get('linked', 0) > 0:
+                                    self._root.after(0, lambda r=link_result: self._parcel_activity_log(f"✅ Matcher: {r['linked']} linked"))
+                                else:
+                                    self._root.after(0, lambda: self._parcel_activity_log("✅ All parcels linked"))
+                            except Exception as match_err:
+                                log_to_file(f"[Auto Capture] Matcher error: {match_err}")
+                                self._root.after(0, lambda e=str(match_err): self._parcel_activity_log(f"⚠️ Matcher error: {e}"))
+                        else:
+                            self._root.after(0, lambda: self._parcel_activity_log("⚠️ Batch completed but no records processed"))
+                            self._root.after(0, lambda: self._safe_stats_update('status', text="⚠️ No records - check images"))
+                        
+                        # Refresh the table
+                        self._root.after(0, lambda: self._trigger_parcel_refresh() if hasattr(self, '_trigger_parcel_refresh') else None)
+                        
+                        # Continue immediately to next address
+                        time.sleep(0.5)
+                        
+                    except subprocess.TimeoutExpired:
+                        log_to_file("[Auto Capture] OpenAI processing timed out")
+                        self._root.after(0, destroy_loader)
+                        self._root.after(0, lambda: self._parcel_activity_log("⚠️ OpenAI processing timed out"))
+                    except Exception as proc_err:
+                        log_to_file(f"[Auto Capture] Processing error: {proc_err}")
+                        self._root.after(0, destroy_loader)
+                        self._root.after(0, lambda e=str(proc_err): self._parcel_activity_log(f"❌ Error: {e}"))
+                
                 try:
                     while self._auto_capture_running:
                         # Check if paused
@@ -8030,284 +8327,19 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                         # Update stats
                         self._root.after(0, update_stats)
                         
-                        # Check unprocessed image count (exclude DEBUG and _skipped)
-                        all_images = list(parcels_dir.glob("parcels_*.png"))
-                        unprocessed = [img for img in all_images 
-                                      if not img.stem.endswith('_processed') 
-                                      and not img.stem.endswith('_skipped')
-                                      and not img.stem.startswith('DEBUG_')]
-                        
-                        if len(unprocessed) >= 20:
-                            log_to_file(f"[Auto Capture] Found {len(unprocessed)} unprocessed images - processing batch...")
-                            self._root.after(0, lambda: self._parcel_activity_log(f"📦 Processing batch of {len(unprocessed)} images..."))
-                            self._root.after(0, lambda: self._safe_stats_update('status', text="🔄 Processing with OpenAI..."))
-                            
-                            # Create loader overlay for OpenAI processing
-                            loader_frame = None
-                            loader_start_time = time.time()
-                            loader_cancelled = [False]  # Use list for mutable closure
-                            
-                            def create_loader():
-                                nonlocal loader_frame
-                                try:
-                                    if not activity_win.winfo_exists():
-                                        return
-                                    
-                                    loader_frame = tk.Frame(activity_win, bg="#1C2833", relief="raised", bd=2)
-                                    loader_frame.place(relx=0.5, rely=0.5, anchor="center", width=280, height=180)
-                                    
-                                    # Title
-                                    tk.Label(loader_frame, text="🤖 OpenAI Processing", font=("Segoe UI", 11, "bold"),
-                                            bg="#1C2833", fg="#3498DB").pack(pady=(10, 5))
-                                    
-                                    # Details
-                                    tk.Label(loader_frame, text=f"Processing {len(unprocessed)} images...",
-                                            font=("Segoe UI", 9), bg="#1C2833", fg="#ECF0F1").pack(pady=2)
-                                    
-                                    # Estimated time (approx 2-3 sec per image for API call)
-                                    est_secs = len(unprocessed) * 2.5
-                                    est_str = f"~{int(est_secs//60)}:{int(est_secs%60):02d}" if est_secs >= 60 else f"~{int(est_secs)}s"
-                                    tk.Label(loader_frame, text=f"Est. time: {est_str}",
-                                            font=("Segoe UI", 9), bg="#1C2833", fg="#F39C12").pack(pady=2)
-                                    
-                                    # Progress bar (indeterminate)
-                                    progress = ttk.Progressbar(loader_frame, mode='indeterminate', length=200)
-                                    progress.pack(pady=10)
-                                    progress.start(15)  # Animation speed
-                                    
-                                    # Elapsed time label
-                                    elapsed_lbl = tk.Label(loader_frame, text="Elapsed: 0:00",
-                                                          font=("Consolas", 9), bg="#1C2833", fg="#BDC3C7")
-                                    elapsed_lbl.pack(pady=2)
-                                    
-                                    # Status label
-                                    status_lbl = tk.Label(loader_frame, text="🔄 Sending to OpenAI Vision API...",
-                                                         font=("Segoe UI", 8), bg="#1C2833", fg="#7F8C8D")
-                                    status_lbl.pack(pady=2)
-                                    
-                                    # Update elapsed time every second
-                                    def update_elapsed():
-                                        if loader_cancelled[0] or not loader_frame or not loader_frame.winfo_exists():
-                                            return
-                                        elapsed = time.time() - loader_start_time
-                                        elapsed_lbl.config(text=f"Elapsed: {int(elapsed//60)}:{int(elapsed%60):02d}")
-                                        # Update status based on time
-                                        if elapsed < 5:
-                                            status_lbl.config(text="🔄 Sending images to OpenAI...")
-                                        elif elapsed < 15:
-                                            status_lbl.config(text="🔄 OpenAI analyzing images...")
-                                        elif elapsed < 30:
-                                            status_lbl.config(text="🔄 Extracting parcel data...")
-                                        elif elapsed < 60:
-                                            status_lbl.config(text="🔄 Parsing response & saving...")
-                                        else:
-                                            status_lbl.config(text="🔄 Still processing... please wait")
-                                        activity_win.after(1000, update_elapsed)
-                                    
-                                    activity_win.after(1000, update_elapsed)
-                                except Exception as loader_err:
-                                    log_to_file(f"[Auto Capture] Loader error: {loader_err}")
-                            
-                            def destroy_loader():
-                                nonlocal loader_frame
-                                loader_cancelled[0] = True
-                                try:
-                                    if loader_frame and loader_frame.winfo_exists():
-                                        loader_frame.destroy()
-                                except:
-                                    pass
-                                loader_frame = None
-                            
-                            self._root.after(0, create_loader)
-                            
-                            # Run OpenAI processing
-                            try:
-                                api_key = os.getenv('OPENAI_API_KEY')
-                                if not api_key:
-                                    log_to_file("[Auto Capture] ERROR: OPENAI_API_KEY not set")
-                                    self._root.after(0, destroy_loader)
-                                    self._root.after(0, lambda: self._parcel_activity_log("❌ ERROR: OPENAI_API_KEY environment variable not set!"))
-                                    break
-                                
-                                # Validate API key format
-                                if not api_key.startswith('sk-'):
-                                    log_to_file(f"[Auto Capture] ERROR: Invalid API key format: {api_key[:20]}...")
-                                    self._root.after(0, destroy_loader)
-                                    self._root.after(0, lambda: self._parcel_activity_log("❌ ERROR: Invalid OpenAI API key format!"))
-                                    break
-                                
-                                log_to_file(f"[Auto Capture] Using API key: {api_key[:20]}...{api_key[-4:]}")
-                                self._root.after(0, lambda k=api_key: self._parcel_activity_log(f"🔑 API Key: {k[:20]}...{k[-4:]}"))
-                                
-                                # Run process_with_openai.py and stream output to activity window
-                                # Pass environment variables to subprocess
-                                env = os.environ.copy()
-                                openai_start = time.time()
-                                result = subprocess.run(
-                                    ['python', 'process_with_openai.py'],
-                                    capture_output=True,
-                                    text=True,
-                                    encoding='utf-8',  # Force UTF-8 encoding to handle emojis
-                                    errors='replace',  # Replace invalid characters instead of crashing
-                                    timeout=180,  # 3 minute timeout
-                                    env=env  # Pass environment variables including API key
-                                )
-                                openai_duration = time.time() - openai_start
-                                
-                                # Destroy loader
-                                self._root.after(0, destroy_loader)
-                                
-                                # Log timing
-                                self._root.after(0, lambda d=openai_duration: self._parcel_activity_log(
-                                    f"⏱️ OpenAI API took {d:.1f}s ({d/len(unprocessed):.1f}s/img)"))
-                                
-                                log_to_file(f"[Auto Capture] OpenAI processing complete: {result.returncode}")
-                                
-                                # Check if processing was successful
-                                if result.returncode != 0:
-                                    log_to_file(f"[Auto Capture] ERROR: OpenAI processing failed with code {result.returncode}")
-                                    self._root.after(0, lambda: self._parcel_activity_log(f"❌ OpenAI processing failed! Return code: {result.returncode}"))
-                                    
-                                    # Show stdout (errors are printed there)
-                                    is_fatal_error = False
-                                    if result.stdout:
-                                        log_to_file(f"[Auto Capture] Error output: {result.stdout}")
-                                        output_lines = result.stdout.split('\n')
-                                        for line in output_lines:
-                                            if line.strip():
-                                                # Check for fatal errors that shouldn't retry
-                                                if 'invalid_api_key' in line.lower() or 'incorrect api key' in line.lower() or 'authentication' in line.lower():
-                                                    is_fatal_error = True
-                                                # Use a proper closure to capture the line value
-                                                def log_line(msg=line):
-                                                    self._parcel_activity_log(f"🔴 {msg}")
-                                                self._root.after(0, log_line)
-                                    
-                                    # Show stderr if any
-                                    if result.stderr:
-                                        log_to_file(f"[Auto Capture] Stderr: {result.stderr}")
-                                        stderr_lines = result.stderr.split('\n')
-                                        for line in stderr_lines:
-                                            if line.strip():
-                                                def log_err(msg=line):
-                                                    self._parcel_activity_log(f"⚠️ {msg}")
-                                                self._root.after(0, log_err)
-                                    
-                                    # Stop on fatal errors, pause on retryable errors
-                                    if is_fatal_error:
-                                        log_to_file("[Auto Capture] FATAL ERROR: Stopping automation (bad API key or auth issue)")
-                                        self._root.after(0, lambda: self._parcel_activity_log("❌ FATAL ERROR: Invalid API key! Stopping automation."))
-                                        self._root.after(0, lambda: self._safe_stats_update('status', text="❌ Fatal error - stopped"))
-                                        break  # Stop completely
-                                    else:
-                                        self._root.after(0, lambda: self._safe_stats_update('status', text="❌ Processing failed"))
-                                        time.sleep(0.5)
-                                        continue  # Retry on non-fatal errors
-                                
-                                # Show detailed output in activity window
-                                db_insert_error = False
-                                inserted_count = 0
-                                skipped_count = 0
-                                failed_count = 0
-                                extraction_error = False
-                                error_details = []
-                                
-                                if result.stdout:
-                                    log_to_file(f"[Auto Capture] Output: {result.stdout}")
-                                    # Parse and display key information
-                                    success_lines = result.stdout.split('\n')
-                                    for line in success_lines:
-                                        if line.strip():
-                                            # Check for CRITICAL database errors (not API tracking logs)
-                                            if '❌ Database error:' in line or 'Failed to connect' in line:
-                                                db_insert_error = True
-                                                error_details.append(line.strip())
-                                            # Check for extraction errors
-                                            if 'ERROR: OpenAI returned no data' in line:
-                                                extraction_error = True
-                                                error_details.append("OpenAI extraction returned no data")
-                                            # Extract counts from summary line: "8 inserted, 10 skipped (duplicates), 0 failed"
-                                            if 'Database insert complete:' in line or 'inserted,' in line:
-                                                try:
-                                                    # Parse: "8 inserted, 10 skipped (duplicates), 0 failed"
-                                                    import re
-                                                    inserted_match = re.search(r'(\d+)\s+inserted', line)
-                                                    skipped_match = re.search(r'(\d+)\s+skipped', line)
-                                                    failed_match = re.search(r'(\d+)\s+failed', line)
-                                                    if inserted_match:
-                                                        inserted_count = int(inserted_match.group(1))
-                                                    if skipped_match:
-                                                        skipped_count = int(skipped_match.group(1))
-                                                    if failed_match:
-                                                        failed_count = int(failed_match.group(1))
-                                                except Exception as parse_err:
-                                                    log_to_file(f"[Auto Capture] Error parsing counts: {parse_err}")
-                                            # Fallback: old format
-                                            if 'Total inserted to database:' in line:
-                                                try:
-                                                    inserted_count = int(line.split(':')[-1].strip())
-                                                except:
-                                                    pass
-                                            def log_success(msg=line):
-                                                self._parcel_activity_log(msg)
-                                            self._root.after(0, log_success)
-                                
-                                if result.stderr:
-                                    log_to_file(f"[Auto Capture] Errors: {result.stderr}")
-                                    success_stderr = result.stderr.split('\n')
-                                    for line in success_stderr:
-                                        if line.strip():
-                                            def log_warn(msg=line):
-                                                self._parcel_activity_log(f"⚠️ {msg}")
-                                            self._root.after(0, log_warn)
-                                
-                                # Determine success status
-                                # Success = any inserts OR all were skipped (duplicates already in DB)
-                                total_processed = inserted_count + skipped_count
-                                is_success = (inserted_count > 0) or (skipped_count > 0 and failed_count == 0)
-                                
-                                if db_insert_error or extraction_error:
-                                    error_msg = "; ".join(error_details) if error_details else "Unknown error"
-                                    self._root.after(0, lambda m=error_msg: self._parcel_activity_log(f"❌ Batch FAILED: {m}"))
-                                    self._root.after(0, lambda: self._safe_stats_update('status', text="❌ DB error - check connection"))
-                                elif failed_count > 0:
-                                    self._root.after(0, lambda f=failed_count: self._parcel_activity_log(f"⚠️ Batch completed with {f} insert failures"))
-                                    self._root.after(0, lambda: self._safe_stats_update('status', text="⚠️ Partial failure"))
-                                elif is_success:
-                                    summary = f"✅ Batch complete: {inserted_count} new, {skipped_count} duplicates"
-                                    self._root.after(0, lambda s=summary: self._parcel_activity_log(s))
-                                    self._root.after(0, lambda: self._safe_stats_update('status', text="✅ Batch complete, continuing..."))
-                                    
-                                    # Run matcher to link any unlinked parcels
-                                    try:
-                                        self._root.after(0, lambda: self._parcel_activity_log("🔗 Running parcel matcher..."))
-                                        from link_parcels_by_number import link_parcels_from_json
-                                        link_result = link_parcels_from_json()
-                                        if link_result and link_result.get('linked', 0) > 0:
-                                            self._root.after(0, lambda r=link_result: self._parcel_activity_log(f"✅ Matcher: {r['linked']} linked"))
-                                        else:
-                                            self._root.after(0, lambda: self._parcel_activity_log("✅ All parcels linked"))
-                                    except Exception as match_err:
-                                        log_to_file(f"[Auto Capture] Matcher error: {match_err}")
-                                        self._root.after(0, lambda e=str(match_err): self._parcel_activity_log(f"⚠️ Matcher error: {e}"))
-                                else:
-                                    self._root.after(0, lambda: self._parcel_activity_log("⚠️ Batch completed but no records processed"))
-                                    self._root.after(0, lambda: self._safe_stats_update('status', text="⚠️ No records - check images"))
-                                
-                                # Refresh the table
-                                self._root.after(0, lambda: self._trigger_parcel_refresh() if hasattr(self, '_trigger_parcel_refresh') else None)
-                                
-                                # Continue immediately to next address
-                                time.sleep(0.5)
-                                
-                            except subprocess.TimeoutExpired:
-                                log_to_file("[Auto Capture] OpenAI processing timed out")
-                                self._root.after(0, destroy_loader)
-                                self._root.after(0, lambda: self._parcel_activity_log("⚠️ OpenAI processing timed out"))
-                            except Exception as proc_err:
-                                log_to_file(f"[Auto Capture] Processing error: {proc_err}")
-                                self._root.after(0, destroy_loader)
-                                self._root.after(0, lambda e=str(proc_err): self._parcel_activity_log(f"❌ Error: {e}"))
+                        # Unprocessed images come from the manifest (every save above registers its image)
+                        unprocessed = get_parcel_manifest().pending()
+                        
+                        # OpenAI batches run in the background so the browser keeps capturing;
+                        # only wait when too many captures are queued behind a running batch
+                        batch_busy = openai_batch_thread[0] is not None and openai_batch_thread[0].is_alive()
+                        if len(unprocessed) >= 20 and not batch_busy:
+                            openai_batch_thread[0] = threading.Thread(target=_run_openai_batch, args=(unprocessed,), daemon=True)
+                            openai_batch_thread[0].start()
+                        elif batch_busy and len(unprocessed) >= openai_backlog_max:
+                            self._root.after(0, lambda n=len(unprocessed): self._safe_stats_update('status', text=f"⏳ {n} captures waiting for OpenAI..."))
+                            time.sleep(1)
+                            continue
                         
                         if not self._auto_capture_running:
                             break
@@ -8374,6 +8406,11 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                 except Exception as chrome_err:
                                     log_to_file(f"[Auto Capture] Error closing Chrome: {chrome_err}")
                                 
+                                # Let a running OpenAI batch finish first
+                                if openai_batch_thread[0] is not None and openai_batch_thread[0].is_alive():
+                                    self._root.after(0, lambda: self._parcel_activity_log("⏳ Waiting for OpenAI batch to finish..."))
+                                    openai_batch_thread[0].join()
+                                
                                 # Process remaining JSON files and insert to database
                                 try:
                                     log_to_file("[Auto Capture] Processing remaining JSON files...")
@@ -8833,6 +8870,7 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                             # Save the detected popup
                                             save_path = parcels_dir / f"parcels_{addr_id}.png"
                                             popup_image.save(save_path)
+                                            get_parcel_manifest().capture(save_path)
                                             log_to_file(f"[Auto Capture] Saved to {save_path}")
                                             self._root.after(0, lambda: self._parcel_activity_log(f"✅ Captured ID: {addr_id}"))
                                             
@@ -8909,6 +8947,7 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                                     manual_popup = full_screenshot.crop((rx1_adj, ry1, rx2_adj, ry2))
                                                     save_path = parcels_dir / f"parcels_{addr_id}.png"
                                                     manual_popup.save(save_path)
+                                                    get_parcel_manifest().capture(save_path)
                                                     self._root.after(0, lambda: self._parcel_activity_log(f"✅ Manual capture saved: {addr_id}"))
                                                     self._root.after(0, lambda p=str(save_path), i=addr_id: self._update_preview_image(p, i))
                                             else:
@@ -8940,6 +8979,7 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                         # Save full screenshot and show for manual confirmation
                                         save_path = parcels_dir / f"parcels_{addr_id}.png"
                                         full_screenshot.save(save_path)
+                                        get_parcel_manifest().capture(save_path)
                                         log_to_file(f"[Auto Capture] No popup detected, saved full: {save_path}")
                                         self._root.after(0, lambda p=str(save_path), i=addr_id: self._update_preview_image(p, i))
                                     
@@ -9193,6 +9233,7 @@ Note: You need an active NordVPN subscription to use the VPN feature."""
                                     if popup_image:
                                         save_path = parcels_dir / f"parcels_{addr_id}.png"
                                         popup_image.save(save_path)
+                                        get_parcel_manifest().capture(save_path)
                                         self._root.after(0, lambda: self._parcel_activity_log(f"✅ Saved ID: {addr_id}"))
                                         self._root.after(0, lambda p=str(save_path), i=addr_id: self._update_preview_image(p, i))
                                     
@@ -12287,39 +12328,7 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
                     cursor.close()
                     conn.close()
                     
-                    def strip_unit_display(address):
-                        """Remove unit numbers and building names from address for display, keeping city/state"""
-                        if not address:
-                            return address
-                        import re
-                        
-                        # If address starts with a letter (not a digit), it's likely a building name
-                        # Split on comma and use the part after the first comma as the address
-                        # Example: "The Maverick, 123 Main St, Seattle, WA" -> "123 Main St, Seattle, WA"
-                        if address and address[0].isalpha():
-                            parts = address.split(',', 1)
-                            if len(parts) > 1:
-                                # Check if the second part looks like a street address (starts with number)
-                                second_part = parts[1].strip()
-                                if second_part and second_part[0].isdigit():
-                                    address = second_part
-                        
-                        # Remove only the unit portion, not what follows (city/state)
-                        # Match unit patterns followed by comma or end of string
-                        patterns = [
-                            r'\s*#\d+[A-Za-z]?\s*(?=,|$)',  # #34 or #34A before comma or end
-                            r'\s*Unit\s+[A-Za-z0-9]+\s*(?=,|$)',  # Unit 123 before comma or end
-                            r'\s*Apt\.?\s+[A-Za-z0-9]+\s*(?=,|$)',  # Apt A or Apt. A before comma or end
-                            r'\s*Suite\s+[A-Za-z0-9]+\s*(?=,|$)',  # Suite X before comma or end
-                            r'\s*Ste\.?\s+[A-Za-z0-9]+\s*(?=,|$)',  # Ste X before comma or end
-                        ]
-                        cleaned = address
-                        for pattern in patterns:
-                            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-                        # Clean up any double commas or leading commas that might result
-                        cleaned = re.sub(r',\s*,', ',', cleaned)
-                        cleaned = re.sub(r'^\s*,\s*', '', cleaned)
-                        return cleaned.strip()
+                    from address_normalize import strip_unit
                     
                     rows = []
                     parcel_link_found = None
@@ -12331,7 +12340,7 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
                             log_to_file(f"[Parcel] Found parcel_link: {plink}")
                         
                         # Get address and log if empty
-                        address = strip_unit_display(parcel.get('address') or '')
+                        address = strip_unit(parcel.get('address') or '', drop_name=True)
                         if not address:
                             log_to_file(f"[Parcel] Row {parcel.get('id')}: No address found in query result")
                             continue
@@ -17390,6 +17399,14 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
         downloaded = 0
         skipped = 0
         failed = 0
+        placeholders = 0
+        aliased = 0
+        
+        # Perceptual-hash filter: drop placeholders, alias repeats of an image we already have
+        from image_phash import get_image_hash_db
+        hash_db = get_image_hash_db()
+        # Thumbnails go to the remote /thumbnails folder; duplicates are only aliased within it
+        thumbs_remote_dir = "/home/daniel/assets/trustyhousing.com/thumbnails"
         
         log_to_file(f"[Queue] Starting download loop for {total_listings} listings...")
         
@@ -17439,18 +17456,43 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
                 else:
                     log_to_file(f"[Queue] ⚠️ File exists but is 0 bytes, will re-download: {filename}")
             
+            # Known placeholder / already-seen URL: no download needed
+            verdict, canonical = hash_db.check_url(img_url, thumbs_remote_dir)
+            if verdict == "placeholder":
+                log_to_file(f"[Queue] ⏭️ Placeholder image, skipping: {img_url}")
+                placeholders += 1
+                continue
+            if verdict == "duplicate" and canonical != filename:
+                log_to_file(f"[Queue] ⏭️ Same image as {canonical}, aliasing: {filename}")
+                hash_db.alias(filename, canonical, thumbs_remote_dir)
+                aliased += 1
+                continue
+            
             # Download
             try:
                 log_to_file(f"[Queue] 📥 Downloading: {img_url}")
                 headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                response = requests.get(img_url, headers=headers, timeout=30, stream=True)
+                response = requests.get(img_url, headers=headers, timeout=30)
                 log_to_file(f"[Queue] Response status: {response.status_code}")
                 response.raise_for_status()
                 
+                try:
+                    verdict, canonical = hash_db.check(response.content, name=filename, url=img_url, remote_dir=thumbs_remote_dir)
+                except Exception as hash_err:
+                    log_to_file(f"[Queue] Could not hash image (saving anyway): {hash_err}")
+                    verdict, canonical = "new", None
+                if verdict == "placeholder":
+                    log_to_file(f"[Queue] ⏭️ Placeholder image, skipping: {img_url}")
+                    placeholders += 1
+                    continue
+                if verdict == "duplicate":
+                    log_to_file(f"[Queue] ⏭️ Same image as {canonical}, aliasing: {filename}")
+                    hash_db.alias(filename, canonical, thumbs_remote_dir)
+                    aliased += 1
+                    continue
+                
                 log_to_file(f"[Queue] Writing to file: {save_path}")
-                with open(save_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+                save_path.write_bytes(response.content)
                 
                 file_size = save_path.stat().st_size
                 log_to_file(f"[Queue] ✅ Downloaded: {filename} ({file_size:,} bytes)")
@@ -17463,8 +17505,10 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
                 print(f"[3.IMAGE] ✗ Failed: {listing_id} - {img_err}")
                 failed += 1
         
+        hash_db.save()
+        
         log_to_file(f"[Queue] ========== DOWNLOAD IMAGES COMPLETE ==========")
-        log_to_file(f"[Queue] Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
+        log_to_file(f"[Queue] Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}, Placeholders: {placeholders}, Aliased: {aliased}")
         log_to_file(f"[Queue] Images saved to: {images_dir}")
         log_to_file(f"[Queue] Verifying images directory contents...")
         if images_dir.exists():
@@ -17472,12 +17516,17 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
             log_to_file(f"[Queue] Actual PNG files in directory: {len(actual_files)}")
             if len(actual_files) > 0:
                 log_to_file(f"[Queue] Sample files: {[f.name for f in actual_files[:5]]}")
-        print(f"[3.IMAGE] ✅ Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}")
+        print(f"[3.IMAGE] ✅ Downloaded: {downloaded}, Skipped: {skipped}, Failed: {failed}, Placeholders: {placeholders}, Aliased: {aliased}")
         
-        return f"✅ Downloaded {downloaded} images (skipped {skipped}, failed {failed})"
+        return f"✅ Downloaded {downloaded} images (skipped {skipped}, failed {failed}, placeholders {placeholders}, aliased {aliased})"
     
     def _step_process_db(self, job_id):
         """Step 4: Upload images to server with progress bar"""
+        # Import SFTP credentials here to avoid circular import
+        from config_helpers import SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS
+        from config_sftp import get_sftp_pool, SFTPDirSync
+        from image_phash import link_image_aliases
+        
         log_to_file(f"[Queue] ========== UPLOAD IMAGES TO SERVER START ==========")
         log_to_file(f"[Queue] Uploading images for job {job_id}")
         print(f"[4.DB] Starting image upload for job {job_id}")
@@ -17550,25 +17599,26 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
                                bg="#2C3E50", fg="#3498DB", font=("Segoe UI", 9))
         status_label.pack(pady=5)
         
-        # Control variables for pause/resume
-        paused = {"value": False}
-        cancelled = {"value": False}
+        # Control variables for pause/resume (read by the upload worker threads)
+        pause_event = threading.Event()
+        cancel_event = threading.Event()
         
         # Button frame
         btn_frame = tk.Frame(progress_window, bg="#2C3E50")
         btn_frame.pack(pady=10)
         
         def toggle_pause():
-            paused["value"] = not paused["value"]
-            if paused["value"]:
+            if not pause_event.is_set():
+                pause_event.set()
                 pause_btn.config(text="▶ Resume", bg="#27AE60")
                 status_label.config(text="⏸ Paused", fg="#F39C12")
             else:
+                pause_event.clear()
                 pause_btn.config(text="⏸ Pause", bg="#F39C12")
                 status_label.config(text="▶ Resuming...", fg="#3498DB")
         
         def cancel_upload():
-            cancelled["value"] = True
+            cancel_event.set()
             status_label.config(text="❌ Cancelling...", fg="#E74C3C")
         
         pause_btn = tk.Button(btn_frame, text="⏸ Pause", command=toggle_pause,
@@ -17585,134 +17635,113 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
         
         # Upload images via SFTP
         remote_dir = f"/home/daniel/assets/trustyhousing.com/thumbnails"
-        
-        uploaded = 0
-        skipped = 0
-        failed = 0
         start_time = time.time()
         
         try:
-            # Connect to SFTP
+            # Shared persistent connection; files go up over several channels at once
             log_to_file(f"[Queue] Connecting to SFTP server {SFTP_HOST}:{SFTP_PORT}")
-            transport, sftp = _sftp_connect(SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS)
+            pool = get_sftp_pool(SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS)
             
             # Create remote directory
-            _sftp_ensure_dir(sftp, remote_dir)
+            pool.ensure_dir(remote_dir)
             log_to_file(f"[Queue] Remote directory ready: {remote_dir}")
             
-            # Get list of existing files on server to skip duplicates
-            existing_files = set()
-            try:
-                existing_files = set(sftp.listdir(remote_dir))
-                log_to_file(f"[Queue] Found {len(existing_files)} existing files on server")
-            except Exception as list_err:
-                log_to_file(f"[Queue] Could not list remote files (continuing anyway): {list_err}")
-            
-            for idx, image_file in enumerate(image_files, 1):
-                # Check if cancelled
-                if cancelled["value"]:
-                    log_to_file(f"[Queue] Upload cancelled by user at {idx}/{total_images}")
-                    progress_label.config(text=f"❌ Cancelled at {idx}/{total_images}")
-                    status_label.config(text=f"Uploaded: {uploaded}, Failed: {failed}", fg="#E74C3C")
-                    progress_window.update()
-                    time.sleep(2)
-                    progress_window.destroy()
-                    raise Exception(f"Upload cancelled by user. Uploaded: {uploaded}/{total_images}")
-                
-                # Wait while paused
-                while paused["value"]:
-                    progress_window.update()
-                    time.sleep(0.1)
-                    if cancelled["value"]:
-                        break
-                
+            # Only send files the sync manifest hasn't recorded as already on the server
+            syncer = SFTPDirSync(pool, images_dir, remote_dir)
+            to_upload = syncer.pending(image_files)
+            unchanged = total_images - len(to_upload)
+            log_to_file(f"[Queue] {len(to_upload)} new/changed, {unchanged} already on server")
+            
+            # Worker threads report through this queue; only this thread touches the widgets
+            events = queue.Queue()
+            outcome = {}
+            
+            def run_upload():
                 try:
-                    # Check if file already exists on server
-                    if image_file.name in existing_files:
-                        skipped += 1
-                        log_to_file(f"[Queue] ⊘ Skipped (exists): {image_file.name}")
-                        status_label.config(text=f"⊘ Skipped: {image_file.name} (already exists)", fg="#95A5A6")
-                        progress_window.update()
-                        continue
-                    
-                    # Update progress
-                    progress_bar['value'] = idx - 1
-                    progress_label.config(text=f"Uploading: {image_file.name} ({idx}/{total_images})")
-                    
-                    # Calculate estimated time
-                    if idx > 1:
-                        elapsed = time.time() - start_time
-                        avg_time_per_image = elapsed / (idx - 1)
-                        remaining_images = total_images - (idx - 1)
-                        estimated_seconds = avg_time_per_image * remaining_images
-                        
-                        if estimated_seconds < 60:
-                            eta_text = f"ETA: {int(estimated_seconds)}s"
-                        elif estimated_seconds < 3600:
-                            minutes = int(estimated_seconds / 60)
-                            seconds = int(estimated_seconds % 60)
-                            eta_text = f"ETA: {minutes}m {seconds}s"
-                        else:
-                            hours = int(estimated_seconds / 3600)
-                            minutes = int((estimated_seconds % 3600) / 60)
-                            eta_text = f"ETA: {hours}h {minutes}m"
-                        
-                        time_label.config(text=eta_text)
-                    
-                    progress_window.update()
-                    
-                    # Upload file
-                    remote_path = f"{remote_dir}/{image_file.name}"
-                    log_to_file(f"[Queue] Uploading: {image_file} -> {remote_path}")
-                    sftp.put(str(image_file), remote_path)
-                    
-                    file_size = image_file.stat().st_size
-                    uploaded += 1
-                    
-                    status_label.config(text=f"✓ {image_file.name} ({file_size:,} bytes)", fg="#2ECC71")
-                    progress_window.update()
-                    
-                    log_to_file(f"[Queue] ✓ Uploaded [{idx}/{total_images}]: {image_file.name}")
-                    
-                    # Small delay
-                    time.sleep(0.1)
-                    
-                except Exception as upload_err:
-                    failed += 1
-                    error_msg = str(upload_err)
-                    status_label.config(text=f"✗ Failed: {image_file.name}", fg="#E74C3C")
-                    log_to_file(f"[Queue] ✗ Upload failed: {image_file.name} - {error_msg}")
-                    progress_window.update()
-                    
-                    # Stop upload on error and show detailed error
-                    log_to_file(f"[Queue] Stopping upload due to error")
-                    progress_label.config(text=f"❌ Upload failed at {idx}/{total_images}")
-                    time_label.config(text=f"Error: {error_msg[:50]}")
-                    
-                    # Show error details in a larger label
-                    error_detail = tk.Label(progress_window, 
-                                           text=f"Error details: {error_msg[:100]}", 
-                                           bg="#2C3E50", fg="#E74C3C", 
-                                           font=("Segoe UI", 8),
-                                           wraplength=450)
-                    error_detail.pack(pady=5)
-                    
+                    outcome["result"] = pool.upload_many(
+                        to_upload,
+                        progress_callback=lambda *ev: events.put(ev),
+                        cancel_event=cancel_event, pause_event=pause_event,
+                        stop_on_error=True)
+                    syncer.apply_result(outcome["result"])
+                    outcome["aliases"] = link_image_aliases(pool, remote_dir)
+                except Exception as run_err:
+                    outcome["error"] = run_err
+            
+            upload_thread = threading.Thread(target=run_upload, daemon=True)
+            upload_thread.start()
+            
+            first_error = None
+            while upload_thread.is_alive() or not events.empty():
+                try:
+                    idx, _total, filename, status_type, message = events.get(timeout=0.05)
+                except queue.Empty:
                     progress_window.update()
-                    time.sleep(5)  # Show error for 5 seconds
-                    progress_window.destroy()
-                    
-                    # Close SFTP before raising
-                    try:
-                        sftp.close()
-                        transport.close()
-                    except:
-                        pass
-                    
-                    raise Exception(f"Upload failed at {idx}/{total_images}: {error_msg}")
-            
-            # Close SFTP connection
-            sftp.close()
-            transport.close()
+                    continue
+                
+                idx += unchanged
+                progress_bar['value'] = idx
+                if status_type == "uploading":
+                    progress_label.config(text=f"Uploading: {filename} ({idx}/{total_images})")
+                elif status_type == "uploaded":
+                    status_label.config(text=f"✓ {filename} - {message}", fg="#2ECC71")
+                    log_to_file(f"[Queue] ✓ Uploaded [{idx}/{total_images}]: {filename}")
+                elif status_type == "skipped":
+                    status_label.config(text=f"⊘ Skipped: {filename} (already exists)", fg="#95A5A6")
+                    log_to_file(f"[Queue] ⊘ Skipped (exists): {filename}")
+                elif status_type == "failed":
+                    status_label.config(text=f"✗ Failed: {filename}", fg="#E74C3C")
+                    log_to_file(f"[Queue] ✗ Upload failed: {filename} - {message}")
+                    if first_error is None:
+                        first_error = (idx, message)
+                
+                # Calculate estimated time
+                if idx > unchanged:
+                    elapsed = time.time() - start_time
+                    estimated_seconds = elapsed / (idx - unchanged) * (total_images - idx)
+                    if estimated_seconds < 60:
+                        eta_text = f"ETA: {int(estimated_seconds)}s"
+                    elif estimated_seconds < 3600:
+                        eta_text = f"ETA: {int(estimated_seconds / 60)}m {int(estimated_seconds % 60)}s"
+                    else:
+                        eta_text = f"ETA: {int(estimated_seconds / 3600)}h {int((estimated_seconds % 3600) / 60)}m"
+                    time_label.config(text=eta_text)
+                
+                progress_window.update()
+            
+            if "error" in outcome:
+                raise outcome["error"]
+            result = outcome["result"]
+            uploaded, skipped, failed = result["uploaded"], unchanged, result["failed"]
+            if outcome.get("aliases"):
+                log_to_file(f"[Queue] Linked {outcome['aliases']} duplicate image(s) to their canonical file")
+            
+            if first_error is not None:
+                # Stop upload on error and show detailed error
+                idx, error_msg = first_error
+                log_to_file(f"[Queue] Stopping upload due to error")
+                progress_label.config(text=f"❌ Upload failed at {idx}/{total_images}")
+                time_label.config(text=f"Error: {error_msg[:50]}")
+                
+                # Show error details in a larger label
+                error_detail = tk.Label(progress_window, 
+                                       text=f"Error details: {error_msg[:100]}", 
+                                       bg="#2C3E50", fg="#E74C3C", 
+                                       font=("Segoe UI", 8),
+                                       wraplength=450)
+                error_detail.pack(pady=5)
+                
+                progress_window.update()
+                time.sleep(5)  # Show error for 5 seconds
+                raise Exception(f"Upload failed at {idx}/{total_images}: {error_msg}")
+            
+            if cancel_event.is_set():
+                log_to_file(f"[Queue] Upload cancelled by user after {uploaded + skipped}/{total_images}")
+                progress_label.config(text=f"❌ Cancelled at {uploaded + skipped}/{total_images}")
+                status_label.config(text=f"Uploaded: {uploaded}, Failed: {failed}", fg="#E74C3C")
+                progress_window.update()
+                time.sleep(2)
+                raise Exception(f"Upload cancelled by user. Uploaded: {uploaded}/{total_images}")
             
             # Final progress update
             progress_bar['value'] = total_images
@@ -17749,7 +17778,9 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
     def _step_process_db_with_progress(self, job_id, progress_callback):
         """Step 4: Upload images to server with progress callback (no popup window)"""
         # Import SFTP credentials here to avoid circular import
-        from config_helpers import SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS, _sftp_connect, _sftp_ensure_dir
+        from config_helpers import SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS
+        from config_sftp import get_sftp_pool, SFTPDirSync
+        from image_phash import link_image_aliases
         
         log_to_file(f"[Queue] ========== UPLOAD IMAGES TO SERVER START (WITH CALLBACK) ==========")
         log_to_file(f"[Queue] Uploading images for job {job_id}")
@@ -17784,68 +17815,30 @@ Extract EVERY piece of information. Use null for missing fields. Create one entr
         
         # Upload images via SFTP
         remote_dir = f"/home/daniel/assets/trustyhousing.com/thumbnails"
-        
-        uploaded = 0
-        skipped = 0
-        failed = 0
         start_time = time.time()
         
-        # Connect to SFTP
+        # Shared persistent connection; files go up over several channels at once
         log_to_file(f"[Queue] Connecting to SFTP server {SFTP_HOST}:{SFTP_PORT}")
-        transport, sftp = _sftp_connect(SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS)
+        pool = get_sftp_pool(SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS)
         
         # Create remote directory
-        _sftp_ensure_dir(sftp, remote_dir)
+        pool.ensure_dir(remote_dir)
         log_to_file(f"[Queue] Remote directory ready: {remote_dir}")
         
-        # Get list of existing files on server to skip duplicates
-        existing_files = set()
-        try:
-            existing_files = set(sftp.listdir(remote_dir))
-            log_to_file(f"[Queue] Found {len(existing_files)} existing files on server")
-        except Exception as list_err:
-            log_to_file(f"[Queue] Could not list remote files (continuing anyway): {list_err}")
-        
-        for idx, image_file in enumerate(image_files, 1):
-            try:
-                filename = image_file.name
-                
-                # Check if file already exists on server
-                if filename in existing_files:
-                    skipped += 1
-                    log_to_file(f"[Queue] ⊘ Skipped (exists): {filename}")
-                    progress_callback(idx, total_images, filename, "skipped", "Already exists on server")
-                    continue
-                
-                # Update progress - uploading
-                progress_callback(idx, total_images, filename, "uploading", "Uploading...")
-                
-                # Upload file
-                remote_path = f"{remote_dir}/{filename}"
-                log_to_file(f"[Queue] Uploading: {image_file} -> {remote_path}")
-                sftp.put(str(image_file), remote_path)
-                
-                file_size = image_file.stat().st_size
-                uploaded += 1
-                
-                log_to_file(f"[Queue] ✓ Uploaded [{idx}/{total_images}]: {filename}")
-                progress_callback(idx, total_images, filename, "uploaded", f"Uploaded ({file_size:,} bytes)")
-                
-                # Small delay
-                time.sleep(0.1)
-                
-            except Exception as upload_err:
-                failed += 1
-                error_msg = str(upload_err)
-                log_to_file(f"[Queue] ✗ Upload failed: {filename} - {error_msg}")
-                progress_callback(idx, total_images, filename, "failed", error_msg)
-                
-                # Continue with next file instead of stopping
-                continue
-        
-        # Close SFTP connection
-        sftp.close()
-        transport.close()
+        # Only send files the sync manifest hasn't recorded as already on the server
+        syncer = SFTPDirSync(pool, thumbnails_dir, remote_dir)
+        to_upload = syncer.pending(image_files)
+        log_to_file(f"[Queue] {len(to_upload)} new/changed, {total_images - len(to_upload)} already on server")
+        
+        # Failed files don't stop the batch; the callback gets every status change
+        result = pool.upload_many(to_upload, progress_callback=progress_callback)
+        syncer.apply_result(result)
+        uploaded, skipped, failed = result["uploaded"], total_images - len(to_upload), result["failed"]
+        linked = link_image_aliases(pool, remote_dir)
+        if linked:
+            log_to_file(f"[Queue] Linked {linked} duplicate image(s) to their canonical file")
+        for failed_path, error_msg in result["errors"].items():
+            log_to_file(f"[Queue] ✗ Upload failed: {Path(failed_path).name} - {error_msg}")
         
         elapsed_total = time.time() - start_time
         
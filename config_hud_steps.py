@@ -8,6 +8,7 @@ Extracted from config_hud.py (lines 5465-6327)
 from config_core import *
 from config_hud_db import update_db_status
 from config_helpers import launch_manual_browser, launch_manual_browser_docked_right, launch_manual_browser_docked_left
+from config_address_match import show_address_match_window
 
 class HUDSteps:
     """Mixin class for step execution methods"""
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent pooled SFTP client
+One long-lived SSH transport per server, N SFTP channels on top of it,
+reconnect on failure and a cache of remote directories already known to exist.
+SFTPDirSync adds a local manifest so a folder sync only sends new/changed files.
+"""
+
+from config_core import *
+import atexit
+import hashlib
+import socket
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+SFTP_CHANNELS = int(os.getenv("SFTP_CHANNELS", "4"))
+SFTP_KEEPALIVE_SEC = int(os.getenv("SFTP_KEEPALIVE_SEC", "30"))
+SFTP_MANIFEST_PATH = Path(os.getenv("SFTP_MANIFEST_PATH", str(BASE_DIR / "sftp_manifest.json")))
+# How often a sync re-lists the remote side to catch files deleted/changed there
+SFTP_RECONCILE_SEC = int(os.getenv("SFTP_RECONCILE_SEC", str(24 * 3600)))
+# Parallel HEAD requests used to check uploaded files are publicly reachable
+PUBLIC_VERIFY_WORKERS = int(os.getenv("PUBLIC_VERIFY_WORKERS", "8"))
+
+
+class SFTPPool:
+    """Thread-safe SFTP connection manager.
+
+    All channels share one paramiko Transport. If the transport dies, the next
+    caller reconnects and the stale channels are discarded as they come back.
+    `put` uses paramiko's pipelined writes, so many small files and a few
+    channels in parallel keep the link busy instead of waiting on round trips.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 channels: int = SFTP_CHANNELS, keepalive: int = SFTP_KEEPALIVE_SEC):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.channels = max(1, int(channels))
+        self.keepalive = keepalive
+        self._lock = threading.RLock()
+        self._transport = None
+        self._generation = 0
+        self._idle = queue.Queue()
+        self._known_dirs = set()
+
+    # ---------- connection ----------
+    def _is_alive(self) -> bool:
+        t = self._transport
+        return t is not None and t.is_active()
+
+    def _close_locked(self):
+        while True:
+            try:
+                _, sftp = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                sftp.close()
+            except Exception:
+                pass
+        if self._transport is not None:
+            try:
+                self._transport.close()
+            except Exception:
+                pass
+        self._transport = None
+
+    def _ensure_connected(self):
+        with self._lock:
+            if self._is_alive():
+                return
+            if self._transport is not None:
+                log_to_file(f"[SFTP] Connection to {self.host}:{self.port} lost, reconnecting")
+            self._close_locked()
+            transport = paramiko.Transport((self.host, self.port))
+            transport.connect(username=self.user, password=self.password)
+            if self.keepalive:
+                transport.set_keepalive(self.keepalive)
+            self._transport = transport
+            self._generation += 1
+            for _ in range(self.channels):
+                self._idle.put((self._generation, paramiko.SFTPClient.from_transport(transport)))
+            log_to_file(f"[SFTP] Connected to {self.host}:{self.port} with {self.channels} channel(s)")
+
+    @contextmanager
+    def channel(self):
+        """Borrow one SFTP channel; it goes back to the pool afterwards."""
+        while True:
+            self._ensure_connected()
+            try:
+                gen, sftp = self._idle.get(timeout=1.0)
+                break
+            except queue.Empty:
+                continue
+        try:
+            yield sftp
+        finally:
+            with self._lock:
+                if gen == self._generation and self._is_alive():
+                    self._idle.put((gen, sftp))
+                else:
+                    try:
+                        sftp.close()
+                    except Exception:
+                        pass
+
+    def _call(self, fn, retries: int = 1):
+        """Run fn(sftp) on a pooled channel, retrying once if the connection dropped."""
+        for attempt in range(retries + 1):
+            try:
+                with self.channel() as sftp:
+                    return fn(sftp)
+            except (paramiko.SSHException, EOFError, socket.error):
+                # Plain remote errors (missing file, permissions) are not worth a retry
+                if attempt >= retries or self._is_alive():
+                    raise
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+    # ---------- operations ----------
+    def ensure_dir(self, remote_dir: str):
+        """Create remote_dir and its parents, skipping anything already seen."""
+        remote_dir = "/" + remote_dir.strip("/")
+        if remote_dir in self._known_dirs:
+            return
+
+        def _mk(sftp):
+            cur = ""
+            for part in remote_dir.strip("/").split("/"):
+                cur = f"{cur}/{part}"
+                if cur in self._known_dirs:
+                    continue
+                try:
+                    sftp.stat(cur)
+                except FileNotFoundError:
+                    try:
+                        sftp.mkdir(cur)
+                        log_to_file(f"[SFTP] Created directory: {cur}")
+                    except Exception as mkdir_err:
+                        log_to_file(f"[SFTP] Failed to create directory {cur}: {mkdir_err}")
+                        continue
+                self._known_dirs.add(cur)
+
+        self._call(_mk)
+
+    def forget_dir(self, remote_dir: str):
+        self._known_dirs.discard("/" + remote_dir.strip("/"))
+
+    def listdir(self, remote_dir: str) -> List[str]:
+        return self._call(lambda sftp: sftp.listdir(remote_dir))
+
+    def listdir_attr(self, remote_dir: str):
+        return self._call(lambda sftp: sftp.listdir_attr(remote_dir))
+
+    def stat(self, remote_path: str):
+        return self._call(lambda sftp: sftp.stat(remote_path))
+
+    def lstat(self, remote_path: str):
+        return self._call(lambda sftp: sftp.lstat(remote_path))
+
+    def symlink(self, target: str, link_path: str):
+        return self._call(lambda sftp: sftp.symlink(target, link_path))
+
+    def put(self, local_path, remote_path: str, callback=None):
+        """Upload one file. callback(bytes_sent, bytes_total) as in paramiko."""
+        return self._call(lambda sftp: sftp.put(str(local_path), remote_path, callback=callback))
+
+    def upload_many(self, items, progress_callback=None, cancel_event: Optional[threading.Event] = None,
+                    pause_event: Optional[threading.Event] = None, skip_names=None,
+                    stop_on_error: bool = False) -> Dict[str, Any]:
+        """Upload (local_path, remote_path) pairs over all channels in parallel.
+
+        progress_callback(idx, total, filename, status, message) is called from
+        worker threads with status in uploading/uploaded/skipped/failed/cancelled;
+        idx counts completed files. Names in skip_names are reported as skipped.
+        Returns {"uploaded", "skipped", "failed", "cancelled", "errors", "uploaded_files"}.
+        """
+        items = [(Path(l), r) for l, r in items]
+        total = len(items)
+        skip_names = skip_names or set()
+        cancel_event = cancel_event or threading.Event()
+        result = {"uploaded": 0, "skipped": 0, "failed": 0, "cancelled": 0, "errors": {}, "uploaded_files": []}
+        done = {"n": 0}
+        rlock = threading.Lock()
+
+        def _report(filename, status, message):
+            with rlock:
+                if status in ("uploaded", "skipped", "failed", "cancelled"):
+                    result[status] += 1
+                    done["n"] += 1
+                idx = done["n"]
+            if progress_callback:
+                try:
+                    progress_callback(idx, total, filename, status, message)
+                except Exception:
+                    pass
+
+        def _one(item):
+            local_path, remote_path = item
+            filename = local_path.name
+            while pause_event is not None and pause_event.is_set() and not cancel_event.is_set():
+                time.sleep(0.1)
+            if cancel_event.is_set():
+                _report(filename, "cancelled", "Cancelled")
+                return
+            if filename in skip_names:
+                _report(filename, "skipped", "Already exists on server")
+                return
+            _report(filename, "uploading", "Uploading...")
+            try:
+                self.put(local_path, remote_path)
+                size = local_path.stat().st_size
+                with rlock:
+                    result["uploaded_files"].append((str(local_path), remote_path))
+                _report(filename, "uploaded", f"Uploaded ({size:,} bytes)")
+            except Exception as e:
+                with rlock:
+                    result["errors"][str(local_path)] = str(e)
+                log_to_file(f"[SFTP] put failed: {local_path} -> {remote_path}: {e}")
+                _report(filename, "failed", str(e))
+                if stop_on_error:
+                    cancel_event.set()
+
+        if not items:
+            return result
+        for parent in sorted({r.rsplit("/", 1)[0] for _, r in items if "/" in r}):
+            self.ensure_dir(parent)
+        with ThreadPoolExecutor(max_workers=min(self.channels, total),
+                                thread_name_prefix="sftp") as ex:
+            list(ex.map(_one, items))
+        return result
+
+
+# ----------------------------
+# Incremental sync manifest
+# ----------------------------
+def _file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SFTPSyncManifest:
+    """Local JSON record of what has been uploaded, per remote target.
+
+    Layout: {"targets": {"host:port:/remote/root": {"last_reconcile": ts,
+    "files": {rel_path: {size, mtime, sha1, status, uploaded_at, error}}}}}
+    status is "ok" once the file is known to be on the server; anything else
+    (e.g. "failed") makes the next sync upload it again.
+    """
+
+    def __init__(self, path: Path = SFTP_MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._data = None
+
+    def _load_locked(self):
+        if self._data is not None:
+            return
+        self._data = {"version": 1, "targets": {}}
+        try:
+            if self.path.exists():
+                loaded = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(loaded, dict) and isinstance(loaded.get("targets"), dict):
+                    self._data = loaded
+        except Exception as e:
+            log_to_file(f"[SFTP Sync] Manifest unreadable, starting fresh ({self.path}): {e}")
+
+    def target(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            self._load_locked()
+            return self._data["targets"].setdefault(key, {"last_reconcile": None, "files": {}})
+
+    def save(self):
+        with self._lock:
+            if self._data is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                tmp.write_text(json.dumps(self._data, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                log_to_file(f"[SFTP Sync] Failed to save manifest {self.path}: {e}")
+
+
+class SFTPDirSync:
+    """Sync one local folder to one remote folder, sending only new or changed files.
+
+    A file is unchanged when size+mtime match the manifest, or when only the
+    mtime moved but the SHA-1 is the same. Every SFTP_RECONCILE_SEC the remote
+    folders are listed: entries missing (or with the wrong size) on the server
+    are dropped so they go up again, and remote files matching an untracked
+    local file by size are adopted instead of re-sent.
+    """
+
+    def __init__(self, pool: SFTPPool, local_dir: Path, remote_root: str,
+                 manifest: Optional[SFTPSyncManifest] = None, reconcile_every: int = SFTP_RECONCILE_SEC):
+        self.pool = pool
+        self.local_dir = Path(local_dir)
+        self.remote_root = remote_root.rstrip("/")
+        self.manifest = manifest or get_sync_manifest()
+        self.reconcile_every = reconcile_every
+        self.key = f"{pool.host}:{pool.port}:{self.remote_root}"
+        self._pending_stats = {}
+
+    def rel(self, local_path) -> str:
+        return Path(local_path).relative_to(self.local_dir).as_posix()
+
+    def remote_path(self, rel: str) -> str:
+        return f"{self.remote_root}/{rel}"
+
+    def _local_files(self, files=None) -> List[Path]:
+        if files is not None:
+            return [Path(f) for f in files]
+        return [p for p in self.local_dir.rglob("*") if p.is_file()]
+
+    def reconcile(self, files=None) -> Dict[str, int]:
+        """Compare the manifest with a listing of the remote folders."""
+        # The manifest is shared with other syncs: every change to target["files"]
+        # happens under its lock, remote listing and hashing happen outside it
+        lock = self.manifest._lock
+        target = self.manifest.target(self.key)
+        entries = target["files"]
+        local = {self.rel(p): p for p in self._local_files(files)}
+        with lock:
+            known = list(entries)
+        rel_dirs = {r.rsplit("/", 1)[0] if "/" in r else "" for r in known + list(local)}
+        remote_sizes = {}
+        for rel_dir in sorted(rel_dirs):
+            remote_dir = f"{self.remote_root}/{rel_dir}" if rel_dir else self.remote_root
+            try:
+                for attr in self.pool.listdir_attr(remote_dir):
+                    remote_sizes[f"{rel_dir}/{attr.filename}" if rel_dir else attr.filename] = attr.st_size
+            except FileNotFoundError:
+                continue
+
+        dropped = adopted = 0
+        with lock:
+            for rel, entry in list(entries.items()):
+                if entry.get("status") == "ok" and remote_sizes.get(rel) != entry.get("size"):
+                    del entries[rel]
+                    dropped += 1
+            untracked = [(rel, path) for rel, path in local.items() if rel not in entries and rel in remote_sizes]
+        for rel, path in untracked:
+            try:
+                st = path.stat()
+                if st.st_size != remote_sizes[rel]:
+                    continue
+                entry = {"size": st.st_size, "mtime": st.st_mtime, "sha1": _file_sha1(path),
+                         "status": "ok", "uploaded_at": None}
+            except OSError:
+                continue
+            with lock:
+                if rel not in entries:
+                    entries[rel] = entry
+                    adopted += 1
+
+        with lock:
+            target["last_reconcile"] = time.time()
+            self.manifest.save()
+        log_to_file(f"[SFTP Sync] Reconciled {self.key}: {len(remote_sizes)} remote, "
+                    f"{dropped} dropped, {adopted} adopted")
+        return {"remote": len(remote_sizes), "dropped": dropped, "adopted": adopted}
+
+    def pending(self, files=None) -> List[tuple]:
+        """Return (local_path, remote_path) for every file that needs uploading."""
+        lock = self.manifest._lock
+        target = self.manifest.target(self.key)
+        with lock:
+            last = target.get("last_reconcile")
+        if last is None or (self.reconcile_every and time.time() - last >= self.reconcile_every):
+            try:
+                self.reconcile(files)
+            except Exception as e:
+                log_to_file(f"[SFTP Sync] Reconcile failed for {self.key} (continuing): {e}")
+        entries = target["files"]
+        todo = []
+        for path in self._local_files(files):
+            rel = self.rel(path)
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            with lock:
+                entry = dict(entries[rel]) if rel in entries else None
+            ok = entry is not None and entry.get("status") == "ok" and entry.get("size") == st.st_size
+            if ok and entry.get("mtime") == st.st_mtime:
+                continue
+            digest = _file_sha1(path)
+            if ok and entry.get("sha1") == digest:
+                with lock:
+                    if rel in entries:
+                        entries[rel]["mtime"] = st.st_mtime
+                continue
+            self._pending_stats[rel] = {"size": st.st_size, "mtime": st.st_mtime, "sha1": digest}
+            todo.append((path, self.remote_path(rel)))
+        return todo
+
+    def mark_uploaded(self, local_paths):
+        entries = self.manifest.target(self.key)["files"]
+        now = datetime.now().isoformat(timespec="seconds")
+        for path in local_paths:
+            rel = self.rel(path)
+            stats = self._pending_stats.pop(rel, None)
+            if stats is None:
+                st = Path(path).stat()
+                stats = {"size": st.st_size, "mtime": st.st_mtime, "sha1": _file_sha1(Path(path))}
+            with self.manifest._lock:
+                entries[rel] = {**stats, "status": "ok", "uploaded_at": now}
+
+    def mark_failed(self, local_paths, reason: str = ""):
+        """Flag files so the next sync uploads them again."""
+        entries = self.manifest.target(self.key)["files"]
+        with self.manifest._lock:
+            for path in local_paths:
+                entry = entries.setdefault(self.rel(path), {})
+                entry["status"] = "failed"
+                entry["error"] = reason[:200]
+
+    def apply_result(self, result: Dict[str, Any]):
+        """Record an SFTPPool.upload_many result in the manifest and save it."""
+        self.mark_uploaded([l for l, _ in result.get("uploaded_files", [])])
+        for local_path, err in result.get("errors", {}).items():
+            self.mark_failed([local_path], err)
+        self.manifest.save()
+
+    def verify(self, local_paths, public_base_url: str, max_workers: int = PUBLIC_VERIFY_WORKERS,
+               timeout: float = 10) -> Dict[str, Any]:
+        """HEAD the public URL of each uploaded file; anything not HTTP 200 is
+        flagged failed in the manifest so the next sync uploads it again."""
+        base = public_base_url.rstrip("/")
+        by_url = {f"{base}/{self.rel(p)}": p for p in local_paths}
+        statuses = verify_public_urls(list(by_url), max_workers=max_workers, timeout=timeout)
+        failed = []
+        for url, status in statuses.items():
+            if status != 200:
+                failed.append((url, status))
+                self.mark_failed([by_url[url]], f"public check HTTP {status}" if status else "public check unreachable")
+        if failed:
+            self.manifest.save()
+            log_to_file(f"[SFTP Sync] {len(failed)}/{len(statuses)} uploads not reachable publicly, queued for re-upload")
+        return {"checked": len(statuses), "ok": len(statuses) - len(failed), "failed": failed}
+
+    def sync(self, files=None, progress_callback=None, **upload_kwargs) -> Dict[str, Any]:
+        """Upload what changed; returns the upload_many result plus "unchanged"."""
+        local_files = self._local_files(files)
+        todo = self.pending(local_files)
+        result = self.pool.upload_many(todo, progress_callback=progress_callback, **upload_kwargs)
+        self.apply_result(result)
+        result["unchanged"] = len(local_files) - len(todo)
+        return result
+
+
+def verify_public_urls(urls, max_workers: int = PUBLIC_VERIFY_WORKERS, timeout: float = 10,
+                       session: Optional[requests.Session] = None) -> Dict[str, Optional[int]]:
+    """HEAD every URL with bounded parallelism.
+
+    Returns url -> HTTP status (None if the request itself failed). Servers that
+    reject HEAD (405/501) are retried with a streamed GET.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    session = session or requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def _check(url):
+        try:
+            r = session.head(url, timeout=timeout, allow_redirects=True)
+            if r.status_code in (405, 501):
+                with session.get(url, timeout=timeout, stream=True) as g:
+                    return url, g.status_code
+            return url, r.status_code
+        except Exception:
+            return url, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))),
+                            thread_name_prefix="verify") as ex:
+        return dict(ex.map(_check, urls))
+
+
+_manifests: Dict[str, SFTPSyncManifest] = {}
+
+
+def get_sync_manifest(path: Path = SFTP_MANIFEST_PATH) -> SFTPSyncManifest:
+    """Shared manifest instance per file so concurrent syncs don't clobber each other."""
+    key = str(Path(path).resolve())
+    with _pools_lock:
+        if key not in _manifests:
+            _manifests[key] = SFTPSyncManifest(path)
+        return _manifests[key]
+
+
+# ----------------------------
+# Shared pools (one per server/login)
+# ----------------------------
+_pools: Dict[tuple, SFTPPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_sftp_pool(host: str, port: int, user: str, password: str, channels: int = SFTP_CHANNELS) -> SFTPPool:
+    """Return the long-lived pool for this server, creating it on first use."""
+    key = (host, int(port), user)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close()
+            pool = SFTPPool(host, int(port), user, password, channels=channels)
+            _pools[key] = pool
+        return pool
+
+
+def close_sftp_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_sftp_pools)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tiered listing extraction
+Runs the local extractors first (Extract Profiles rules, then the Wix
+repeater parser), scores how complete and consistent their result is
+against count_listings_in_html, and only lets callers escalate to the LLM
+when confidence is low. Per-tier resolve counts persist across runs.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from parser_core import count_listings_in_html, extract_all_listings_locally, first_match_subtree_html
+
+PROFILES_DIR = Path(__file__).resolve().parent / "Extract Profiles" / "Network"
+TIER_STATS_PATH = Path(os.getenv("EXTRACT_TIER_STATS_PATH", str(Path(__file__).resolve().parent / "Captures" / "extraction_tiers.json")))
+# Minimum confidence (0..1) for a local result to be used without the LLM
+CONFIDENCE_THRESHOLD = float(os.getenv("EXTRACT_CONFIDENCE_THRESHOLD", "0.75"))
+# PHP's local parse escalates to the LLM only below this share of the listings counted on the page
+PHP_LOCAL_MIN_COVERAGE = float(os.getenv("EXTRACT_PHP_MIN_COVERAGE", "0.5"))
+
+# A listing is complete when it has one field of each group
+_REQUIRED_GROUPS = (("title", "full_address"), ("listing_website", "img_urls"), ("price", "bedrooms"))
+
+_profiles: Optional[List[Dict[str, Any]]] = None
+_profiles_lock = threading.Lock()
+
+
+def load_profiles() -> List[Dict[str, Any]]:
+    """Extract Profiles/Network/*.json, read once per process"""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            loaded = []
+            for path in sorted(PROFILES_DIR.glob("*.json")):
+                try:
+                    loaded.append(json.loads(path.read_text(encoding="utf-8")))
+                except Exception:
+                    continue
+            _profiles = loaded
+        return _profiles
+
+
+def detect_profile(html: str, url: str = "") -> Optional[Dict[str, Any]]:
+    """Best matching profile: +10 per domain pattern, +5 per HTML marker, minimum 5"""
+    best, best_score = None, 0
+    for profile in load_profiles():
+        det = profile.get("detection") or {}
+        score = 10 * sum(1 for d in det.get("domain_patterns") or [] if d and (d in url or d in html))
+        score += 5 * sum(1 for m in det.get("html_markers") or [] if m and m in html)
+        if score > best_score:
+            best, best_score = profile, score
+    return best if best_score >= 5 else None
+
+
+def _select_one(node, selectors: str):
+    for sel in selectors.split(","):
+        try:
+            found = node.select_one(sel.strip())
+        except Exception:
+            continue
+        if found is not None:
+            return found
+    return None
+
+
+def _field_value(card, rule: Dict[str, Any], base_url: str) -> Optional[str]:
+    el = _select_one(card, rule.get("selector") or "")
+    if el is None:
+        return None
+    attr = rule.get("attribute") or "text"
+    if attr == "text":
+        value = " ".join(el.get_text(" ", strip=True).split())
+    else:
+        value = el.get(attr) or (el.get("data-original") if attr == "src" else None)
+        if value and attr in ("href", "src"):
+            value = urljoin(base_url, value)
+    if value and rule.get("pattern"):
+        m = re.search(rule["pattern"], value, re.I)
+        value = m.group(1) if m else None
+    return value or None
+
+
+def extract_with_profile(html: str, profile: Dict[str, Any], base_url: str = "") -> List[Dict[str, Any]]:
+    """Apply a profile's container/listing/field selectors to every card"""
+    ext = profile.get("extraction") or {}
+    fields = ext.get("fields") or {}
+    if not fields or not ext.get("listing_selector"):
+        return []
+    soup = BeautifulSoup(html, "html.parser")
+    root = _select_one(soup, ext.get("container_selector") or "") or soup
+    cards = []
+    for sel in ext["listing_selector"].split(","):
+        try:
+            cards = root.select(sel.strip())
+        except Exception:
+            continue
+        if cards:
+            break
+    out = []
+    for card in cards:
+        raw = {name: _field_value(card, rule, base_url) for name, rule in fields.items()}
+        out.append({
+            "listing_website": raw.get("link"),
+            "title": raw.get("title"),
+            "bedrooms": raw.get("bedrooms"),
+            "bathrooms": raw.get("bathrooms"),
+            "sqft": (raw.get("sqft") or "").replace(",", "") or None,
+            "price": raw.get("price"),
+            "img_urls": raw.get("image"),
+            "full_address": raw.get("address"),
+            "description": raw.get("description"),
+            "available_date": raw.get("available_date") or raw.get("availability"),
+            "apply_now_link": None,
+        })
+    return out
+
+
+def _from_local_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Map extract_all_listings_locally records onto the LLM listing fields"""
+    out = []
+    for r in records or []:
+        imgs = r.get("image_urls") or []
+        out.append({
+            "listing_website": r.get("listing_url") or r.get("details_link"),
+            "title": r.get("listing_title"),
+            "bedrooms": None if r.get("beds") is None else ("Studio" if r.get("beds") == 0 else str(r.get("beds"))),
+            "bathrooms": None if r.get("baths") is None else str(r.get("baths")),
+            "sqft": r.get("sqft"),
+            "price": None if r.get("rent_amount") is None else str(r.get("rent_amount")),
+            "img_urls": imgs[0] if imgs else None,
+            "full_address": r.get("address"),
+            "description": r.get("description"),
+            "available_date": r.get("availability_date"),
+            "apply_now_link": r.get("apply_now_link"),
+        })
+    return out
+
+
+def score_listings(listings: List[Dict[str, Any]], expected: int) -> Dict[str, float]:
+    """Confidence = completeness x count consistency x link uniqueness (each 0..1)"""
+    n = len(listings)
+    if n == 0:
+        return {"confidence": 0.0, "completeness": 0.0, "consistency": 0.0, "uniqueness": 0.0}
+    completeness = sum(
+        sum(1 for group in _REQUIRED_GROUPS if any(l.get(f) for f in group)) / len(_REQUIRED_GROUPS)
+        for l in listings) / n
+    # count_listings_in_html returns 1 when it recognises nothing: count is unknown then
+    consistency = min(n, expected) / max(n, expected) if expected > 1 else 0.8
+    links = [l.get("listing_website") for l in listings if l.get("listing_website")]
+    uniqueness = len(set(links)) / len(links) if links else 1.0
+    return {
+        "confidence": round(completeness * consistency * uniqueness, 3),
+        "completeness": round(completeness, 3),
+        "consistency": round(consistency, 3),
+        "uniqueness": round(uniqueness, 3),
+    }
+
+
+def run_local_tiers(html: str, base_url: str = "", container: str = "") -> Dict[str, Any]:
+    """Try each local tier and return the best: {tier, listings, expected, confidence, ...scores}.
+
+    Stops at the first tier that reaches CONFIDENCE_THRESHOLD.
+    """
+    subtree = first_match_subtree_html(html, base_url, container or "")
+    expected = count_listings_in_html(subtree)
+    best = {"tier": None, "listings": [], "expected": expected, "confidence": 0.0}
+
+    tiers = []
+    profile = detect_profile(html, base_url)
+    if profile is not None:
+        tiers.append((f"profile:{profile.get('profile_name', '?')}", lambda: extract_with_profile(html, profile, base_url)))
+    tiers.append(("local-parser", lambda: _from_local_records(extract_all_listings_locally(subtree, base_url))))
+
+    for name, run in tiers:
+        try:
+            listings = run()
+        except Exception:
+            continue
+        scores = score_listings(listings, expected)
+        if scores["confidence"] > best["confidence"]:
+            best = dict(scores, tier=name, listings=listings, expected=expected)
+        if best["confidence"] >= CONFIDENCE_THRESHOLD:
+            break
+    return best
+
+
+class TierStats:
+    """How often each tier resolved a job, persisted as {tier: count}"""
+
+    def __init__(self, path: Path = TIER_STATS_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self.counts = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        except Exception:
+            self.counts = {}
+
+    def record(self, tier: str):
+        with self._lock:
+            self.counts[tier] = int(self.counts.get(tier, 0)) + 1
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(self.counts, indent=2), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception:
+                pass
+
+    def summary(self) -> str:
+        with self._lock:
+            total = sum(self.counts.values()) or 1
+            return ", ".join(f"{t}: {c} ({100 * c / total:.0f}%)"
+                             for t, c in sorted(self.counts.items(), key=lambda kv: -kv[1]))
+
+
+_tier_stats = None
+_tier_stats_lock = threading.Lock()
+
+
+def get_tier_stats() -> TierStats:
+    global _tier_stats
+    with _tier_stats_lock:
+        if _tier_stats is None:
+            _tier_stats = TierStats()
+        return _tier_stats
@@ -5,33 +5,44 @@ Handles batch processing, image renaming, and cross-referencing between tables
 
 import os
 import json
-import base64
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 import mysql.connector
 import openai
+from llm_cache import get_llm_cache, cache_key
+from vision_images import PREP_SIGNATURE, prepare_images, image_content, estimate_batch, format_estimate
+from vision_batcher import VisionBatcher, VISION_BATCH_MAX_WAIT_SEC
+from parcel_manifest import get_parcel_manifest, google_addresses_id
 
 # Set OpenAI API key from environment
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
+# Bump when the extraction prompt changes so cached results are not reused
+VISION_MODEL = "gpt-4o"
+VISION_PROMPT_VERSION = "parcel-vision-batch-v2"
+
 def count_unprocessed_images(parcels_dir):
-    """Count images that haven't been processed yet"""
-    all_images = list(Path(parcels_dir).glob("parcels_*.png"))
-    processed_images = list(Path(parcels_dir).glob("parcels_*_processed.png"))
-    unprocessed = [img for img in all_images if not str(img).endswith('_processed.png')]
+    """Count images that haven't been processed yet (from the parcel manifest)"""
+    manifest = get_parcel_manifest()
+    manifest.sync(parcels_dir)
+    unprocessed = manifest.pending()
     return len(unprocessed), unprocessed
 
-def rename_processed_image(image_path):
-    """Rename image to mark it as processed"""
-    if '_processed' not in str(image_path):
-        new_name = image_path.stem + '_processed' + image_path.suffix
-        new_path = image_path.parent / new_name
-        image_path.rename(new_path)
-        return new_path
-    return image_path
+def extract_with_openai_batch(image_paths, batch_num, prepared=None):
+    """Extract data from images using OpenAI Vision API
+
+    `prepared` (from vision_images.prepare_images) skips preparing the images again.
+    """
+    cache = get_llm_cache()
+    key = cache_key(VISION_MODEL, VISION_PROMPT_VERSION, PREP_SIGNATURE, *[Path(p) for p in image_paths])
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"\n♻️ Batch {batch_num}: cached result for {len(image_paths)} images, skipping OpenAI call")
+            return cached
 
-def extract_with_openai_batch(image_paths, batch_num):
-    """Extract data from images using OpenAI Vision API"""
     print(f"\n📤 Sending {len(image_paths)} images to OpenAI Vision API (Batch {batch_num})...")
     
     # Encode all images
@@ -53,13 +64,15 @@ Required fields:
 - num_units: Number of units (numeric only)
 - num_buildings: Number of buildings (numeric only)
 
-Return a JSON array with one object per image, using these exact field names.
+Return a JSON array with one object per image, in image order, using these exact field names
+plus "image_index" (1 for the first image, 2 for the second, ...).
 If a field is not visible, use null.
 Extract only numbers for numeric fields.
 
 Example:
 [
   {
+    "image_index": 1,
     "parcel_number": "1142000875",
     "present_use": "Apartment",
     "property_name": "CELEBRITY PLACE 2",
@@ -76,21 +89,16 @@ Example:
         }
     ]
     
-    # Add images
-    for img_path in image_paths:
-        with open(img_path, "rb") as f:
-            base64_image = base64.b64encode(f.read()).decode('utf-8')
-        content.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/png;base64,{base64_image}",
-                "detail": "high"
-            }
-        })
+    # Add images: cropped to the popup, sized for the model and encoded in parallel
+    if prepared is None:
+        prepared = prepare_images(image_paths)
+    content.extend(image_content(p) for p in prepared)
+    print(f"   {sum(p.cropped for p in prepared)} cropped to popup, "
+          f"{format_estimate(estimate_batch(prepared, content[0]['text'], VISION_MODEL))}")
     
     try:
         response = openai.chat.completions.create(
-            model="gpt-4o",
+            model=VISION_MODEL,
             messages=[{"role": "user", "content": content}],
             max_tokens=4096,
             temperature=0
@@ -106,6 +114,9 @@ Example:
         
         extracted_data = json.loads(result_text)
         print(f"✅ OpenAI extracted {len(extracted_data)} parcels")
+        # Only complete answers are cached; a retry must not get the same gaps back
+        if cache is not None and isinstance(extracted_data, list) and len(extracted_data) == len(image_paths):
+            cache.put(key, extracted_data, VISION_MODEL, VISION_PROMPT_VERSION)
         
         return extracted_data
         
@@ -200,39 +211,45 @@ def insert_to_database_with_linking(parcel_data_list, google_addresses_id=None):
         print(f"❌ Database error: {str(e)}")
         return 0
 
-def process_with_openai(parcels_dir, min_batch_size=20):
+def process_with_openai(parcels_dir, min_batch_size=20, max_wait=VISION_BATCH_MAX_WAIT_SEC):
     """
-    Process parcel images with OpenAI when batch threshold is reached
+    Process parcel images with OpenAI once min_batch_size images are waiting,
+    or as soon as the oldest one has waited max_wait seconds
     """
     unprocessed_count, unprocessed_images = count_unprocessed_images(parcels_dir)
     
     print(f"\n📊 Found {unprocessed_count} unprocessed parcel images")
     
-    if unprocessed_count < min_batch_size:
+    if unprocessed_count == 0:
+        return None
+    
+    manifest = get_parcel_manifest()
+    oldest_age = manifest.oldest_pending_age()
+    if unprocessed_count < min_batch_size and oldest_age < max_wait:
         print(f"⏳ Waiting for {min_batch_size} images. Current: {unprocessed_count}")
-        print(f"   Need {min_batch_size - unprocessed_count} more images to process batch")
+        print(f"   Need {min_batch_size - unprocessed_count} more images, "
+              f"or the oldest to wait {max_wait - oldest_age:.0f}s more")
         return None
     
     if not openai.api_key:
         print("❌ OPENAI_API_KEY not set!")
         return None
     
-    # Process in batches of 20
-    batch_size = 20
     total_inserted = 0
+    save_lock = threading.Lock()
     
-    for i in range(0, len(unprocessed_images), batch_size):
-        batch = unprocessed_images[i:i+batch_size]
-        batch_num = (i // batch_size) + 1
-        
-        print(f"\n{'='*60}")
-        print(f"📦 Processing OpenAI Batch {batch_num} ({len(batch)} images)")
-        print(f"{'='*60}")
-        
-        # Extract with OpenAI
-        extracted_data = extract_with_openai_batch(batch, batch_num)
-        
-        if extracted_data:
+    def save_batch(batch_num, images, extracted_data):
+        nonlocal total_inserted
+        # Batches finish on worker threads; keep DB writes and the log in one piece
+        with save_lock:
+            print(f"\n{'='*60}")
+            print(f"📦 OpenAI Batch {batch_num}: {len(extracted_data)} parcels")
+            print(f"{'='*60}")
+            
+            # Image names carry the google_addresses id, so link_parcels_by_number can link these later
+            for img, record in zip(images, extracted_data):
+                record['google_addresses_id'] = google_addresses_id(img)
+            
             # Save JSON
             json_file = Path(parcels_dir) / f"openai_batch_{batch_num}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             with open(json_file, 'w', encoding='utf-8') as f:
@@ -240,14 +257,20 @@ def process_with_openai(parcels_dir, min_batch_size=20):
             print(f"💾 Saved: {json_file}")
             
             # Insert to database
-            inserted = insert_to_database_with_linking(extracted_data)
-            total_inserted += inserted
+            total_inserted += insert_to_database_with_linking(extracted_data)
             
-            # Rename processed images
-            for img in batch:
-                rename_processed_image(img)
-                print(f"  📝 Renamed: {img.name} → {img.stem}_processed{img.suffix}")
+            # Only the images that came back with a parcel leave the pending list
+            for img, record in zip(images, extracted_data):
+                manifest.mark_extracted(img, record, json_file)
+    
+    batcher = VisionBatcher(extract_with_openai_batch, save_batch, max_wait=max_wait)
+    batcher.add(unprocessed_images)
+    batcher.close()
     
+    print(f"\n📈 {batcher.summary()}")
+    for img in batcher.failed:
+        manifest.mark_failed(img, "no parcel extracted")
+        print(f"  ⚠️  Not extracted after retries: {Path(img).name}")
     print(f"\n🎉 Total inserted: {total_inserted} parcels")
     return total_inserted
 
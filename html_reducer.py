@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML reducer for LLM listing extraction
+Cuts a captured page down to the listings container, drops non-content tags
+and attributes, collapses whitespace and splits what is left into chunks
+that end on listing-card boundaries, so big pages are sent whole (in
+parallel pieces) instead of being truncated.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Comment
+
+from parser_core import first_match_subtree_html
+
+# Max characters of reduced HTML per LLM call
+MAX_CHUNK_CHARS = 40000
+
+# Whole elements that never carry listing content
+DROP_TAGS = ["script", "style", "noscript", "svg", "iframe", "template", "link", "meta",
+             "head", "canvas", "video", "audio", "object", "embed", "form", "button",
+             "input", "select", "textarea", "nav", "footer"]
+# Attributes worth keeping (links, images, dates); everything else goes
+KEEP_ATTRS = {"href", "src", "data-src", "data-original", "data-lazy-src", "alt", "title", "datetime"}
+# Card selectors, in the order count_listings_in_html tries them
+CARD_SELECTORS = ["div.listing-item, div[class*='listing-item']",
+                  "table tr",
+                  "[id*='comp-'][id*='repeater'] > div, div[class*='repeater'] > div",
+                  "div[class*='card'], div[class*='item'], div[class*='listing']"]
+
+# Share of the container's text or links the cards must cover; below it the
+# matches are menus/badges next to the real listings, not the listings
+CARD_MIN_COVERAGE = 0.6
+
+_WS_RE = re.compile(r"\s+")
+_BETWEEN_TAGS_RE = re.compile(r">\s+<")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for HTML (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def _drop_noise(node):
+    """Remove comments and elements that never carry listing content."""
+    for c in node.find_all(string=lambda s: isinstance(s, Comment)):
+        c.extract()
+    for tag in node.find_all(DROP_TAGS):
+        tag.decompose()
+    return node
+
+
+def _clean(node):
+    """Strip attributes, collapse whitespace and drop empty wrappers in place."""
+    for tag in node.find_all(True):
+        attrs = {}
+        for k, v in tag.attrs.items():
+            if k in KEEP_ATTRS:
+                v = " ".join(v) if isinstance(v, list) else v
+                if k in ("src", "href") and v.startswith("data:"):
+                    continue
+                attrs[k] = v
+        # srcset only when there is no plain src: keep its first URL
+        if "src" not in attrs and tag.get("srcset"):
+            attrs["src"] = tag["srcset"].split(",")[0].strip().split(" ")[0]
+        tag.attrs = attrs
+    for s in node.find_all(string=True):
+        collapsed = _WS_RE.sub(" ", s)
+        if collapsed != s:
+            s.replace_with(collapsed)
+    # Empty wrappers: no text, no link, no image
+    for tag in reversed(node.find_all(True)):
+        if tag.name in ("img", "a", "br"):
+            continue
+        if not tag.get_text(strip=True) and not tag.find(["img", "a"]):
+            tag.decompose()
+    return node
+
+
+def _serialize(node) -> str:
+    return _BETWEEN_TAGS_RE.sub("><", str(node)).strip()
+
+
+def _text_len(node) -> int:
+    return len(_WS_RE.sub("", node.get_text()))
+
+
+def _covers_container(root, cards) -> bool:
+    """True when the cards hold most of root's text or most of its links."""
+    total_text = _text_len(root)
+    if total_text and sum(_text_len(c) for c in cards) >= CARD_MIN_COVERAGE * total_text:
+        return True
+    total_links = len(root.find_all("a", href=True))
+    return bool(total_links) and sum(len(c.find_all("a", href=True)) for c in cards) >= CARD_MIN_COVERAGE * total_links
+
+
+def _find_cards(root) -> list:
+    """Top-level listing cards inside root, or [] when none are recognisable.
+
+    A selector only counts when its matches cover most of the container, so a
+    couple of matching menu entries never stand in for the listings."""
+    for sel in CARD_SELECTORS:
+        try:
+            cards = root.select(sel)
+        except Exception:
+            continue
+        # Outermost matches only, so a card's own inner "item" divs are not split off
+        picked = set(map(id, cards))
+        cards = [c for c in cards if not any(id(p) in picked for p in c.parents)]
+        if len(cards) > 1 and _covers_container(root, cards):
+            return cards
+    return []
+
+
+def _pack(parts: List[str], max_chars: int) -> List[str]:
+    chunks, cur = [], ""
+    for part in parts:
+        if cur and len(cur) + len(part) > max_chars:
+            chunks.append(cur)
+            cur = ""
+        cur += part
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def reduce_listing_html(page_html: str, base_url: str = "", container: Optional[str] = None,
+                        max_chunk_chars: int = MAX_CHUNK_CHARS) -> Tuple[List[str], Dict]:
+    """Reduce a listings page to card-aligned chunks of cleaned HTML.
+
+    `container` is a CSS selector or class term for the listings container
+    (as in first_match_subtree_html); without one the usual listing
+    containers are tried before falling back to <body>.
+    Returns (chunks, stats) with stats chars/tokens before and after, cards and chunks.
+    """
+    subtree = first_match_subtree_html(page_html, base_url, container or "")
+    root = _drop_noise(BeautifulSoup(subtree, "html.parser"))
+
+    # Cards are found by class names, so before attributes are stripped
+    cards = _find_cards(root)
+    _clean(root)
+    if cards:
+        parts = [p for p in (_serialize(c) for c in cards if c.parent is not None) if p]
+        chunks = _pack(parts, max_chunk_chars)
+    else:
+        whole = _serialize(root)
+        # No card structure: cut on tag boundaries so no element is split mid-tag
+        chunks = _pack(re.split(r"(?<=>)(?=<)", whole), max_chunk_chars) if whole else []
+
+    after = sum(len(c) for c in chunks)
+    stats = {
+        "chars_before": len(page_html),
+        "chars_after": after,
+        "tokens_before": estimate_tokens(page_html),
+        "tokens_after": (after + 3) // 4,
+        "cards": len(cards),
+        "chunks": len(chunks),
+    }
+    return chunks, stats
+
+
+def merge_chunk_listings(results: List[List[Dict]]) -> List[Dict]:
+    """Merge listings extracted from separate chunks, dropping repeats.
+
+    A listing is a repeat when its URL (or, without one, its address, unit,
+    title and price) was already seen; chunk order is preserved.
+    """
+    merged, seen = [], set()
+    for listings in results:
+        for listing in listings or []:
+            if not isinstance(listing, dict):
+                continue
+            key = listing.get("listing_website") or listing.get("apply_now_link")
+            if not key:
+                key = (listing.get("full_address"), listing.get("unit_number"),
+                       listing.get("title"), listing.get("price"))
+                if not any(key):
+                    key = None
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(listing)
+    return merged
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perceptual hashing for listing images
+Recognizes generic placeholders (e.g. AppFolio place_holder-….png) and
+near-duplicate photos so they are not downloaded, thumbnailed and uploaded
+again. Hashes persist in Captures/image_hashes.json across runs.
+"""
+
+from config_core import *
+import io
+import tempfile
+from typing import Tuple
+import numpy as np
+from PIL import Image
+
+IMAGE_HASH_DB_PATH = Path(os.getenv("IMAGE_HASH_DB_PATH", str(BASE_DIR / "image_hashes.json")))
+# Max differing bits (of 64) for two images to count as the same picture
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "4"))
+PLACEHOLDER_MAX_DISTANCE = int(os.getenv("PLACEHOLDER_MAX_DISTANCE", "6"))
+
+# URLs that are placeholders by name; the first one seen is hashed so the
+# same picture is also caught when it is served under another URL
+PLACEHOLDER_URL_RE = re.compile(r"place_?holder|no[-_]?image|no[-_]?photo|coming[-_]?soon|default[-_]listing", re.I)
+
+_DCT_SIZE = 32
+_DCT = np.cos(np.pi * (2 * np.arange(_DCT_SIZE)[None, :] + 1) * np.arange(_DCT_SIZE)[:, None] / (2 * _DCT_SIZE))
+
+
+def _to_gray(image) -> Image.Image:
+    """Accept a PIL image, raw bytes, a path or a numpy array."""
+    if isinstance(image, Image.Image):
+        img = image
+    elif isinstance(image, (bytes, bytearray)):
+        img = Image.open(io.BytesIO(image))
+    elif isinstance(image, np.ndarray):
+        img = Image.fromarray(image)
+    else:
+        img = Image.open(image)
+    return img.convert("L")
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def dhash(image) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+    a = np.asarray(_to_gray(image).resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(a[:, 1:] > a[:, :-1])
+
+
+def phash(image) -> int:
+    """64-bit DCT hash: low 8x8 frequencies above their median."""
+    a = np.asarray(_to_gray(image).resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ a @ _DCT.T)[:8, :8]
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def hamming_many(h: int, hashes: np.ndarray) -> np.ndarray:
+    """Hamming distance from h to every hash in a uint64 array."""
+    if hashes.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    x = np.bitwise_xor(hashes, np.uint64(h))
+    return np.unpackbits(x.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+class ImageHashDB:
+    """Persistent store of known placeholders, known images and aliases.
+
+    Layout: {"placeholders": [{"d", "p", "source"}], "images": [{"d", "p", "name", "dir"}],
+    "urls": {url: "placeholder" | {remote_dir: name}}, "aliases": {remote_dir: {name: canonical_name}},
+    "linked": {remote_dir: [alias names already symlinked there]}}
+    Hashes are hex strings; a match needs both dHash and pHash within range.
+    Placeholders are global; images, URLs and aliases are per remote_dir (the
+    folder the pipeline uploads to), so an alias only ever points at a
+    canonical uploaded to the same folder.
+    """
+
+    def __init__(self, path: Path = IMAGE_HASH_DB_PATH):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.data = {"placeholders": [], "images": [], "urls": {}, "aliases": {}, "linked": {}}
+        self._arrays = {}
+        try:
+            if self.path.exists():
+                loaded = json.loads(self.path.read_text(encoding="utf-8"))
+                for k in self.data:
+                    if isinstance(loaded.get(k), type(self.data[k])):
+                        self.data[k] = loaded[k]
+        except Exception as e:
+            log_to_file(f"[ImageHash] Hash DB unreadable, starting fresh ({self.path}): {e}")
+        # Entries from before remote_dir scoping can't be placed in a folder: drop them
+        self.data["aliases"] = {k: v for k, v in self.data["aliases"].items() if isinstance(v, dict)}
+
+    def save(self):
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(self.data), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                log_to_file(f"[ImageHash] Failed to save hash DB: {e}")
+
+    def _hash_arrays(self, kind: str):
+        """uint64 dHash/pHash arrays and dirs for `kind`; entries are only ever appended,
+        so new ones are added to spare capacity instead of rebuilding everything"""
+        entries = self.data[kind]
+        buf = self._arrays.get(kind)
+        if buf is None or buf["n"] > len(entries):
+            buf = self._arrays[kind] = {"n": 0, "d": np.zeros(0, dtype=np.uint64),
+                                        "p": np.zeros(0, dtype=np.uint64), "dirs": np.empty(0, dtype=object)}
+        n, total = buf["n"], len(entries)
+        if n < total:
+            if total > len(buf["d"]):
+                capacity = max(64, 2 * total)
+                for key in ("d", "p", "dirs"):
+                    grown = np.zeros(capacity, dtype=buf[key].dtype) if key != "dirs" else np.empty(capacity, dtype=object)
+                    grown[:n] = buf[key][:n]
+                    buf[key] = grown
+            new = entries[n:]
+            buf["d"][n:total] = [int(e["d"], 16) for e in new]
+            buf["p"][n:total] = [int(e["p"], 16) for e in new]
+            buf["dirs"][n:total] = [e.get("dir") for e in new]
+            buf["n"] = total
+        return buf["d"][:total], buf["p"][:total], buf["dirs"][:total]
+
+    def _nearest(self, kind: str, d: int, p: int, max_distance: int, remote_dir: Optional[str] = None) -> Optional[dict]:
+        ds, ps, dirs = self._hash_arrays(kind)
+        if ds.size == 0:
+            return None
+        dist = np.maximum(hamming_many(d, ds), hamming_many(p, ps))
+        if kind == "images":
+            # Only images uploaded to the same folder can stand in for each other
+            dist[dirs != remote_dir] = 65
+        best = int(np.argmin(dist))
+        return self.data[kind][best] if dist[best] <= max_distance else None
+
+    # ---------- lookups ----------
+    def _remember_url(self, url: str, remote_dir: Optional[str], name: str):
+        known = self.data["urls"].get(url)
+        if not isinstance(known, dict):
+            known = self.data["urls"][url] = {}
+        known[remote_dir or ""] = name
+
+    def check_url(self, url: Optional[str], remote_dir: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Decide from the URL alone: ("placeholder"|"duplicate", canonical) or ("unknown", None)."""
+        if not url:
+            return "unknown", None
+        with self._lock:
+            known = self.data["urls"].get(url)
+            if known == "placeholder":
+                return "placeholder", None
+            if isinstance(known, dict) and known.get(remote_dir or ""):
+                return "duplicate", known[remote_dir or ""]
+        return "unknown", None
+
+    def check(self, image, name: Optional[str] = None, url: Optional[str] = None,
+              remote_dir: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Classify downloaded image data and remember it.
+
+        Returns ("placeholder", None), ("duplicate", canonical_name) or ("new", None).
+        New images are registered under `name` for `remote_dir`; duplicates are
+        only looked up among images of the same remote_dir. Placeholder-named
+        URLs teach the DB a new placeholder hash.
+        """
+        remote_dir = remote_dir.rstrip("/") if remote_dir else None
+        d, p = dhash(image), phash(image)
+        with self._lock:
+            if url and PLACEHOLDER_URL_RE.search(url):
+                if not self._nearest("placeholders", d, p, PLACEHOLDER_MAX_DISTANCE):
+                    self.data["placeholders"].append({"d": f"{d:016x}", "p": f"{p:016x}", "source": url})
+                self.data["urls"][url] = "placeholder"
+                return "placeholder", None
+            if self._nearest("placeholders", d, p, PLACEHOLDER_MAX_DISTANCE):
+                if url:
+                    self.data["urls"][url] = "placeholder"
+                return "placeholder", None
+            hit = self._nearest("images", d, p, DUPLICATE_MAX_DISTANCE, remote_dir)
+            if hit and hit["name"] != name:
+                if url:
+                    self._remember_url(url, remote_dir, hit["name"])
+                return "duplicate", hit["name"]
+            if name and not hit:
+                self.data["images"].append({"d": f"{d:016x}", "p": f"{p:016x}", "name": name, "dir": remote_dir})
+                if url:
+                    self._remember_url(url, remote_dir, name)
+        return "new", None
+
+    def add_placeholder(self, image, source: str = "manual"):
+        d, p = dhash(image), phash(image)
+        with self._lock:
+            self.data["placeholders"].append({"d": f"{d:016x}", "p": f"{p:016x}", "source": source})
+
+    # ---------- aliases ----------
+    def alias(self, name: str, canonical: str, remote_dir: str):
+        """`name` in remote_dir is the same picture as `canonical`, uploaded to that folder"""
+        with self._lock:
+            self.data["aliases"].setdefault(remote_dir.rstrip("/"), {})[name] = canonical
+
+    def aliases(self, remote_dir: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self.data["aliases"].get(remote_dir.rstrip("/"), {}))
+
+    def linked(self, remote_dir: str) -> set:
+        with self._lock:
+            return set(self.data["linked"].get(remote_dir, []))
+
+    def mark_linked(self, remote_dir: str, names):
+        with self._lock:
+            done = self.data["linked"].setdefault(remote_dir, [])
+            done.extend(n for n in names if n not in done)
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_image_hash_db() -> ImageHashDB:
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = ImageHashDB()
+        return _db
+
+
+def link_image_aliases(pool, remote_dir: str) -> int:
+    """Point remote alias files at their canonical image with SFTP symlinks,
+    so duplicates cost no upload. Only aliases whose canonical was uploaded
+    to remote_dir are linked there. Returns the number of new links."""
+    db = get_image_hash_db()
+    remote_dir = remote_dir.rstrip("/")
+    already = db.linked(remote_dir)
+    linked = []
+    for name, canonical in db.aliases(remote_dir).items():
+        if name in already:
+            continue
+        link_path = f"{remote_dir}/{name}"
+        try:
+            pool.symlink(canonical, link_path)
+            linked.append(name)
+        except Exception as e:
+            # symlink also fails when the name exists (a real file, or linked before
+            # the DB knew); anything else is left for the next run
+            try:
+                pool.lstat(link_path)
+                linked.append(name)
+            except Exception:
+                log_to_file(f"[ImageHash] Alias link failed {name} -> {canonical}: {e}")
+    if linked:
+        db.mark_linked(remote_dir, linked)
+        db.save()
+    return len(linked)
+
+
+if __name__ == "__main__":
+    # Rank the sample thumbnails by how many near-duplicates each has
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "thumbnails" / "Networks"
+    files = sorted(p for p in folder.glob("*") if p.suffix.lower() in (".png", ".jpg", ".jpeg", ".gif", ".webp"))
+    t0 = time.time()
+    db = ImageHashDB(Path(tempfile.mkdtemp()) / "image_hashes.json")
+    verdicts = {"new": 0, "duplicate": 0, "placeholder": 0}
+    for f in files:
+        try:
+            verdict, _ = db.check(f, name=f.name)
+            verdicts[verdict] += 1
+        except Exception as e:
+            print(f"  {f.name}: {e}")
+    print(f"{len(files)} images in {time.time() - t0:.2f}s: {verdicts}")
@@ -1,25 +1,29 @@
 """
 Link existing king_county_parcels records to google_addresses
-This script processes already-processed parcel images and creates the links
+This script processes already-extracted parcel images (from the parcel
+manifest) and creates the links
 """
 
 import mysql.connector
 from pathlib import Path
 from config_hud_db import DB_CONFIG
+from parcel_manifest import get_parcel_manifest
 
 def link_existing_parcels():
-    """Link existing parcels to google_addresses using processed image filenames"""
+    """Link existing parcels to google_addresses using the extracted images in the parcel manifest"""
     
     parcels_dir = Path("Captures/parcels")
     
-    # Find all processed images
-    processed_images = list(parcels_dir.glob("parcels_*_processed.png"))
+    # Extracted images that are not linked yet
+    manifest = get_parcel_manifest()
+    manifest.sync(parcels_dir)
+    google_address_ids = manifest.extracted_ids()
     
-    if not processed_images:
+    if not google_address_ids:
         print("❌ No processed images found")
         return
     
-    print(f"📁 Found {len(processed_images)} processed images")
+    print(f"📁 Found {len(google_address_ids)} processed images")
     
     # Connect to database
     conn = mysql.connector.connect(**DB_CONFIG)
@@ -29,11 +33,7 @@ def link_existing_parcels():
     already_linked = 0
     not_found = 0
     
-    for img_file in processed_images:
-        # Extract google_addresses ID from filename: parcels_296_processed.png -> 296
-        filename = img_file.stem
-        google_address_id = int(filename.replace('parcels_', '').replace('_processed', ''))
-        
+    for google_address_id in google_address_ids:
         try:
             # Check if already linked
             cursor.execute("""
@@ -50,6 +50,7 @@ def link_existing_parcels():
             
             if result['king_county_parcels_id']:
                 print(f"  ⏭️  Address ID {google_address_id} already linked to parcel {result['king_county_parcels_id']}")
+                manifest.mark_linked(parcels_dir / f"parcels_{google_address_id}.png", result['king_county_parcels_id'])
                 already_linked += 1
                 continue
             
@@ -106,6 +107,7 @@ def link_existing_parcels():
                 """, (parcel['id'], google_address_id))
                 
                 conn.commit()
+                manifest.mark_linked(parcels_dir / f"parcels_{google_address_id}.png", parcel['id'])
                 linked_count += 1
                 print(f"  ✅ Linked address {google_address_id} → parcel {parcel['id']} ({parcel['parcel_number']})")
             else:
@@ -123,7 +125,7 @@ def link_existing_parcels():
     print(f"   🔗 Newly linked: {linked_count}")
     print(f"   ⏭️  Already linked: {already_linked}")
     print(f"   ⚠️  Not found/skipped: {not_found}")
-    print(f"   📊 Total processed: {len(processed_images)}")
+    print(f"   📊 Total processed: {len(google_address_ids)}")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
@@ -7,6 +7,8 @@ Updates both google_addresses.king_county_parcels_id and king_county_parcels.goo
 import mysql.connector
 from pathlib import Path
 from config_hud_db import DB_CONFIG
+from link_parcels_by_number import LINK_CHUNK_SIZE
+from parcel_manifest import get_parcel_manifest
 
 def link_existing_parcels():
     """Find and link existing processed parcels to their google_addresses"""
@@ -16,39 +18,43 @@ def link_existing_parcels():
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor(dictionary=True)
         
-        # Get all processed parcel files
+        # Extracted parcel images that are not linked yet
         parcels_dir = Path("Captures/parcels")
-        processed_files = list(parcels_dir.glob("parcels_*_processed.png"))
+        manifest = get_parcel_manifest()
+        manifest.sync(parcels_dir)
+        google_address_ids = manifest.extracted_ids()
         
-        print(f"Found {len(processed_files)} processed parcel images")
+        print(f"Found {len(google_address_ids)} processed parcel images")
         
         linked_count = 0
         not_found_count = 0
+        already_linked = 0
         
-        for img_file in processed_files:
-            # Extract google_addresses ID from filename: parcels_296_processed.png -> 296
-            filename = img_file.stem.replace('parcels_', '').replace('_processed', '')
-            
-            try:
-                google_address_id = int(filename)
-            except ValueError:
-                print(f"  ⚠️ Skipping invalid filename: {img_file.name}")
-                continue
-            
-            # Get the address from google_addresses
-            cursor.execute("""
+        # Get all the addresses in one query instead of one per image
+        address_rows = {}
+        for i in range(0, len(google_address_ids), LINK_CHUNK_SIZE):
+            chunk = google_address_ids[i:i + LINK_CHUNK_SIZE]
+            cursor.execute(f"""
                 SELECT id, json_dump, king_county_parcels_id 
                 FROM google_addresses 
-                WHERE id = %s
-            """, (google_address_id,))
-            
-            address_row = cursor.fetchone()
+                WHERE id IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+            address_rows.update((row['id'], row) for row in cursor.fetchall())
+        
+        links = []
+        for google_address_id in google_address_ids:
+            address_row = address_rows.get(google_address_id)
             
             if not address_row:
                 print(f"  ❌ Address ID {google_address_id} not found in database")
                 not_found_count += 1
                 continue
             
+            if address_row['king_county_parcels_id']:
+                manifest.mark_linked(parcels_dir / f"parcels_{google_address_id}.png", address_row['king_county_parcels_id'])
+                already_linked += 1
+                continue
+            
             # Extract address from json_dump
             import json
             try:
@@ -60,7 +66,7 @@ def link_existing_parcels():
                 print(f"  ⚠️ Could not parse JSON for address ID {google_address_id}")
                 continue
             
-            # Find matching parcel by address
+            # Find matching parcel by address (a LIKE match can't be done as a join)
             cursor.execute("""
                 SELECT id, Address, google_addresses_id
                 FROM king_county_parcels 
@@ -71,35 +77,34 @@ def link_existing_parcels():
             parcel_row = cursor.fetchone()
             
             if parcel_row:
-                parcel_id = parcel_row['id']
-                
-                # Update google_addresses.king_county_parcels_id
-                cursor.execute("""
-                    UPDATE google_addresses 
-                    SET king_county_parcels_id = %s
-                    WHERE id = %s
-                """, (parcel_id, google_address_id))
-                
-                # Update king_county_parcels.google_addresses_id
-                cursor.execute("""
-                    UPDATE king_county_parcels
-                    SET google_addresses_id = %s
-                    WHERE id = %s
-                """, (google_address_id, parcel_id))
-                
-                conn.commit()
-                
-                linked_count += 1
-                print(f"  ✅ Linked google_addresses.id={google_address_id} ↔ king_county_parcels.id={parcel_id}")
+                links.append((google_address_id, parcel_row['id']))
+                print(f"  ✅ Matched google_addresses.id={google_address_id} ↔ king_county_parcels.id={parcel_row['id']}")
                 print(f"      Address: {address_clean}")
             else:
                 print(f"  ⚠️ No matching parcel found for address ID {google_address_id}: {address_clean}")
                 not_found_count += 1
         
+        # Write all links in both directions and commit once
+        if links:
+            cursor.executemany("""
+                UPDATE google_addresses 
+                SET king_county_parcels_id = %s
+                WHERE id = %s
+            """, [(parcel_id, ga_id) for ga_id, parcel_id in links])
+            cursor.executemany("""
+                UPDATE king_county_parcels
+                SET google_addresses_id = %s
+                WHERE id = %s
+            """, links)
+            conn.commit()
+            for ga_id, parcel_id in links:
+                manifest.mark_linked(parcels_dir / f"parcels_{ga_id}.png", parcel_id)
+            linked_count = len(links)
+        
         cursor.close()
         conn.close()
         
-        print(f"\n✅ Complete: {linked_count} linked, {not_found_count} not found")
+        print(f"\n✅ Complete: {linked_count} linked, {already_linked} already linked, {not_found_count} not found")
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """
-Link existing king_county_parcels to google_addresses using parcel_number from JSON files
-This script reads all openai_batch_*.json files and links parcels to addresses
+Link existing king_county_parcels to google_addresses using parcel_number
+Extraction results come from the parcel manifest; openai_batch_*.json files
+are imported into it once, so each run only looks at parcels not linked yet.
+All candidates are linked in one set-based pass: they go into a temporary
+table, parcel ids and existing links are resolved with joins, and both
+directions are written with one UPDATE ... JOIN each.
 """
 
 import mysql.connector
-import json
 from pathlib import Path
+from parcel_manifest import get_parcel_manifest
 
 # Database config
 DB_CONFIG = {
@@ -17,8 +21,111 @@ DB_CONFIG = {
     'database': 'offta'
 }
 
+# Rows per INSERT when loading candidate pairs into the temporary table
+LINK_CHUNK_SIZE = 1000
+
+
+def bulk_link_parcels(conn, pairs):
+    """Link (google_addresses_id, parcel_number) pairs in one pass.
+    
+    Returns one dict per pair with parcel_id and status: linked,
+    already_linked (parcel_id is the existing link), not_found or
+    address_missing.
+    """
+    rows = list({int(ga_id): str(parcel_number) for ga_id, parcel_number in pairs}.items())
+    if not rows:
+        return []
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Same charset/collation as king_county_parcels.parcel_number, so the join can use its index
+        cursor.execute("""
+            SELECT CHARACTER_SET_NAME AS charset, COLLATION_NAME AS collation
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'king_county_parcels' AND COLUMN_NAME = 'parcel_number'
+        """)
+        column = cursor.fetchone()
+        collate = ""
+        if column and column['charset'] and column['collation']:
+            collate = f" CHARACTER SET {column['charset']} COLLATE {column['collation']}"
+        
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_parcel_links")
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE tmp_parcel_links (
+                google_addresses_id INT PRIMARY KEY,
+                parcel_number VARCHAR(64){collate} NOT NULL,
+                parcel_id INT NULL,
+                address_found TINYINT NOT NULL DEFAULT 0,
+                linked_to INT NULL,
+                to_link TINYINT NOT NULL DEFAULT 0,
+                KEY (parcel_id)
+            )
+        """)
+        for i in range(0, len(rows), LINK_CHUNK_SIZE):
+            cursor.executemany("""
+                INSERT INTO tmp_parcel_links (google_addresses_id, parcel_number) VALUES (%s, %s)
+            """, rows[i:i + LINK_CHUNK_SIZE])
+        
+        # Resolve parcel ids (lowest id per parcel_number) and existing links.
+        # MySQL can't open a temporary table twice in one statement, so each step is its own UPDATE.
+        cursor.execute("""
+            UPDATE tmp_parcel_links t
+            JOIN (SELECT parcel_number, MIN(id) AS id FROM king_county_parcels GROUP BY parcel_number) p
+                ON p.parcel_number = t.parcel_number
+            SET t.parcel_id = p.id
+        """)
+        cursor.execute("""
+            UPDATE tmp_parcel_links t JOIN google_addresses g ON g.id = t.google_addresses_id
+            SET t.address_found = 1, t.linked_to = NULLIF(g.king_county_parcels_id, 0)
+        """)
+        cursor.execute("""
+            UPDATE tmp_parcel_links SET to_link = 1
+            WHERE parcel_id IS NOT NULL AND address_found = 1 AND linked_to IS NULL
+        """)
+        
+        # Link bidirectionally, every pair at once
+        cursor.execute("""
+            UPDATE google_addresses g JOIN tmp_parcel_links t ON g.id = t.google_addresses_id
+            SET g.king_county_parcels_id = t.parcel_id
+            WHERE t.to_link = 1
+        """)
+        cursor.execute("""
+            UPDATE king_county_parcels p JOIN tmp_parcel_links t ON p.id = t.parcel_id
+            SET p.google_addresses_id = t.google_addresses_id
+            WHERE t.to_link = 1
+        """)
+        conn.commit()
+        
+        cursor.execute("""
+            SELECT google_addresses_id, parcel_number, parcel_id, address_found, linked_to, to_link
+            FROM tmp_parcel_links
+        """)
+        resolved = cursor.fetchall()
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_parcel_links")
+    finally:
+        cursor.close()
+    
+    results = []
+    for row in resolved:
+        if not row['address_found']:
+            status, parcel_id = 'address_missing', row['parcel_id']
+        elif row['linked_to']:
+            status, parcel_id = 'already_linked', row['linked_to']
+        elif row['to_link']:
+            status, parcel_id = 'linked', row['parcel_id']
+        else:
+            status, parcel_id = 'not_found', None
+        results.append({
+            'google_addresses_id': row['google_addresses_id'],
+            'parcel_number': row['parcel_number'],
+            'parcel_id': parcel_id,
+            'status': status,
+        })
+    return results
+
+
 def link_parcels_from_json(verbose=None):
-    """Link parcels to google_addresses using saved JSON files
+    """Link parcels to google_addresses using the extraction results in the parcel manifest
     
     Args:
         verbose: If True, print output. If None, only print when run directly.
@@ -29,105 +136,52 @@ def link_parcels_from_json(verbose=None):
     
     parcels_dir = Path(r"C:\Users\dokul\Desktop\robot\th_poller\Captures\parcels")
     
-    # Find all JSON files
-    json_files = sorted(parcels_dir.glob("openai_batch_*.json"))
+    manifest = get_parcel_manifest()
+    imported = manifest.import_batch_json(parcels_dir)
+    records = manifest.unlinked()
     if verbose:
-        print(f"Found {len(json_files)} JSON files to process")
+        print(f"Imported {imported} records from new JSON files, {len(records)} parcels to link")
     
-    if not json_files:
+    if not records:
         if verbose:
-            print("No JSON files found!")
+            print("Nothing to link!")
         return {'linked': 0, 'already_linked': 0, 'not_found': 0}
     
+    images = {r['google_addresses_id']: r['image'] for r in records}
+    
     # Connect to database
     conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+    try:
+        results = bulk_link_parcels(conn, [(r['google_addresses_id'], r['parcel_number']) for r in records])
+    finally:
+        conn.close()
     
-    total_linked = 0
-    total_not_found = 0
-    total_already_linked = 0
-    
-    for json_file in json_files:
-        if verbose:
-            print(f"\n📁 Processing: {json_file.name}")
-        
-        try:
-            with open(json_file, 'r') as f:
-                records = json.load(f)
-        except Exception as e:
-            if verbose:
-                print(f"   ❌ Failed to read: {e}")
+    counts = {'linked': 0, 'already_linked': 0, 'not_found': 0, 'address_missing': 0}
+    for result in results:
+        counts[result['status']] += 1
+        if result['status'] in ('linked', 'already_linked'):
+            manifest.mark_linked(images[result['google_addresses_id']], result['parcel_id'])
+        if not verbose:
             continue
-        
-        for record in records:
-            parcel_number = record.get('parcel_number')
-            google_addr_id = record.get('google_addresses_id')
-            
-            if not parcel_number or not google_addr_id:
-                continue
-            
-            # Check if already linked
-            cursor.execute("""
-                SELECT king_county_parcels_id FROM google_addresses WHERE id = %s
-            """, (google_addr_id,))
-            ga_row = cursor.fetchone()
-            
-            if ga_row and ga_row['king_county_parcels_id']:
-                total_already_linked += 1
-                continue  # Already linked
-            
-            # Find parcel by parcel_number
-            cursor.execute("""
-                SELECT id, google_addresses_id FROM king_county_parcels WHERE parcel_number = %s
-            """, (parcel_number,))
-            parcel_row = cursor.fetchone()
-            
-            if not parcel_row:
-                if verbose:
-                    print(f"   ❌ Parcel {parcel_number} not found in database (google_addr={google_addr_id})")
-                total_not_found += 1
-                continue
-            
-            parcel_id = parcel_row['id']
-            
-            # Link bidirectionally
-            try:
-                # Update google_addresses.king_county_parcels_id
-                cursor.execute("""
-                    UPDATE google_addresses SET king_county_parcels_id = %s WHERE id = %s
-                """, (parcel_id, google_addr_id))
-                
-                # Update king_county_parcels.google_addresses_id
-                cursor.execute("""
-                    UPDATE king_county_parcels SET google_addresses_id = %s WHERE id = %s
-                """, (google_addr_id, parcel_id))
-                
-                conn.commit()
-                total_linked += 1
-                if verbose:
-                    print(f"   ✅ Linked: google_addresses.id={google_addr_id} ↔ king_county_parcels.id={parcel_id} (parcel: {parcel_number})")
-                
-            except Exception as e:
-                if verbose:
-                    print(f"   ❌ Failed to link: {e}")
-    
-    cursor.close()
-    conn.close()
+        if result['status'] == 'linked':
+            print(f"   ✅ Linked: google_addresses.id={result['google_addresses_id']} ↔ king_county_parcels.id={result['parcel_id']} (parcel: {result['parcel_number']})")
+        elif result['status'] == 'not_found':
+            print(f"   ❌ Parcel {result['parcel_number']} not found in database (google_addr={result['google_addresses_id']})")
+        elif result['status'] == 'address_missing':
+            print(f"   ❌ google_addresses.id={result['google_addresses_id']} not found (parcel: {result['parcel_number']})")
     
     if verbose:
         print(f"\n{'='*60}")
         print(f"✅ COMPLETE:")
-        print(f"   🔗 Newly linked: {total_linked}")
-        print(f"   ⏭️  Already linked: {total_already_linked}")
-        print(f"   ❌ Not found: {total_not_found}")
+        print(f"   🔗 Newly linked: {counts['linked']}")
+        print(f"   ⏭️  Already linked: {counts['already_linked']}")
+        print(f"   ❌ Not found: {counts['not_found']}")
+        if counts['address_missing']:
+            print(f"   ❌ Address missing: {counts['address_missing']}")
         print(f"{'='*60}")
     
     # Return results for programmatic use
-    return {
-        'linked': total_linked,
-        'already_linked': total_already_linked,
-        'not_found': total_not_found
-    }
+    return counts
 
 if __name__ == "__main__":
     link_parcels_from_json()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk set-based upsert of apartment listings
+Prefetches the existing apartment_listings rows for a whole batch in a few
+queries, works out inserts / updates / price changes in memory, then writes
+them with multi-row statements. The caller owns the transaction.
+"""
+
+import hashlib
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+# Keys per SELECT ... IN (...) and rows per write statement
+PREFETCH_CHUNK = 500
+WRITE_CHUNK = 200
+
+# Columns refreshed on an existing listing (price is constant; changes go to the history table)
+UPDATE_COLUMNS = ("bedrooms", "bathrooms", "sqft", "description", "img_urls", "available",
+                  "available_date", "network_id", "listing_id")
+
+
+# ----------------------------
+# Value normalization
+# ----------------------------
+def norm_img_urls(value):
+    """Normalize image URLs to a single comma-separated string."""
+    if isinstance(value, list):
+        return ",".join([str(x).strip() for x in value if str(x).strip()])
+    return str(value or "").strip()
+
+
+def parse_available_date(val):
+    """Parse available_date into YYYY-MM-DD if possible, else None."""
+    if not val:
+        return None
+    s = str(val).strip()
+    sl = s.lower()
+    if sl in ("now", "today", "available now", "immediate"):
+        return None
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%m-%d-%y"):
+        try:
+            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
+        except Exception:
+            continue
+    return None
+
+
+def to_int(val, default=0):
+    """Parse integer from various string formats like "$1,750" or "1,200 sqft"."""
+    try:
+        if val is None:
+            return default
+        if isinstance(val, (int,)):
+            return int(val)
+        if isinstance(val, float):
+            return int(round(val))
+        s = str(val)
+        digits = ''.join(ch for ch in s if ch.isdigit())
+        return int(digits) if digits else default
+    except Exception:
+        return default
+
+
+def to_num_str(val, allow_decimal: bool = False, default: str = "0") -> str:
+    """Numeric string (for VARCHAR columns), preserving decimals when requested."""
+    try:
+        if val is None:
+            return default
+        s = str(val)
+        if allow_decimal:
+            cleaned = ''.join(ch for ch in s if (ch.isdigit() or ch == '.'))
+            # Normalize multiple dots
+            parts = cleaned.split('.')
+            if len(parts) > 2:
+                cleaned = parts[0] + '.' + ''.join(parts[1:])
+            return cleaned if cleaned else default
+        else:
+            digits = ''.join(ch for ch in s if ch.isdigit())
+            return digits if digits else default
+    except Exception:
+        return default
+
+
+def normalize_listing(listing: dict, default_network_id: int) -> dict:
+    """Map one JSON listing onto apartment_listings column values."""
+    try:
+        network_id = int(listing.get("network_id") or int(default_network_id))
+    except Exception:
+        network_id = int(default_network_id)
+    return {
+        "full_address": listing.get("full_address") or listing.get("address") or "",
+        "price": to_int(listing.get("price"), 0),                                         # INT
+        "bedrooms": to_num_str(listing.get("bedrooms"), allow_decimal=False, default="0"),  # VARCHAR(100)
+        "bathrooms": to_num_str(listing.get("bathrooms"), allow_decimal=True, default="0"),  # keep 1.5
+        "sqft": to_num_str(listing.get("sqft"), allow_decimal=False, default="0"),          # VARCHAR(50)
+        "description": listing.get("description") or "",
+        "img_urls": norm_img_urls(listing.get("img_urls") or listing.get("img_url") or ""),
+        "available": listing.get("available") or "",
+        "available_date": parse_available_date(listing.get("available_date")),
+        "building_name": listing.get("building_name") or listing.get("Building_Name") or None,
+        "city": listing.get("city") or None,
+        "state": listing.get("state") or None,
+        "listing_website": listing.get("listing_website") or listing.get("url") or listing.get("link") or None,
+        "listing_id": listing.get("listing_id") or None,
+        "network_id": network_id,
+    }
+
+
+def _chunks(seq, n):
+    seq = list(seq)
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+
+def _label(row) -> str:
+    return (row["full_address"] or row["listing_website"] or "unknown")[:60]
+
+
+# ----------------------------
+# Prefetch / plan / write
+# ----------------------------
+def prefetch_existing(cursor, rows):
+    """Load existing rows matching the batch by listing_website and full_address.
+    Returns (by_website, by_address): key -> (id, price, active), lowest id wins.
+    """
+    by_website, by_address = {}, {}
+    websites = {r["listing_website"] for r in rows if r["listing_website"]}
+    for chunk in _chunks(websites, PREFETCH_CHUNK):
+        cursor.execute(
+            f"SELECT id, price, active, listing_website FROM apartment_listings "
+            f"WHERE listing_website IN ({','.join(['%s'] * len(chunk))}) ORDER BY id",
+            tuple(chunk))
+        for lid, price, active, url in cursor.fetchall():
+            by_website.setdefault(url, (lid, price, active))
+    # Only rows the website lookup can't resolve fall back to the address
+    addresses = {r["full_address"] for r in rows
+                 if r["full_address"] and r["listing_website"] not in by_website}
+    for chunk in _chunks(addresses, PREFETCH_CHUNK):
+        cursor.execute(
+            f"SELECT id, price, active, full_address FROM apartment_listings "
+            f"WHERE full_address IN ({','.join(['%s'] * len(chunk))}) ORDER BY id",
+            tuple(chunk))
+        for lid, price, active, addr in cursor.fetchall():
+            by_address.setdefault(addr, (lid, price, active))
+    return by_website, by_address
+
+
+def plan_upsert(rows, by_website, by_address):
+    """Decide per row: insert, update, or update + price change.
+
+    Rows repeating a website/address already seen in this batch update the
+    earlier row instead of inserting a second copy.
+    """
+    plan = {"inserts": [], "updates": {}, "price_changes": [], "statuses": []}
+    pending = {}  # batch key -> index into inserts
+    change_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for row in rows:
+        url, addr = row["listing_website"], row["full_address"]
+        existing = (by_website.get(url) if url else None) or (by_address.get(addr) if addr else None)
+        if existing:
+            lid, old_price, _active = existing
+            if (old_price or 0) != (row["price"] or 0) and lid not in plan["updates"]:
+                plan["price_changes"].append((lid, str(row["price"]), change_time, row["network_id"]))
+                plan["statuses"].append(("price_change", f"💰 PRICE CHANGE: {_label(row)} ({old_price} → {row['price']})"))
+            else:
+                plan["statuses"].append(("updated", f"✓ UPDATED: {_label(row)}"))
+            plan["updates"][lid] = row
+            continue
+        key = next((k for k in (("w", url), ("a", addr)) if k[1] and k in pending), None)
+        if key is not None:
+            idx = pending[key]
+            price = plan["inserts"][idx]["price"]
+            plan["inserts"][idx] = {**row, "price": price}
+            plan["statuses"].append(("updated", f"✓ UPDATED: {_label(row)}"))
+            continue
+        plan["inserts"].append(row)
+        for k in (("w", url), ("a", addr)):
+            if k[1]:
+                pending[k] = len(plan["inserts"]) - 1
+        plan["statuses"].append(("new", f"✨ NEW: {_label(row)} ({row['price']})"))
+    return plan
+
+
+def write_plan(cursor, plan):
+    """Apply a plan with multi-row statements (no commit)."""
+    if plan["inserts"]:
+        cursor.executemany(
+            """
+            INSERT INTO apartment_listings
+            (active, bedrooms, bathrooms, sqft, price, img_urls, available, available_date,
+             description, Building_Name, full_address, city, state, listing_website,
+             time_created, time_updated, network_id, listing_id)
+            VALUES ('yes', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), %s, %s)
+            """,
+            [(r["bedrooms"], r["bathrooms"], r["sqft"], r["price"], r["img_urls"], r["available"],
+              r["available_date"], r["description"], r["building_name"], r["full_address"], r["city"],
+              r["state"], r["listing_website"], r["network_id"], r["listing_id"]) for r in plan["inserts"]])
+
+    # Updates: one UPDATE ... JOIN against an inline derived table per chunk
+    cols = ", ".join(f"%s AS {c}" for c in ("id",) + UPDATE_COLUMNS)
+    sets = ", ".join(f"t.{c} = v.{c}" for c in UPDATE_COLUMNS)
+    for chunk in _chunks(plan["updates"].items(), WRITE_CHUNK):
+        derived = " UNION ALL ".join([f"SELECT {cols}"] + ["SELECT " + ", ".join(["%s"] * (len(UPDATE_COLUMNS) + 1))] * (len(chunk) - 1))
+        params = []
+        for lid, r in chunk:
+            params.append(lid)
+            params.extend(r[c] for c in UPDATE_COLUMNS)
+        cursor.execute(
+            f"UPDATE apartment_listings t JOIN ({derived}) v ON t.id = v.id "
+            f"SET {sets}, t.time_updated = NOW(), t.active = 'yes'",
+            tuple(params))
+
+    if plan["price_changes"]:
+        cursor.executemany(
+            """
+            INSERT INTO apartment_listings_price_changes
+            (apartment_listings_id, new_price, time)
+            VALUES (%s, %s, %s)
+            """,
+            [(lid, price, ts) for lid, price, ts, _net in plan["price_changes"]])
+
+
+def bulk_upsert_listings(cursor, listings, default_network_id: int) -> dict:
+    """Upsert a whole batch of JSON listings; the caller commits or rolls back.
+
+    Returns {"rows", "plan", "new", "updated", "price_changes", "timings"}.
+    """
+    timings = {}
+    t0 = time.time()
+    rows = [normalize_listing(l, default_network_id) for l in listings if isinstance(l, dict)]
+    by_website, by_address = prefetch_existing(cursor, rows)
+    timings["prefetch"] = time.time() - t0
+
+    t1 = time.time()
+    plan = plan_upsert(rows, by_website, by_address)
+    timings["plan"] = time.time() - t1
+
+    t2 = time.time()
+    write_plan(cursor, plan)
+    timings["write"] = time.time() - t2
+
+    return {
+        "rows": rows,
+        "plan": plan,
+        "new": len(plan["inserts"]),
+        "updated": sum(1 for kind, _ in plan["statuses"] if kind == "updated"),
+        "price_changes": len(plan["price_changes"]),
+        "timings": timings,
+    }
+
+
+def _key_hash(value: str) -> bytes:
+    return hashlib.sha1(value.encode("utf-8")).digest()
+
+
+def deactivate_missing(cursor, network_id: int, current_urls, current_addresses) -> int:
+    """Mark active listings of a network inactive when neither their listing_website
+    nor their full_address is in the current batch. Returns the number deactivated.
+
+    The batch keys go into a temporary table (as SHA-1, so long URLs index fine)
+    and one UPDATE ... LEFT JOIN does the rest. If temporary tables are not
+    allowed, missing ids are found in Python and updated in chunked IN lists.
+    """
+    keys = [("u", _key_hash(u)) for u in current_urls if u] + \
+           [("a", _key_hash(a)) for a in current_addresses if a]
+    try:
+        cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS tmp_current_listing_keys (
+                kind CHAR(1) NOT NULL,
+                h BINARY(20) NOT NULL,
+                PRIMARY KEY (kind, h)
+            )
+        """)
+        cursor.execute("DELETE FROM tmp_current_listing_keys")
+        for chunk in _chunks(keys, PREFETCH_CHUNK):
+            cursor.executemany(
+                "INSERT IGNORE INTO tmp_current_listing_keys (kind, h) VALUES (%s, %s)", chunk)
+    except Exception:
+        return _deactivate_missing_by_ids(cursor, network_id, set(current_urls), set(current_addresses))
+
+    cursor.execute("""
+        UPDATE apartment_listings t
+        LEFT JOIN tmp_current_listing_keys u ON u.kind = 'u' AND u.h = UNHEX(SHA1(t.listing_website))
+        LEFT JOIN tmp_current_listing_keys a ON a.kind = 'a' AND a.h = UNHEX(SHA1(t.full_address))
+        SET t.active = 'no', t.time_updated = NOW()
+        WHERE t.active = 'yes' AND t.network_id = %s
+          AND u.h IS NULL AND a.h IS NULL
+    """, (int(network_id),))
+    count = cursor.rowcount or 0
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_current_listing_keys")
+    return count
+
+
+def _deactivate_missing_by_ids(cursor, network_id: int, current_urls: set, current_addresses: set) -> int:
+    cursor.execute(
+        "SELECT id, listing_website, full_address FROM apartment_listings WHERE active='yes' AND network_id=%s",
+        (int(network_id),))
+    missing = [lid for lid, url, fa in cursor.fetchall() or []
+               if not (url and url in current_urls) and not (fa and fa in current_addresses)]
+    count = 0
+    for chunk in _chunks(missing, WRITE_CHUNK):
+        cursor.execute(
+            f"UPDATE apartment_listings SET active='no', time_updated=NOW() "
+            f"WHERE id IN ({','.join(['%s'] * len(chunk))})",
+            tuple(chunk))
+        count += cursor.rowcount or 0
+    return count
+
+
+# ----------------------------
+# network_daily_stats
+# ----------------------------
+class NetworkStatsDeltas:
+    """Per-network counters for one run, written as one upsert per network."""
+
+    def __init__(self):
+        self.deltas = {}
+
+    def add(self, network_id, added: int = 0, price_changes: int = 0, subtracted: int = 0):
+        d = self.deltas.setdefault(int(network_id), {"added": 0, "price_changes": 0, "subtracted": 0})
+        d["added"] += added
+        d["price_changes"] += price_changes
+        d["subtracted"] += subtracted
+
+    def add_plan(self, plan):
+        """Count the new listings and price changes of a bulk upsert plan."""
+        for row in plan["inserts"]:
+            self.add(row["network_id"], added=1)
+        for _lid, _price, _ts, net_id in plan["price_changes"]:
+            self.add(net_id, price_changes=1)
+
+    def write(self, cursor, date: str = None) -> dict:
+        """Add this run's deltas to today's row for each network and set
+        total_listings to the network's current active count.
+        Returns {network_id: {..., "total": active_count}}."""
+        if not self.deltas:
+            return {}
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        ids = sorted(self.deltas)
+        cursor.execute(
+            f"SELECT network_id, COUNT(*) FROM apartment_listings "
+            f"WHERE active='yes' AND network_id IN ({','.join(['%s'] * len(ids))}) GROUP BY network_id",
+            tuple(ids))
+        totals = {int(nid): int(cnt) for nid, cnt in cursor.fetchall()}
+        cursor.executemany(
+            """
+            INSERT INTO network_daily_stats
+            (network_id, date, price_changes, apartments_added, apartments_subtracted, total_listings)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            price_changes = price_changes + VALUES(price_changes),
+            apartments_added = apartments_added + VALUES(apartments_added),
+            apartments_subtracted = apartments_subtracted + VALUES(apartments_subtracted),
+            total_listings = VALUES(total_listings)
+            """,
+            [(nid, date, self.deltas[nid]["price_changes"], self.deltas[nid]["added"],
+              self.deltas[nid]["subtracted"], totals.get(nid, 0)) for nid in ids])
+        return {nid: {**self.deltas[nid], "total": totals.get(nid, 0)} for nid in ids}
+
+
+def listing_domain(url) -> str:
+    try:
+        return urlparse(url).netloc if url else ""
+    except Exception:
+        return ""
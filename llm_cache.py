@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache for LLM extraction results
+Keys are a hash of (model, prompt version, input content), values are the
+parsed structured output. Retried or re-run jobs with identical input get
+the stored result instead of a new API call. Entries expire after a TTL
+and the least recently used ones are evicted once the store exceeds its
+size limit. Backed by one SQLite file shared by all processes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(Path(__file__).resolve().parent / "Captures" / "llm_cache.sqlite")))
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+# Set LLM_CACHE_DISABLED=1 to always call the API
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "0") == "1"
+
+# Evict at most once per this many puts
+_EVICT_EVERY = 50
+
+
+def cache_key(model: str, prompt_version: str, *inputs) -> str:
+    """Hash model, prompt version and the (already minimized) inputs.
+
+    Inputs may be str, bytes or file paths (hashed by content).
+    """
+    h = hashlib.sha256()
+    h.update(f"{model}\0{prompt_version}\0".encode("utf-8"))
+    for item in inputs:
+        if isinstance(item, Path):
+            item = item.read_bytes()
+        elif not isinstance(item, (bytes, bytearray)):
+            item = str(item).encode("utf-8")
+        h.update(hashlib.sha256(item).digest())
+    return h.hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL_SEC,
+                 max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, model TEXT, prompt_version TEXT, value TEXT,"
+            " size INTEGER, created REAL, last_used REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Stored value for key, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any, model: str = "", prompt_version: str = ""):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, prompt_version, value, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, data, len(data), now, now))
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % _EVICT_EVERY == 1:
+                self._evict_locked(now)
+
+    def evict(self) -> int:
+        with self._lock:
+            return self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> int:
+        """Drop expired entries, then least recently used ones over the size limit."""
+        removed = 0
+        if self.ttl:
+            removed += self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,)).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            doomed, freed = [], 0
+            for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used").fetchall():
+                if freed >= excess:
+                    break
+                doomed.append((key,))
+                freed += size
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+            removed += len(doomed)
+        self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Process-wide cache, or None when disabled or the store cannot be opened."""
+    global _cache
+    if LLM_CACHE_DISABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMCache()
+            except Exception as e:
+                print(f"⚠ LLM cache unavailable ({LLM_CACHE_PATH}): {e}")
+                return None
+        return _cache
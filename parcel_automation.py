@@ -14,13 +14,26 @@ import tkinter as tk
 from tkinter import ttk
 import threading
 import webbrowser
-from PIL import Image, ImageGrab
+import numpy as np
+from PIL import Image
 import pyautogui
 import pytesseract
+from parcel_ocr import (
+    get_ocr_service, preprocess_for_ocr, as_pil, match_parcel_fields, PARCEL_FIELD_PATTERNS
+)
+from screen_capture import Capture, get_debug_sink, get_region_capture
+from parcel_pipeline import StagePipeline, PIPELINE_OCR_WORKERS, PIPELINE_EXTRACT_WORKERS
+from parcel_manifest import get_parcel_manifest
+from parcel_index import get_parcel_index
 
 # Configure Tesseract path
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# ChatGPT field extraction; bump the prompt version whenever the prompt
+# changes so cached responses for the old prompt are not reused
+CHATGPT_MODEL = "gpt-4-turbo-preview"
+CHATGPT_PROMPT_VERSION = "parcel-ocr-v1"
+
 # Setup logging
 log_file = Path(__file__).parent / "logs" / "parcel_automation.log"
 log_file.parent.mkdir(exist_ok=True)
@@ -64,7 +77,8 @@ class ParcelAutomationWindow:
         self.search_field_y = 201  # Default
         self.load_coordinates_from_api()
         
-        # Store last screenshot path for review
+        # Store last screenshot (in memory) and its path, if written, for review
+        self.last_screenshot = None
         self.last_screenshot_path = None
         
         # Store extracted data in memory instead of saving to file
@@ -437,6 +451,15 @@ class ParcelAutomationWindow:
         )
         self.batch_progress_label.pack(anchor="w", pady=2)
         
+        # Per-stage progress: captured | ocr | extract | save
+        self.pipeline_progress_label = tk.Label(
+            info_frame,
+            text="",
+            font=("Consolas", 9),
+            bg="#ECF0F1"
+        )
+        self.pipeline_progress_label.pack(anchor="w", pady=2)
+        
         # Progress bar for batch
         self.batch_progress_var = tk.DoubleVar()
         self.batch_progress_bar = ttk.Progressbar(
@@ -509,34 +532,69 @@ class ParcelAutomationWindow:
         thread.start()
     
     def run_batch_automation(self):
-        """Process all parcels one by one"""
+        """Process all parcels: this thread drives the browser and captures popups,
+        the pipeline runs OCR, extraction and JSON saves behind it"""
         try:
             self._in_batch_mode = True
+            self._pipeline_done = 0
+            pipeline = StagePipeline(
+                [("ocr", self._pipeline_ocr, PIPELINE_OCR_WORKERS),
+                 ("extract", self._pipeline_extract, PIPELINE_EXTRACT_WORKERS)],
+                self._pipeline_save,
+                on_progress=self._pipeline_progress,
+            )
             
-            for idx, parcel in enumerate(self.all_parcels):
-                if not self.is_running:
-                    break
+            try:
+                # Parcels the offline index knows are saved right away; only the rest go to the browser
+                local, remaining = [], []
+                for parcel in self.all_parcels:
+                    record = self.lookup_local(parcel)
+                    (local if record is not None else remaining).append(record or parcel)
+                if local:
+                    self._pipeline_save(local)
+                    self.window.after(0, lambda n=len(local), m=len(remaining): self.append_log(
+                        f"✓ {n} parcels from the offline index, {m} left for the parcel viewer"))
+            
+                for idx, parcel in enumerate(remaining):
+                    if not self.is_running:
+                        break
                 
-                # Update current parcel
-                self.parcel_data = parcel
+                    # Update current parcel
+                    self.parcel_data = parcel
                 
-                # Update batch progress
-                self.window.after(0, lambda i=idx, p=parcel: self.batch_progress_label.config(
-                    text=f"Processing: {p.get('address', 'N/A')} ({i+1} / {len(self.all_parcels)})"
-                ))
+                    # Update batch progress
+                    self.window.after(0, lambda i=idx, p=parcel: self.batch_progress_label.config(
+                        text=f"Capturing: {p.get('address', 'N/A')} ({i+1} / {len(remaining)})"
+                    ))
                 
-                # Run automation for this parcel
-                self.run_automation()
+                    # Browser steps + popup crop here; OCR and ChatGPT run in the pipeline
+                    try:
+                        screenshot_image = self.capture_parcel()
+                        if screenshot_image is None:
+                            break
+                        popup_image = self.locate_popup_image(screenshot_image, parcel)
+                    except Exception as e:
+                        logging.error(f"Capture failed for {parcel.get('address')}: {e}", exc_info=True)
+                        self.window.after(0, lambda err=str(e): self.append_log(f"✗ Capture error: {err}"))
+                        continue
                 
-                # Update batch progress bar
-                self.window.after(0, lambda i=idx: self.batch_progress_var.set(i + 1))
+                    # Waits here when OCR/extraction fall behind
+                    if not pipeline.submit((parcel, popup_image), cancel=lambda: not self.is_running):
+                        break
+                    self.update_status(f"✓ Captured {idx + 1} / {len(remaining)}, next address...", 5)
                 
-                # Small delay between parcels
-                time.sleep(2)
+                    # Small delay between parcels
+                    time.sleep(2)
+            finally:
+                # Whatever was captured still gets saved to parcels_data.json, even after an error
+                self.window.after(0, lambda: self.update_status("Waiting for OCR and extraction to finish..."))
+                pipeline.close()
+                pipeline.join()
+                logging.info(f"Pipeline finished: {pipeline.summary()}")
             
             # All done
             self.window.after(0, lambda: self.batch_progress_label.config(
-                text=f"Completed: {len(self.all_parcels)} / {len(self.all_parcels)}"
+                text=f"Completed: {self._pipeline_done} / {len(self.all_parcels)}"
             ))
             self.window.after(0, lambda: self.update_status("Processing complete! Uploading to database..."))
             
@@ -552,6 +610,25 @@ class ParcelAutomationWindow:
             self.window.after(0, lambda: self.process_all_btn.config(state=tk.NORMAL))
             self.window.after(0, lambda: self.stop_batch_btn.config(state=tk.DISABLED))
     
+    def _pipeline_ocr(self, item):
+        parcel, popup_image = item
+        return parcel, self.ocr_popup(popup_image)
+    
+    def _pipeline_extract(self, item):
+        parcel, extracted_text = item
+        return self.extract_parcel(parcel, extracted_text)
+    
+    def _pipeline_save(self, records):
+        self.save_parcel_records(records)
+        self.extracted_data.extend(records)
+        self._pipeline_done += len(records)
+        self.window.after(0, lambda d=records[-1]: self.update_json_display(d))
+        self.window.after(0, lambda n=self._pipeline_done: self.batch_progress_var.set(n))
+    
+    def _pipeline_progress(self, pipeline):
+        text = pipeline.summary()
+        self.window.after(0, lambda t=text: self.pipeline_progress_label.config(text=t))
+    
     def update_json_display(self, data):
         """Update the JSON treeview with new data in vertical format"""
         # Clear previous data
@@ -676,6 +753,12 @@ class ParcelAutomationWindow:
         if self.last_screenshot_path and self.last_screenshot_path.exists():
             import os
             os.startfile(str(self.last_screenshot_path))
+        elif self.last_screenshot is not None:
+            # Debug captures are off: write the in-memory screenshot now
+            import os
+            path = self.capture_dir / "screenshot_last.png"
+            Image.fromarray(self.last_screenshot.image).save(path)
+            os.startfile(str(path))
         else:
             self.append_log("No screenshot available yet")
     
@@ -722,20 +805,130 @@ class ParcelAutomationWindow:
         if self.window:
             self.window.destroy()
     
+    def capture_parcel(self):
+        """Steps 1-6 for self.parcel_data: browser, address, search, capture.
+        
+        Returns the screen_capture.Capture, or None when stopped.
+        """
+        # Check if this is the first run or if we need to open browser
+        if not hasattr(self, '_browser_opened') or not self._browser_opened:
+            # Step 1: Open parcel viewer in browser with zoom flag (first time only)
+            self.update_status("Opening parcel viewer in browser at 75% zoom...", 0)
+            parcel_link = self.parcel_data.get('parcel_link', '')
+            if not parcel_link:
+                raise ValueError("No parcel link available")
+        
+            # Open with Chrome/Edge and set zoom to 75%
+            self.open_browser_with_zoom(parcel_link, 0.75)
+            time.sleep(4)  # Wait for browser to open and load
+        
+            # Check for pause
+            while self.is_paused and self.is_running:
+                time.sleep(0.5)
+        
+            if not self.is_running:
+                return None
+        
+            # Step 2: Position browser window (right 80%)
+            self.update_status("Positioning browser window to right 80% of screen...", 1)
+            self.position_browser_window()
+            time.sleep(1)
+        
+            self._browser_opened = True
+        else:
+            # Browser already open, just clear the search field
+            self.update_status("Clearing previous search...", 0)
+            # Click search field using loaded coordinates
+            pyautogui.click(self.search_field_x, self.search_field_y)
+            time.sleep(0.3)
+        
+            # Select all and clear
+            pyautogui.hotkey('ctrl', 'a')
+            time.sleep(0.2)
+            pyautogui.press('backspace')
+            time.sleep(0.5)
+        
+        if not self.is_running:
+            return None
+        
+        # Step 3: Enter address in search field
+        self.update_status("Entering address in search field...", 2)
+        address = self.parcel_data.get('address', '')
+        if not address:
+            raise ValueError("No address provided")
+        
+        # Always click the field to focus it
+        self.enter_address(address, click_field=True)
+        time.sleep(1)
+        
+        # Check for pause
+        while self.is_paused and self.is_running:
+            time.sleep(0.5)
+        
+        if not self.is_running:
+            return None
+        
+        # Step 4: Submit search
+        self.update_status("Submitting search...", 3)
+        pyautogui.press('enter')
+        time.sleep(3)  # Wait for search to process
+        
+        # Check for pause
+        while self.is_paused and self.is_running:
+            time.sleep(0.5)
+        
+        if not self.is_running:
+            return None
+        
+        # Step 5: Wait for results to load
+        self.update_status("Waiting for results to load...", 4)
+        time.sleep(5)  # Additional wait for page to fully load
+        
+        # Check for pause
+        while self.is_paused and self.is_running:
+            time.sleep(0.5)
+        
+        if not self.is_running:
+            return None
+        
+        # Step 6: Capture screenshot
+        self.update_status("Capturing screenshot...", 5)
+        screenshot_image = self.capture_screenshot()
+        self.last_screenshot = screenshot_image
+        
+        # Save screenshot for review (background write, only with PARCEL_DEBUG_CAPTURES=1)
+        from datetime import datetime
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        screenshot_path = self.capture_dir / f"screenshot_{timestamp}.png"
+        if get_debug_sink().debug(screenshot_image.image, screenshot_path):
+            self.last_screenshot_path = screenshot_path
+            self.window.after(0, lambda: self.append_log(f"📸 Screenshot saved: {screenshot_path.name}"))
+        self.window.after(0, lambda: self.view_screenshot_btn.config(state=tk.NORMAL))
+        
+        # Check for pause
+        while self.is_paused and self.is_running:
+            time.sleep(0.5)
+        
+        if not self.is_running:
+            return None
+        
+        return screenshot_image
+    
     def run_automation(self):
         """Main automation logic"""
         try:
-            # Check if this is the first run or if we need to open browser
-            if not hasattr(self, '_browser_opened') or not self._browser_opened:
-                # Step 1: Open parcel viewer in browser with zoom flag (first time only)
-                self.update_status("Opening parcel viewer in browser at 75% zoom...", 0)
-                parcel_link = self.parcel_data.get('parcel_link', '')
-                if not parcel_link:
-                    raise ValueError("No parcel link available")
+            extracted_data = self.lookup_local(self.parcel_data)
+            if extracted_data is not None:
+                self.update_status("✓ Found in offline parcel index, browser skipped", 7)
+                self.window.after(0, lambda d=extracted_data: self.update_json_results(d))
+            else:
+                screenshot_image = self.capture_parcel()
+                if screenshot_image is None:
+                    return
                 
-                # Open with Chrome/Edge and set zoom to 75%
-                self.open_browser_with_zoom(parcel_link, 0.75)
-                time.sleep(4)  # Wait for browser to open and load
+                # Step 7: Process image with OCR
+                self.update_status("Processing image with OCR...", 6)
+                extracted_text = self.process_with_ocr(screenshot_image)
                 
                 # Check for pause
                 while self.is_paused and self.is_running:
@@ -744,163 +937,12 @@ class ParcelAutomationWindow:
                 if not self.is_running:
                     return
                 
-                # Step 2: Position browser window (right 80%)
-                self.update_status("Positioning browser window to right 80% of screen...", 1)
-                self.position_browser_window()
-                time.sleep(1)
-                
-                self._browser_opened = True
-            else:
-                # Browser already open, just clear the search field
-                self.update_status("Clearing previous search...", 0)
-                # Click search field using loaded coordinates
-                pyautogui.click(self.search_field_x, self.search_field_y)
-                time.sleep(0.3)
-                
-                # Select all and clear
-                pyautogui.hotkey('ctrl', 'a')
-                time.sleep(0.2)
-                pyautogui.press('backspace')
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 3: Enter address in search field
-            self.update_status("Entering address in search field...", 2)
-            address = self.parcel_data.get('address', '')
-            if not address:
-                raise ValueError("No address provided")
-            
-            # Always click the field to focus it
-            self.enter_address(address, click_field=True)
-            time.sleep(1)
-            
-            # Check for pause
-            while self.is_paused and self.is_running:
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 4: Submit search
-            self.update_status("Submitting search...", 3)
-            pyautogui.press('enter')
-            time.sleep(3)  # Wait for search to process
-            
-            # Check for pause
-            while self.is_paused and self.is_running:
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 5: Wait for results to load
-            self.update_status("Waiting for results to load...", 4)
-            time.sleep(5)  # Additional wait for page to fully load
-            
-            # Check for pause
-            while self.is_paused and self.is_running:
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 6: Capture screenshot
-            self.update_status("Capturing screenshot...", 5)
-            screenshot_image = self.capture_screenshot()
-            
-            # Save screenshot for review
-            from datetime import datetime
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = self.capture_dir / f"screenshot_{timestamp}.png"
-            screenshot_image.save(screenshot_path)
-            self.last_screenshot_path = screenshot_path
-            self.window.after(0, lambda: self.append_log(f"📸 Screenshot saved: {screenshot_path.name}"))
-            self.window.after(0, lambda: self.view_screenshot_btn.config(state=tk.NORMAL))
-            
-            # Check for pause
-            while self.is_paused and self.is_running:
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 7: Process image with OCR
-            self.update_status("Processing image with OCR...", 6)
-            extracted_text = self.process_with_ocr(screenshot_image)
-            
-            # Check for pause
-            while self.is_paused and self.is_running:
-                time.sleep(0.5)
-            
-            if not self.is_running:
-                return
-            
-            # Step 8: Extract data using both methods for comparison
-            self.update_status("Extracting with ChatGPT...", 7)
-            self.window.after(0, lambda: self.append_log("Sending OCR text to ChatGPT for extraction..."))
-            
-            # Extract with ChatGPT (primary method)
-            chatgpt_data = self.extract_with_chatgpt(extracted_text)
-            
-            # Also extract with regex for comparison
-            ocr_data = self.extract_structured_data(extracted_text)
-            
-            # Use ChatGPT data as primary
-            extracted_data = chatgpt_data
-            
-            # Update both tabs with results
-            self.window.after(0, lambda: self.update_json_results(chatgpt_data))
-            self.window.after(0, lambda: self.update_ocr_results(ocr_data))
-            
-            self.window.after(0, lambda: self.append_log(f"Data extracted, fields count: {len(extracted_data.get('extracted_fields', {}))}"))
-            self.window.after(0, lambda d=extracted_data: self.append_log(f"Extracted fields: {list(d.get('extracted_fields', {}).keys())}"))
+                # Step 8: Extract data using both methods for comparison
+                self.update_status("Extracting with ChatGPT...", 7)
+                extracted_data = self.extract_parcel(self.parcel_data, extracted_text)
             
             # Save to single JSON file - append to existing data
-            json_path = self.capture_dir / "parcels_data.json"
-            
-            import json
-            try:
-                # Load existing data if file exists
-                all_data = []
-                if json_path.exists():
-                    try:
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            if content.strip():  # Only parse if not empty
-                                all_data = json.loads(content)
-                            else:
-                                all_data = []
-                    except json.JSONDecodeError as e:
-                        logging.warning(f"JSON file corrupted, starting fresh: {e}")
-                        all_data = []
-                    except Exception as e:
-                        logging.warning(f"Could not load existing JSON: {e}")
-                        all_data = []
-                
-                # Append new data
-                self.window.after(0, lambda p=json_path: self.append_log(f'Saving to JSON: {p}'))
-                self.window.after(0, lambda c=len(all_data): self.append_log(f'Current records in file: {c}'))
-                all_data.append(extracted_data)
-                self.window.after(0, lambda c=len(all_data): self.append_log(f'After append: {c} records'))
-                logging.info(f"Appending data. Current count: {len(all_data)}")
-                
-                # Save updated data
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_data, f, indent=2, ensure_ascii=False)
-                self.window.after(0, lambda: self.append_log(f"✓ JSON saved to file"))
-                
-                logging.info(f"✓ Appended data to: {json_path} (total records: {len(all_data)})")
-                
-            except Exception as e:
-                logging.error(f"Failed to save JSON: {e}")
-                self.window.after(0, lambda err=str(e): self.append_log(f'✗ JSON SAVE ERROR: {err}'))
-                import traceback
-                tb = traceback.format_exc()
-                self.window.after(0, lambda t=tb: self.append_log(f'Traceback: {t}'))
-                import traceback
-                logging.error(traceback.format_exc())
+            self.save_parcel_records([extracted_data])
             
             # Database upload happens after all parcels are processed (in batch mode)
             # Individual uploads are skipped during batch processing
@@ -945,6 +987,86 @@ class ParcelAutomationWindow:
                 self.is_running = False
             self.stop_btn.config(state=tk.DISABLED)
     
+    def lookup_local(self, parcel):
+        """Record for the parcel from the offline parcel index, or None to use the parcel viewer"""
+        index = get_parcel_index()
+        if index is None:
+            return None
+        fields = index.lookup(parcel.get('address', ''))
+        if fields is None:
+            return None
+        record = self._chatgpt_result('', fields, parcel)
+        record['source'] = 'parcel_index'
+        return record
+    
+    def extract_parcel(self, parcel, extracted_text):
+        """Step 8: ChatGPT extraction (primary) plus regex for comparison; returns the record"""
+        self.window.after(0, lambda: self.append_log("Sending OCR text to ChatGPT for extraction..."))
+        
+        # Extract with ChatGPT (primary method)
+        chatgpt_data = self.extract_with_chatgpt(extracted_text, parcel)
+        
+        # Also extract with regex for comparison
+        ocr_data = self.extract_structured_data(extracted_text, parcel)
+        
+        # Use ChatGPT data as primary
+        extracted_data = chatgpt_data
+        
+        # Update both tabs with results
+        self.window.after(0, lambda: self.update_json_results(chatgpt_data))
+        self.window.after(0, lambda: self.update_ocr_results(ocr_data))
+        
+        self.window.after(0, lambda: self.append_log(f"Data extracted, fields count: {len(extracted_data.get('extracted_fields', {}))}"))
+        self.window.after(0, lambda d=extracted_data: self.append_log(f"Extracted fields: {list(d.get('extracted_fields', {}).keys())}"))
+        
+        return extracted_data
+    
+    def save_parcel_records(self, records):
+        """Append extracted records to parcels_data.json in one read/write"""
+        json_path = self.capture_dir / "parcels_data.json"
+        
+        import json
+        try:
+            # Load existing data if file exists
+            all_data = []
+            if json_path.exists():
+                try:
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                        if content.strip():  # Only parse if not empty
+                            all_data = json.loads(content)
+                        else:
+                            all_data = []
+                except json.JSONDecodeError as e:
+                    logging.warning(f"JSON file corrupted, starting fresh: {e}")
+                    all_data = []
+                except Exception as e:
+                    logging.warning(f"Could not load existing JSON: {e}")
+                    all_data = []
+            
+            # Append new data
+            self.window.after(0, lambda p=json_path: self.append_log(f'Saving to JSON: {p}'))
+            self.window.after(0, lambda c=len(all_data): self.append_log(f'Current records in file: {c}'))
+            all_data.extend(records)
+            self.window.after(0, lambda c=len(all_data): self.append_log(f'After append: {c} records'))
+            logging.info(f"Appending data. Current count: {len(all_data)}")
+            
+            # Save updated data
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(all_data, f, indent=2, ensure_ascii=False)
+            self.window.after(0, lambda: self.append_log(f"✓ JSON saved to file"))
+            
+            logging.info(f"✓ Appended data to: {json_path} (total records: {len(all_data)})")
+            
+        except Exception as e:
+            logging.error(f"Failed to save JSON: {e}")
+            self.window.after(0, lambda err=str(e): self.append_log(f'✗ JSON SAVE ERROR: {err}'))
+            import traceback
+            tb = traceback.format_exc()
+            self.window.after(0, lambda t=tb: self.append_log(f'Traceback: {t}'))
+            import traceback
+            logging.error(traceback.format_exc())
+    
     def open_browser_with_zoom(self, url, zoom_level=0.75):
         """Open browser with specific zoom level using subprocess"""
         try:
@@ -1087,11 +1209,13 @@ class ParcelAutomationWindow:
             # Don't raise - let automation continue to see what happens
             logging.warning("Continuing automation despite address entry error...")
     
-    def capture_screenshot(self):
-        """Capture screenshot of browser area - popup detection happens in find_info_popup"""
+    def capture_screenshot(self, full=False):
+        """Capture the predicted popup region, or the browser area (right 80% of screen).
+        
+        Returns a screen_capture.Capture (numpy array + screen offset); popup
+        detection happens in find_info_popup.
+        """
         try:
-            # Capture the entire browser area (right 80% of screen)
-            # Don't hardcode popup position - let find_info_popup detect it dynamically
             screen_width = pyautogui.size()[0]
             screen_height = pyautogui.size()[1]
             
@@ -1100,90 +1224,63 @@ class ParcelAutomationWindow:
             width = int(screen_width * 0.8)
             height = screen_height
             
-            screenshot = ImageGrab.grab(bbox=(x, y, x + width, y + height))
+            screenshot = get_region_capture().capture((x, y, x + width, y + height), full=full)
             
-            logging.info(f"Browser screenshot captured: {screenshot.width}x{screenshot.height}")
+            kind = "Popup region" if screenshot.is_region else "Browser screenshot"
+            logging.info(f"{kind} captured: {screenshot.image.shape[1]}x{screenshot.image.shape[0]} at {screenshot.offset}")
             return screenshot
             
         except Exception as e:
             logging.error(f"Error capturing screenshot: {e}")
             raise
     
-    def process_with_ocr(self, screenshot_image):
-        """Process screenshot with OCR to extract text from popup"""
+    def process_with_ocr(self, screenshot_image, parcel=None):
+        """Process a capture (or PIL image / numpy array) with OCR to extract text from popup"""
+        logging.info("=== Starting OCR processing ===")
         try:
-            logging.info("=== Starting OCR processing ===")
-            
-            # screenshot_image is already a PIL Image, not a path
-            full_image = screenshot_image
-            logging.info(f"Image size: {full_image.size[0]}x{full_image.size[1]} pixels")
-            
-            # Try to find the info popup by looking for the icon
-            image_to_ocr = self.find_info_popup(full_image)
-            
-            if image_to_ocr is None:
-                logging.warning("Could not find info popup, using full image")
-                image_to_ocr = full_image
-            
-            # Popup is small (220x140), upscale for better OCR
+            image_to_ocr = self.locate_popup_image(screenshot_image, parcel)
+        except Exception as e:
+            logging.error(f"❌ Error processing with OCR: {e}")
+            import traceback
+            logging.error(traceback.format_exc())
+            return ""
+        return self.ocr_popup(image_to_ocr)
+    
+    def locate_popup_image(self, screenshot_image, parcel=None):
+        """Popup crop from a capture, re-capturing the full browser area if it is
+        not in the predicted region. Touches the screen, so call it from the
+        browser thread; falls back to the whole capture."""
+        if not isinstance(screenshot_image, Capture):
+            screenshot_image = Capture(np.asarray(screenshot_image), (0, 0), False)
+        logging.info(f"Image size: {screenshot_image.image.shape[1]}x{screenshot_image.image.shape[0]} pixels")
+        
+        # Try to find the info popup by looking for the icon
+        image_to_ocr = self.find_info_popup(screenshot_image.image, screenshot_image.offset, parcel)
+        
+        if image_to_ocr is None and screenshot_image.is_region:
+            logging.warning("Popup not in predicted region, capturing full browser area")
+            screenshot_image = self.capture_screenshot(full=True)
+            self.last_screenshot = screenshot_image
+            image_to_ocr = self.find_info_popup(screenshot_image.image, screenshot_image.offset, parcel)
+        
+        if image_to_ocr is None:
+            logging.warning("Could not find info popup, using full image")
+            image_to_ocr = screenshot_image.image
+        return image_to_ocr
+    
+    def ocr_popup(self, image_to_ocr):
+        """OCR text of a popup image (no screen access, safe on worker threads)"""
+        try:
+            # Upscale, denoise, contrast, sharpen, threshold
+            image_to_ocr = as_pil(image_to_ocr)
             original_width, original_height = image_to_ocr.size
-            scale_factor = 6  # 6x upscale: 220x140 -> 1320x840
-            new_width = original_width * scale_factor
-            new_height = original_height * scale_factor
-            
-            logging.info(f"Upscaling image from {original_width}x{original_height} to {new_width}x{new_height} for OCR")
-            image_to_ocr = image_to_ocr.resize((new_width, new_height), Image.LANCZOS)
-            
-            # Apply multiple image enhancements for better OCR
-            from PIL import ImageEnhance, ImageFilter
-            
-            # Convert to grayscale
-            image_to_ocr = image_to_ocr.convert('L')
-            logging.info("Converted to grayscale")
-            
-            # Apply slight blur to reduce noise
-            image_to_ocr = image_to_ocr.filter(ImageFilter.MedianFilter(size=3))
-            
-            # Enhance contrast significantly
-            enhancer = ImageEnhance.Contrast(image_to_ocr)
-            image_to_ocr = enhancer.enhance(3.0)  # 3x contrast
-            
-            # Enhance sharpness
-            enhancer = ImageEnhance.Sharpness(image_to_ocr)
-            image_to_ocr = enhancer.enhance(2.0)  # 2x sharpness
-            
-            # Apply binary threshold to make text crisp black/white
-            from PIL import ImageOps
-            # Auto-adjust levels to maximize contrast
-            image_to_ocr = ImageOps.autocontrast(image_to_ocr, cutoff=2)
-            
-            # Convert to pure black and white using threshold
-            threshold = 140  # Pixels darker than this become black, lighter become white
-            image_to_ocr = image_to_ocr.point(lambda x: 0 if x < threshold else 255, '1')
-            
-            logging.info("Applied image preprocessing: grayscale, denoise, contrast, sharpen, threshold")
+            image_to_ocr = preprocess_for_ocr(image_to_ocr)
+            logging.info(f"Preprocessed {original_width}x{original_height} -> {image_to_ocr.size[0]}x{image_to_ocr.size[1]} for OCR")
             
-            # Try OCR on the image
-            logging.info("Running pytesseract OCR...")
-            
-            # Use PSM 3 (fully automatic page segmentation) since popup can be anywhere
-            # and PSM 11 (sparse text) as backup
-            configs = [
-                r'--oem 3 --psm 3',  # Fully automatic page segmentation
-                r'--oem 3 --psm 11', # Sparse text
-                r'--oem 3 --psm 6',  # Uniform block of text
-            ]
-            
-            best_text = ""
-            for config in configs:
-                try:
-                    text = pytesseract.image_to_string(image_to_ocr, config=config)
-                    if len(text) > len(best_text):
-                        best_text = text
-                        logging.info(f"Config '{config}' extracted {len(text)} chars")
-                except Exception as e:
-                    logging.warning(f"Config '{config}' failed: {e}")
-                    continue
+            # All configs in parallel; stops early once one reads every parcel field
+            ocr = get_ocr_service()
+            logging.info(f"Running OCR ({ocr.backend}, {len(ocr.configs)} configs in parallel)...")
+            best_text, best_config = ocr.run(image_to_ocr)
             
             logging.info(f"Best OCR extracted {len(best_text)} characters")
             if len(best_text) > 0:
@@ -1200,61 +1297,40 @@ class ParcelAutomationWindow:
             # Return empty string if OCR fails
             return ""
     
-    def find_info_popup(self, image):
-        """Find and crop the info popup box by detecting the white box with gray border"""
+    def find_info_popup(self, image, offset=(0, 0), parcel=None):
+        """Find and crop the info popup box (numpy array in, numpy array out).
+        
+        `offset` is the image's position on screen; the popup box is
+        remembered in screen coordinates for the next region capture.
+        Returns None when no popup is detected.
+        """
         try:
             logging.info("=== Starting popup detection ===")
             
             try:
-                import numpy as np
-                from scipy import ndimage
-                logging.info("NumPy and SciPy imported successfully")
+                from popup_locator import get_popup_locator
+                from template_matcher import get_template_matcher
             except ImportError as e:
                 logging.error(f"Required libraries not available: {e}")
-                logging.warning("Using full image as fallback")
-                return image
-            
-            # Convert to numpy array and grayscale
-            img_array = np.array(image.convert('L'))
-            logging.info(f"Image size: {image.width}x{image.height}")
-            
-            # Detect edges to find the popup border
-            from scipy import ndimage
-            edges = ndimage.sobel(img_array)
-            
-            # Threshold to get strong edges (popup border)
-            edge_threshold = np.percentile(edges, 95)
-            strong_edges = edges > edge_threshold
-            
-            # Find connected components (boxes)
-            labeled, num_features = ndimage.label(strong_edges)
-            
-            # Find the largest rectangular region (likely the popup)
-            best_box = None
-            best_area = 0
-            
-            for label_id in range(1, num_features + 1):
-                coords = np.argwhere(labeled == label_id)
-                if len(coords) < 100:  # Too small
-                    continue
-                    
-                y_coords, x_coords = coords[:, 0], coords[:, 1]
-                top, left = y_coords.min(), x_coords.min()
-                bottom, right = y_coords.max(), x_coords.max()
-                
-                width = right - left
-                height = bottom - top
-                area = width * height
-                
-                # Popup is roughly 260x200 pixels - look for boxes in this range
-                if 200 < width < 400 and 150 < height < 300:
-                    if area > best_area:
-                        best_area = area
-                        best_box = (left, top, right, bottom)
+                return None
+            
+            image = np.asarray(image)
+            height, width = image.shape[:2]
+            logging.info(f"Image size: {width}x{height}")
+            
+            # Primary: popup template match; fallback: strong-edge components filtered by popup size
+            best_box, match = get_template_matcher().locate_popup(image)
+            if best_box is not None:
+                logging.info(f"Template matched at ({match.x}, {match.y}) score {match.score:.3f} scale {match.scale}")
+                ox, oy = offset
+                get_popup_locator().remember((best_box[0] + ox, best_box[1] + oy, best_box[2] + ox, best_box[3] + oy))
+            else:
+                logging.info("No template match - trying edge detection")
+                best_box = get_popup_locator().locate(image, offset=offset)
             
             if best_box is None:
-                logging.warning("Could not detect popup box - using full image")
-                return image
+                logging.warning("Could not detect popup box")
+                return None
             
             left, top, right, bottom = best_box
             logging.info(f"✓ Popup detected at: ({left}, {top}, {right}, {bottom})")
@@ -1264,19 +1340,20 @@ class ParcelAutomationWindow:
             margin = 5
             left = max(0, left - margin)
             top = max(0, top - margin)
-            right = min(image.width, right + margin)
-            bottom = min(image.height, bottom + margin)
+            right = min(width, right + margin)
+            bottom = min(height, bottom + margin)
             
-            # Crop the popup area
-            popup_image = image.crop((left, top, right, bottom))
+            # Crop the popup area (a copy, so the queued write doesn't pin the full capture)
+            popup_image = image[top:bottom, left:right].copy()
             
-            # Save cropped popup with google_addresses ID in filename
-            parcel_id = self.parcel_data.get('id', 'unknown')
+            # Save cropped popup with google_addresses ID in filename (background write)
+            parcel_id = (parcel or self.parcel_data).get('id', 'unknown')
             popup_filename = f"parcels_{parcel_id}.png"
             popup_path = self.capture_dir / popup_filename
-            popup_image.save(popup_path)
-            logging.info(f"✓ Saved popup to: {popup_path}")
-            logging.info(f"  Popup size: {popup_image.width}x{popup_image.height}")
+            # Registered as pending only once the PNG is fully on disk
+            get_debug_sink().save(popup_image, popup_path, on_saved=get_parcel_manifest().capture)
+            logging.info(f"✓ Queued popup for: {popup_path}")
+            logging.info(f"  Popup size: {popup_image.shape[1]}x{popup_image.shape[0]}")
             logging.info("=== Popup detection complete ===")
             
             return popup_image
@@ -1287,12 +1364,34 @@ class ParcelAutomationWindow:
             logging.error(traceback.format_exc())
             return None
     
-    def extract_with_chatgpt(self, ocr_text):
+    def _chatgpt_result(self, ocr_text, extracted_fields, parcel):
+        """Build the ChatGPT response in the same format as the regex method"""
+        return {
+            'id': parcel.get('id'),
+            'address': parcel.get('address'),
+            'metro': parcel.get('metro_name'),
+            'parcel_link': parcel.get('parcel_link'),
+            'timestamp': datetime.now().isoformat(),
+            'raw_text': ocr_text,
+            'extracted_fields': extracted_fields
+        }
+    
+    def extract_with_chatgpt(self, ocr_text, parcel=None):
         """Extract structured data from OCR text using ChatGPT API"""
         import openai
         import json
         import os
         from pathlib import Path
+        from llm_cache import get_llm_cache, cache_key
+        parcel = parcel or self.parcel_data
+        
+        # Same OCR text -> same fields: reuse an earlier answer if there is one
+        cache = get_llm_cache()
+        key = cache_key(CHATGPT_MODEL, CHATGPT_PROMPT_VERSION, ocr_text)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            self.window.after(0, lambda: self.append_log("✓ ChatGPT result from cache (no API call)"))
+            return self._chatgpt_result(ocr_text, cached, parcel)
         
         # Try to read API key from file first, then environment variable
         api_key = None
@@ -1311,7 +1410,7 @@ class ParcelAutomationWindow:
         
         if not api_key:
             self.window.after(0, lambda: self.append_log("⚠ No API key found, using regex fallback"))
-            return self.extract_structured_data(ocr_text)
+            return self.extract_structured_data(ocr_text, parcel)
         
         try:
             openai.api_key = api_key
@@ -1342,7 +1441,7 @@ Return only the JSON object, no other text."""
             # Use new OpenAI client syntax (v1.0.0+)
             client = openai.OpenAI(api_key=api_key)
             response = client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+                model=CHATGPT_MODEL,
                 messages=[
                     {"role": "system", "content": "You are a data extraction expert. Extract structured data from OCR text and return only valid JSON."},
                     {"role": "user", "content": prompt}
@@ -1376,13 +1475,13 @@ Return only the JSON object, no other text."""
                         """
                         cursor.execute(log_sql, (
                             'chat.completions',
-                            'gpt-4-turbo-preview',
+                            CHATGPT_MODEL,
                             'OK',
                             response.usage.prompt_tokens,
                             response.usage.completion_tokens,
                             response.usage.total_tokens,
-                            self.parcel_data.get('address', 'N/A'),
-                            self.parcel_data.get('parcel_number'),
+                            parcel.get('address', 'N/A'),
+                            parcel.get('parcel_number'),
                             result_text[:500]
                         ))
                         conn.commit()
@@ -1400,17 +1499,10 @@ Return only the JSON object, no other text."""
                 result_text = result_text.strip()
             
             extracted_fields = json.loads(result_text)
+            if cache is not None and isinstance(extracted_fields, dict):
+                cache.put(key, extracted_fields, CHATGPT_MODEL, CHATGPT_PROMPT_VERSION)
             
-            # Build response in same format as regex method
-            data = {
-                'id': self.parcel_data.get('id'),
-                'address': self.parcel_data.get('address'),
-                'metro': self.parcel_data.get('metro_name'),
-                'parcel_link': self.parcel_data.get('parcel_link'),
-                'timestamp': datetime.now().isoformat(),
-                'raw_text': ocr_text,
-                'extracted_fields': extracted_fields
-            }
+            data = self._chatgpt_result(ocr_text, extracted_fields, parcel)
             
             self.window.after(0, lambda: self.append_log("✓ ChatGPT extraction complete"))
             logging.info(f"ChatGPT extracted {len(extracted_fields)} fields")
@@ -1442,10 +1534,10 @@ Return only the JSON object, no other text."""
                         """
                         cursor.execute(log_sql, (
                             'chat.completions',
-                            'gpt-4-turbo-preview',
+                            CHATGPT_MODEL,
                             'ERROR',
-                            self.parcel_data.get('address', 'N/A'),
-                            self.parcel_data.get('parcel_number'),
+                            parcel.get('address', 'N/A'),
+                            parcel.get('parcel_number'),
                             str(e)[:500]
                         ))
                         conn.commit()
@@ -1455,17 +1547,18 @@ Return only the JSON object, no other text."""
                 logging.warning(f"Failed to log OpenAI error: {log_err}")
             
             # Fallback to regex extraction
-            return self.extract_structured_data(ocr_text)
+            return self.extract_structured_data(ocr_text, parcel)
     
-    def extract_structured_data(self, ocr_text):
+    def extract_structured_data(self, ocr_text, parcel=None):
         """Extract structured data from OCR text"""
         import re
+        parcel = parcel or self.parcel_data
         
         data = {
-            'id': self.parcel_data.get('id'),
-            'address': self.parcel_data.get('address'),
-            'metro': self.parcel_data.get('metro_name'),
-            'parcel_link': self.parcel_data.get('parcel_link'),
+            'id': parcel.get('id'),
+            'address': parcel.get('address'),
+            'metro': parcel.get('metro_name'),
+            'parcel_link': parcel.get('parcel_link'),
             'timestamp': datetime.now().isoformat(),
             'raw_text': ocr_text,
             'extracted_fields': {}
@@ -1488,74 +1581,20 @@ Return only the JSON object, no other text."""
             logging.warning("OCR text is too short or empty!")
             return data
         
-        # Extract specific fields from King County Parcel Viewer
-        # Try multiple pattern variations for each field
-        # OCR often has typos/errors, so patterns are flexible
-        patterns = {
-            'parcel_number': [
-                r'(\d{10})',  # 10-digit number (try first - most reliable)
-                r'Parcel[:\s#]*(\d+)',
-                r'(5247801975)',  # Exact match as fallback
-            ],
-            'property_name': [
-                r'[Pp]ropary\s*name[:\s]*([^\n]+)',  # OCR: Propary name: VALUE
-                r'[Pp]roperty\s*name[:\s]*([^\n]+)',
-            ],
-            'jurisdiction': [
-                r'[Jj]uracicion[:\s]*([^\n]+)',  # OCR: Juracicion: VALUE
-                r'[Jj]urisdic[t]?ion[:\s]*([^\n]+)',
-                r'(SEATTLE|BELLEVUE|RENTON|KENT)',  # Uppercase city names
-            ],
-            'taxpayer_name': [
-                r'[Tt]axpayer\s*name[:\s]*([^\n]+)',  # Taxpayer name: VALUE
-            ],
-            'address': [
-                r'[Aa]gora[:\s]*([^\n]+)',  # OCR: Agora: VALUE
-                r'[Aa]ddress[:\s]*([^\n]+)',
-                r'[Aa]derass[:\s]*([^\n]+)',
-            ],
-            'appraised_value': [
-                r'[Aa]ppraised\s*value[:\s]*(\$?[\d,]+)',
-            ],
-            'lot_area': [
-                r'[Ll]ot\s*aren[:\s]*([\d,\.]+)',  # OCR: Lot aren
-                r'[Ll]ot\s*area[:\s]*([\d,\.]+)',
-            ],
-            'levy_code': [
-                r'[Ll]evy\s*code[:\s]*([A-Za-z0-9]+)',  # "Levy code: colt" or "Levy code: 1234"
-                r'(\d{4})\s*\n+\s*[Ll][ae]vy\s*c[ao][dt]e:',  # Number BEFORE label with typos
-                r'[Ll][ae]vy\s*c[ao][dt]e[:\s]+(\d+)',  # After label with typos
-            ],
-            'num_units': [
-                r'#\s*[oO0][ft]\s*[uU]nits?[:\s]*(\d+)',  # "# of units: 654" or "#otunm&: 654"
-                r'#[oO0a-z]*[:\s]*(\d+)',  # Any garbled version of # followed by digits
-                r'(\d+)\s*\n+\s*#',  # Number BEFORE # symbol
-            ],
-            'num_buildings': [
-                r'#\s*[oO0][ft]\s*[bB][a-z]+[:\s]*(\d+)',  # "# of buildings" with OCR errors
-                r'[Ss][oO0][a-z]*ings?[:\s]*(\d+)',  # "Sotbuikings: 1"
-            ],
-        }
-        
-        # Try each pattern until we find a match
-        for field, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                match = re.search(pattern, ocr_text, re.IGNORECASE)
-                if match:
-                    value = match.group(1).strip()
-                    data['extracted_fields'][field] = value
-                    logging.info(f"✓ Extracted {field}: {value}")
-                    break  # Found a match, move to next field
-            
-            if field not in data['extracted_fields']:
-                logging.warning(f"✗ Could not extract {field}")
-                # Set default values for required fields
-                if field == 'property_name':
-                    data['extracted_fields'][field] = 'UNKNOWN'
-                elif field == 'jurisdiction':
-                    data['extracted_fields'][field] = 'SEATTLE'
-                elif field == 'address':
-                    data['extracted_fields'][field] = data.get('address', 'UNKNOWN')
+        # Extract specific fields from King County Parcel Viewer (see parcel_ocr.PARCEL_FIELD_PATTERNS)
+        data['extracted_fields'] = match_parcel_fields(ocr_text)
+        for field in PARCEL_FIELD_PATTERNS:
+            if field in data['extracted_fields']:
+                logging.info(f"✓ Extracted {field}: {data['extracted_fields'][field]}")
+                continue
+            logging.warning(f"✗ Could not extract {field}")
+            # Set default values for required fields
+            if field == 'property_name':
+                data['extracted_fields'][field] = 'UNKNOWN'
+            elif field == 'jurisdiction':
+                data['extracted_fields'][field] = 'SEATTLE'
+            elif field == 'address':
+                data['extracted_fields'][field] = data.get('address', 'UNKNOWN')
         
         logging.info(f"Total fields extracted: {len(data['extracted_fields'])}/10")
         
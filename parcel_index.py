@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline King County parcel index
+Imports a bulk parcel/address export (CSV, or the .dbf attribute table of a
+shapefile) into a local SQLite store indexed by parcel_number and by a
+normalized street address. Addresses that resolve to exactly one parcel
+are answered locally in microseconds; only misses and ambiguous addresses
+(condos, several parcels per address) go through the parcel viewer.
+
+Several files can be imported on top of each other (e.g. the parcel
+address export, then the assessor's apartment complex extract for unit
+counts): rows are merged by parcel_number and only empty columns are
+filled.
+
+    python parcel_index.py import <file.csv|file.dbf|file.shp> [...]
+    python parcel_index.py lookup "4225 11th Ave NE, Seattle, WA 98105, USA"
+    python parcel_index.py stats
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from address_normalize import address_city, address_key, extract_zip
+
+PARCEL_INDEX_PATH = Path(os.getenv("PARCEL_INDEX_PATH",
+                                   str(Path(__file__).resolve().parent / "Captures" / "parcel_index.sqlite")))
+# Set PARCEL_INDEX_DISABLED=1 to always use the parcel viewer
+PARCEL_INDEX_DISABLED = os.getenv("PARCEL_INDEX_DISABLED", "0") == "1"
+IMPORT_CHUNK_SIZE = 5000
+
+# Same field names as the vision/ChatGPT extraction
+FIELDS = ("parcel_number", "present_use", "property_name", "jurisdiction", "taxpayer_name", "address",
+          "appraised_value", "lot_area", "levy_code", "num_units", "num_buildings")
+
+# Source column names per field (upper case, without spaces/underscores), first match wins.
+# Covers the King County GIS parcel address export and the assessor's EXTR_* extracts.
+COLUMN_ALIASES = {
+    "parcel_number": ("PIN", "PARCELNUMBER", "PARCELNBR", "PARCELID", "PARCEL"),
+    "address": ("ADDRFULL", "ADDRESS", "SITUSADDRESS", "SITEADDRESS", "FULLADDRESS", "ADDRESSLINE"),
+    "city": ("CTYNAME", "POSTALCTYNAME", "CITY", "CITYNAME"),
+    "zip": ("ZIP5", "ZIPCODE", "ZIP"),
+    "jurisdiction": ("LEVYJURIS", "JURISDICTION", "DISTRICTNAME", "CTYNAME"),
+    "present_use": ("PREUSEDESC", "PRESENTUSEDESC", "PRESENTUSE"),
+    "property_name": ("PROPNAME", "PROPERTYNAME", "COMPLEXDESCR"),
+    "taxpayer_name": ("KCTPNAME", "TAXPAYERNAME", "TAXPAYER"),
+    "appraised_value": ("APPRAISEDVALUE", "APPRTOTAL", "TOTALVALUE"),
+    "land_value": ("APPRLNDVAL", "APPRLANDVAL", "LANDVAL"),
+    "improvement_value": ("APPRIMPR", "APPRIMPSVAL", "IMPSVAL"),
+    "lot_area": ("LOTSQFT", "SQFTLOT", "LOTAREA"),
+    "levy_code": ("LEVYCODE", "LEVY"),
+    "num_units": ("NBRUNITS", "NUMUNITS", "UNITS"),
+    "num_buildings": ("NBRBLDGS", "NUMBUILDINGS", "BUILDINGS"),
+    "major": ("MAJOR",),
+    "minor": ("MINOR",),
+}
+
+def _number(value) -> Optional[str]:
+    """'1,234.0' -> '1234' (the form the extraction prompts ask for); None when not a number"""
+    if value in (None, ""):
+        return None
+    try:
+        return str(int(float(str(value).replace(",", "").replace("$", ""))))
+    except ValueError:
+        return None
+
+
+def _read_csv(path: Path) -> Iterator[Dict[str, str]]:
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_dbf(path: Path) -> Iterator[Dict[str, str]]:
+    """Rows of a dBase III table (shapefile attributes)"""
+    with open(path, "rb") as f:
+        n_records, header_len, record_len = struct.unpack("<4xIHH20x", f.read(32))
+        fields = []
+        while True:
+            desc = f.read(32)
+            if not desc or desc[0] == 0x0D:
+                break
+            fields.append((desc[:11].split(b"\0")[0].decode("ascii", "replace"), desc[16]))
+        f.seek(header_len)
+        for _ in range(n_records):
+            rec = f.read(record_len)
+            if len(rec) < record_len:
+                break
+            if rec[:1] == b"*":  # deleted
+                continue
+            row, pos = {}, 1
+            for name, length in fields:
+                row[name] = rec[pos:pos + length].decode("latin-1").strip()
+                pos += length
+            yield row
+
+
+def read_rows(path) -> Iterator[Dict[str, str]]:
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".shp":
+        path, suffix = path.with_suffix(".dbf"), ".dbf"
+    if suffix == ".dbf":
+        return _read_dbf(path)
+    return _read_csv(path)
+
+
+def _column_map(columns: Iterable[str]) -> Dict[str, str]:
+    """field -> source column, by COLUMN_ALIASES"""
+    by_key = {re.sub(r"[^A-Z0-9]", "", c.upper()): c for c in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_key:
+                mapping[field] = by_key[alias]
+                break
+    return mapping
+
+
+def _record(row: Dict[str, str], cols: Dict[str, str]) -> Optional[Dict]:
+    def get(field):
+        value = row.get(cols[field]) if field in cols else None
+        value = value.strip() if isinstance(value, str) else value
+        return value if value not in ("", None) else None
+
+    parcel_number = get("parcel_number")
+    if parcel_number is None and get("major") is not None:
+        parcel_number = str(get("major")).zfill(6) + str(get("minor") or "0").zfill(4)
+    if parcel_number is None:
+        return None
+    parcel_number = re.sub(r"\D", "", str(parcel_number)).zfill(10)
+    appraised = _number(get("appraised_value"))
+    if appraised is None and (get("land_value") or get("improvement_value")):
+        appraised = str(int(_number(get("land_value")) or 0) + int(_number(get("improvement_value")) or 0))
+    address = get("address")
+    return {
+        "parcel_number": parcel_number,
+        "address": address,
+        "address_key": address_key(address) or None,
+        "city": (get("city") or "").upper() or None,
+        "zip": get("zip") or extract_zip(address),
+        "jurisdiction": get("jurisdiction"),
+        "present_use": get("present_use"),
+        "property_name": get("property_name"),
+        "taxpayer_name": get("taxpayer_name"),
+        "appraised_value": appraised,
+        "lot_area": _number(get("lot_area")),
+        "levy_code": get("levy_code"),
+        "num_units": _number(get("num_units")),
+        "num_buildings": _number(get("num_buildings")),
+    }
+
+
+_COLUMNS = ("parcel_number", "address", "address_key", "city", "zip", "jurisdiction", "present_use",
+            "property_name", "taxpayer_name", "appraised_value", "lot_area", "levy_code", "num_units",
+            "num_buildings")
+
+
+class ParcelIndex:
+    def __init__(self, path: Path = PARCEL_INDEX_PATH):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self.ambiguous = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parcels (parcel_number TEXT PRIMARY KEY, "
+            + ", ".join(f"{c} TEXT" for c in _COLUMNS[1:]) + ", updated REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parcels_address_key ON parcels (address_key, city)")
+        self._conn.commit()
+        self._count = None
+
+    def import_file(self, path, progress=None) -> int:
+        """Merge a CSV/DBF export into the index; returns rows read"""
+        rows = read_rows(path)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        cols = _column_map(first.keys())
+        if "parcel_number" not in cols and "major" not in cols:
+            raise ValueError(f"{Path(path).name}: no parcel number column (looked for {COLUMN_ALIASES['parcel_number']} or MAJOR/MINOR)")
+        updates = ", ".join(f"{c} = COALESCE({c}, excluded.{c})" for c in _COLUMNS[1:])
+        sql = (f"INSERT INTO parcels ({', '.join(_COLUMNS)}, updated) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+               f" ON CONFLICT(parcel_number) DO UPDATE SET {updates}, updated = excluded.updated")
+        total, chunk, now = 0, [], time.time()
+
+        def flush():
+            with self._lock:
+                self._conn.executemany(sql, chunk)
+                self._conn.commit()
+            chunk.clear()
+            if progress:
+                progress(total)
+
+        for row in _chain(first, rows):
+            rec = _record(row, cols)
+            if rec is None:
+                continue
+            chunk.append(tuple(rec[c] for c in _COLUMNS) + (now,))
+            total += 1
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+        self._count = None
+        return total
+
+    def count(self) -> int:
+        if self._count is None:
+            with self._lock:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM parcels").fetchone()[0]
+        return self._count
+
+    def get(self, parcel_number: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM parcels WHERE parcel_number = ?",
+                                     (re.sub(r"\D", "", str(parcel_number)).zfill(10),)).fetchone()
+        return self._as_record(row) if row else None
+
+    def lookup(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """The one parcel at this address, or None when unknown or ambiguous.
+
+        `city` (or the city in a Google formatted address) narrows addresses
+        that exist in several cities.
+        """
+        key = address_key(address)
+        if not key:
+            self.misses += 1
+            return None
+        city = (city or address_city(address) or "").upper() or None
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM parcels WHERE address_key = ?",
+                                      (key,)).fetchall()
+        if len(rows) > 1 and city:
+            in_city = [r for r in rows if r[_COLUMNS.index("city")] == city]
+            rows = in_city or rows
+        if len(rows) != 1:
+            if rows:
+                self.ambiguous += 1
+            else:
+                self.misses += 1
+            return None
+        self.hits += 1
+        return self._as_record(rows[0])
+
+    def _as_record(self, row) -> Dict:
+        data = dict(zip(_COLUMNS, row))
+        record = {f: data.get(f) for f in FIELDS}
+        record["source"] = "parcel_index"
+        return record
+
+    def stats(self) -> Dict:
+        return {"parcels": self.count(), "hits": self.hits, "misses": self.misses, "ambiguous": self.ambiguous}
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_parcel_index() -> Optional[ParcelIndex]:
+    """Process-wide index, or None when disabled, not imported yet or unreadable"""
+    global _index
+    if PARCEL_INDEX_DISABLED or not PARCEL_INDEX_PATH.exists():
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = ParcelIndex()
+            except Exception as e:
+                print(f"⚠ Parcel index unavailable ({PARCEL_INDEX_PATH}): {e}")
+                return None
+        return _index if _index.count() else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "lookup", "stats"):
+        print(__doc__)
+        sys.exit(1)
+    index = ParcelIndex()
+    if sys.argv[1] == "import":
+        for name in sys.argv[2:]:
+            t0 = time.time()
+            n = index.import_file(name, progress=lambda c: print(f"\r  {c:,} rows", end="", flush=True))
+            print(f"\r✅ {name}: {n:,} rows in {time.time() - t0:.1f}s")
+        print(f"📦 {index.count():,} parcels in {index.path}")
+    elif sys.argv[1] == "lookup":
+        for address in sys.argv[2:]:
+            t0 = time.perf_counter()
+            record = index.lookup(address)
+            elapsed = (time.perf_counter() - t0) * 1e6
+            print(f"{address!r} -> key {address_key(address)!r} ({elapsed:.0f} µs)")
+            print(f"   {record}" if record else "   not found or ambiguous")
+    else:
+        print(index.stats())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifest of captured parcel images
+One SQLite row per popup image (keyed by its base name, parcels_<id>.png)
+with its status, the extracted record, parcel_number and DB link. Pending
+images, unlinked parcels and per-status counts are indexed queries instead
+of folder globs, and processed state no longer lives in file names.
+
+Status: pending -> extracted -> linked, or failed / skipped.
+Images are registered where they are saved. sync() picks up anything
+written elsewhere, but only rescans a folder when its mtime changed.
+openai_batch_*.json files are imported once each.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+PARCEL_MANIFEST_PATH = Path(os.getenv("PARCEL_MANIFEST_PATH",
+                                      str(Path(__file__).resolve().parent / "Captures" / "parcel_manifest.sqlite")))
+
+PENDING, EXTRACTED, LINKED, FAILED, SKIPPED = "pending", "extracted", "linked", "failed", "skipped"
+
+_NAME_RE = re.compile(r"^parcels_(\d+)(?:_(processed|skipped))?\.png$")
+
+
+def image_key(path) -> str:
+    """parcels_653_processed.png -> parcels_653.png"""
+    name = Path(path).name
+    m = _NAME_RE.match(name)
+    return f"parcels_{m.group(1)}.png" if m else name
+
+
+def google_addresses_id(path) -> Optional[int]:
+    m = _NAME_RE.match(Path(path).name)
+    return int(m.group(1)) if m else None
+
+
+class ParcelManifest:
+    def __init__(self, path: Path = PARCEL_MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parcel_images ("
+            " image TEXT PRIMARY KEY, path TEXT, google_addresses_id INTEGER, status TEXT,"
+            " parcel_number TEXT, result TEXT, parcel_db_id INTEGER, attempts INTEGER DEFAULT 0,"
+            " error TEXT, batch_file TEXT, created REAL, updated REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parcel_images_status ON parcel_images (status, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parcel_images_parcel ON parcel_images (parcel_number)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parcel_images_ga ON parcel_images (google_addresses_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS manifest_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def register(self, paths: Iterable, status: str = PENDING) -> int:
+        """Add images that are not known yet; returns how many were new"""
+        now = time.time()
+        rows = [(image_key(p), str(p), google_addresses_id(p), status, now, now) for p in paths]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO parcel_images (image, path, google_addresses_id, status, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def capture(self, path):
+        """Register a freshly saved image; a re-capture goes back to pending"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO parcel_images (image, path, google_addresses_id, status, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(image) DO UPDATE SET"
+                " path = excluded.path, status = excluded.status, updated = excluded.updated",
+                (image_key(path), str(path), google_addresses_id(path), PENDING, now, now))
+            self._conn.commit()
+
+    def sync(self, parcels_dir, force: bool = False) -> int:
+        """Register parcels_*.png written without register(); no-op while the folder is unchanged"""
+        folder = Path(parcels_dir)
+        try:
+            mtime = folder.stat().st_mtime
+        except OSError:
+            return 0
+        meta_key = f"dir_mtime:{folder.resolve()}"
+        if not force and self._meta(meta_key) == repr(mtime):
+            return 0
+        found = {PENDING: [], EXTRACTED: [], SKIPPED: []}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                m = _NAME_RE.match(entry.name)
+                if m and entry.is_file():
+                    # Older runs marked processed/skipped images by renaming them
+                    status = {"processed": EXTRACTED, "skipped": SKIPPED}.get(m.group(2), PENDING)
+                    found[status].append(entry.path)
+        added = sum(self.register(paths, status) for status, paths in found.items())
+        self._set_meta(meta_key, repr(mtime))
+        return added
+
+    def pending(self, limit: Optional[int] = None) -> List[Path]:
+        """Pending images that exist on disk, oldest first"""
+        sql = "SELECT path FROM parcel_images WHERE status = ? ORDER BY created"
+        with self._lock:
+            rows = self._conn.execute(sql, (PENDING,)).fetchall()
+        paths = [Path(r[0]) for r in rows if Path(r[0]).exists()]
+        return paths[:limit] if limit is not None else paths
+
+    def oldest_pending_age(self) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(created) FROM parcel_images WHERE status = ?", (PENDING,)).fetchone()
+        return time.time() - row[0] if row and row[0] else 0.0
+
+    def mark_extracted(self, path, record: Dict, batch_file=None):
+        """Store the extraction result; extracting the same image again just overwrites it"""
+        ga_id = record.get("google_addresses_id") or google_addresses_id(path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO parcel_images (image, path, google_addresses_id, status, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (image_key(path), str(path), ga_id, EXTRACTED, now, now))
+            self._conn.execute(
+                "UPDATE parcel_images SET status = CASE WHEN status = ? THEN status ELSE ? END,"
+                " google_addresses_id = COALESCE(?, google_addresses_id), parcel_number = ?, result = ?,"
+                " batch_file = COALESCE(?, batch_file), error = NULL, updated = ?"
+                " WHERE image = ?",
+                (LINKED, EXTRACTED, ga_id, record.get("parcel_number"), json.dumps(record, ensure_ascii=False),
+                 str(batch_file) if batch_file else None, now, image_key(path)))
+            self._conn.commit()
+
+    def mark_linked(self, path, parcel_db_id: Optional[int] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE parcel_images SET status = ?, parcel_db_id = COALESCE(?, parcel_db_id), updated = ?"
+                " WHERE image = ?", (LINKED, parcel_db_id, time.time(), image_key(path)))
+            self._conn.commit()
+
+    def mark_failed(self, path, error: str = ""):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE parcel_images SET status = ?, attempts = attempts + 1, error = ?, updated = ?"
+                " WHERE image = ?", (FAILED, error, time.time(), image_key(path)))
+            self._conn.commit()
+
+    def reset(self, paths: Iterable):
+        """Queue images for extraction again"""
+        with self._lock:
+            self._conn.executemany("UPDATE parcel_images SET status = ?, updated = ? WHERE image = ?",
+                                   [(PENDING, time.time(), image_key(p)) for p in paths])
+            self._conn.commit()
+
+    def unlinked(self) -> List[Dict]:
+        """Extracted parcels with a google_addresses id that are not linked yet"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT image, google_addresses_id, parcel_number FROM parcel_images"
+                " WHERE status = ? AND parcel_number IS NOT NULL AND google_addresses_id IS NOT NULL",
+                (EXTRACTED,)).fetchall()
+        return [{"image": r[0], "google_addresses_id": r[1], "parcel_number": r[2]} for r in rows]
+
+    def extracted_ids(self) -> List[int]:
+        """google_addresses ids of extracted images that are not linked yet (with or without a parcel_number)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT google_addresses_id FROM parcel_images WHERE status = ? AND google_addresses_id IS NOT NULL"
+                " ORDER BY created", (EXTRACTED,)).fetchall()
+        return [r[0] for r in rows]
+
+    def import_batch_json(self, parcels_dir) -> int:
+        """Load openai_batch_*.json files not imported before; returns records added"""
+        added = 0
+        for json_file in sorted(Path(parcels_dir).glob("openai_batch_*.json")):
+            meta_key = f"imported:{json_file.name}"
+            if self._meta(meta_key):
+                continue
+            try:
+                records = json.loads(json_file.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            for record in records if isinstance(records, list) else []:
+                ga_id = record.get("google_addresses_id") if isinstance(record, dict) else None
+                if ga_id and record.get("parcel_number"):
+                    self.mark_extracted(Path(parcels_dir) / f"parcels_{int(ga_id)}.png", record, json_file)
+                    added += 1
+            self._set_meta(meta_key, repr(time.time()))
+        return added
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM parcel_images GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM manifest_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO manifest_meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_parcel_manifest() -> ParcelManifest:
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = ParcelManifest()
+        return _manifest
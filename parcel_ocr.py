@@ -0,0 +1,198 @@
+"""
+OCR service for King County parcel popups
+Runs the candidate Tesseract configs in parallel and returns as soon as one
+of them yields every parcel field, instead of running all of them serially
+and keeping the longest text. Uses a persistent in-process tesserocr API per
+worker thread when tesserocr is installed, otherwise pytesseract (one
+tesseract process per call, so the worker threads run them in parallel).
+Accepts PIL images or numpy arrays.
+"""
+
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+# Several tesseract runs at once: keep each one single-threaded
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+import pytesseract
+
+# Candidate configs, most likely to succeed first
+OCR_CONFIGS = [
+    r'--oem 3 --psm 3',  # Fully automatic page segmentation
+    r'--oem 3 --psm 11', # Sparse text
+    r'--oem 3 --psm 6',  # Uniform block of text
+]
+OCR_WORKERS = int(os.getenv("PARCEL_OCR_WORKERS", str(len(OCR_CONFIGS))))
+
+# Popup is small (220x140), upscale for better OCR
+UPSCALE_FACTOR = 6
+BINARY_THRESHOLD = 140
+
+# Field patterns for King County Parcel Viewer popups, tried in order.
+# OCR often has typos/errors, so patterns are flexible
+PARCEL_FIELD_PATTERNS = {
+    'parcel_number': [
+        r'(\d{10})',  # 10-digit number (try first - most reliable)
+        r'Parcel[:\s#]*(\d+)',
+        r'(5247801975)',  # Exact match as fallback
+    ],
+    'property_name': [
+        r'[Pp]ropary\s*name[:\s]*([^\n]+)',  # OCR: Propary name: VALUE
+        r'[Pp]roperty\s*name[:\s]*([^\n]+)',
+    ],
+    'jurisdiction': [
+        r'[Jj]uracicion[:\s]*([^\n]+)',  # OCR: Juracicion: VALUE
+        r'[Jj]urisdic[t]?ion[:\s]*([^\n]+)',
+        r'(SEATTLE|BELLEVUE|RENTON|KENT)',  # Uppercase city names
+    ],
+    'taxpayer_name': [
+        r'[Tt]axpayer\s*name[:\s]*([^\n]+)',  # Taxpayer name: VALUE
+    ],
+    'address': [
+        r'[Aa]gora[:\s]*([^\n]+)',  # OCR: Agora: VALUE
+        r'[Aa]ddress[:\s]*([^\n]+)',
+        r'[Aa]derass[:\s]*([^\n]+)',
+    ],
+    'appraised_value': [
+        r'[Aa]ppraised\s*value[:\s]*(\$?[\d,]+)',
+    ],
+    'lot_area': [
+        r'[Ll]ot\s*aren[:\s]*([\d,\.]+)',  # OCR: Lot aren
+        r'[Ll]ot\s*area[:\s]*([\d,\.]+)',
+    ],
+    'levy_code': [
+        r'[Ll]evy\s*code[:\s]*([A-Za-z0-9]+)',  # "Levy code: colt" or "Levy code: 1234"
+        r'(\d{4})\s*\n+\s*[Ll][ae]vy\s*c[ao][dt]e:',  # Number BEFORE label with typos
+        r'[Ll][ae]vy\s*c[ao][dt]e[:\s]+(\d+)',  # After label with typos
+    ],
+    'num_units': [
+        r'#\s*[oO0][ft]\s*[uU]nits?[:\s]*(\d+)',  # "# of units: 654" or "#otunm&: 654"
+        r'#[oO0a-z]*[:\s]*(\d+)',  # Any garbled version of # followed by digits
+        r'(\d+)\s*\n+\s*#',  # Number BEFORE # symbol
+    ],
+    'num_buildings': [
+        r'#\s*[oO0][ft]\s*[bB][a-z]+[:\s]*(\d+)',  # "# of buildings" with OCR errors
+        r'[Ss][oO0][a-z]*ings?[:\s]*(\d+)',  # "Sotbuikings: 1"
+    ],
+}
+_COMPILED_PATTERNS = {f: [re.compile(p, re.IGNORECASE) for p in pats] for f, pats in PARCEL_FIELD_PATTERNS.items()}
+
+
+def match_parcel_fields(ocr_text: str) -> Dict[str, str]:
+    """First matching pattern per field; fields without a match are left out"""
+    fields = {}
+    for field, patterns in _COMPILED_PATTERNS.items():
+        for pattern in patterns:
+            match = pattern.search(ocr_text)
+            if match:
+                fields[field] = match.group(1).strip()
+                break
+    return fields
+
+
+def parcel_fields_complete(ocr_text: str) -> bool:
+    """True when every parcel field can be read from the text"""
+    return len(ocr_text.strip()) >= 20 and len(match_parcel_fields(ocr_text)) == len(PARCEL_FIELD_PATTERNS)
+
+
+def as_pil(image) -> Image.Image:
+    """PIL image from a PIL image or a numpy array (RGB, RGBA or grayscale)"""
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return image
+
+
+def preprocess_for_ocr(image) -> Image.Image:
+    """Upscale, grayscale, denoise, boost contrast/sharpness and binarize"""
+    image = as_pil(image)
+    width, height = image.size
+    image = image.resize((width * UPSCALE_FACTOR, height * UPSCALE_FACTOR), Image.LANCZOS)
+    image = image.convert('L')
+    image = image.filter(ImageFilter.MedianFilter(size=3))
+    image = ImageEnhance.Contrast(image).enhance(3.0)
+    image = ImageEnhance.Sharpness(image).enhance(2.0)
+    image = ImageOps.autocontrast(image, cutoff=2)
+    return image.point(lambda x: 0 if x < BINARY_THRESHOLD else 255, '1')
+
+
+class OCRService:
+    """Parallel multi-config OCR with early exit"""
+
+    def __init__(self, configs=OCR_CONFIGS, workers: int = OCR_WORKERS):
+        self.configs = list(configs)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="parcel-ocr")
+        self._local = threading.local()
+        self.backend = "tesserocr" if tesserocr is not None else "pytesseract"
+
+    def _tesserocr_api(self, psm: int):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(psm)
+        if api is None:
+            kwargs = {"psm": psm, "oem": tesserocr.OEM.DEFAULT}
+            tessdata = os.getenv("TESSDATA_PREFIX")
+            if tessdata:
+                kwargs["path"] = tessdata
+            api = apis[psm] = tesserocr.PyTessBaseAPI(**kwargs)
+        return api
+
+    def _ocr_one(self, image: Image.Image, config: str) -> str:
+        if tesserocr is not None:
+            psm = int(re.search(r'--psm\s+(\d+)', config).group(1))
+            api = self._tesserocr_api(psm)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        return pytesseract.image_to_string(image, config=config)
+
+    def run(self, image, is_complete: Optional[Callable[[str], bool]] = parcel_fields_complete,
+            preprocessed: bool = True) -> Tuple[str, Optional[str]]:
+        """OCR with every config at once; returns (text, config).
+
+        The first text that satisfies is_complete wins immediately;
+        otherwise the longest text is returned.
+        """
+        image = as_pil(image) if preprocessed else preprocess_for_ocr(image)
+        futures = {self._pool.submit(self._ocr_one, image, cfg): cfg for cfg in self.configs}
+        best_text, best_config = "", None
+        try:
+            for fut in as_completed(futures):
+                cfg = futures[fut]
+                try:
+                    text = fut.result() or ""
+                except Exception as e:
+                    logging.warning(f"Config '{cfg}' failed: {e}")
+                    continue
+                logging.info(f"Config '{cfg}' extracted {len(text)} chars")
+                if is_complete is not None and is_complete(text):
+                    logging.info(f"Config '{cfg}' has every parcel field, skipping the rest")
+                    return text, cfg
+                if len(text) > len(best_text):
+                    best_text, best_config = text, cfg
+        finally:
+            for fut in futures:
+                fut.cancel()
+        return best_text, best_config
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service() -> OCRService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OCRService()
+        return _service
@@ -0,0 +1,201 @@
+"""
+Staged producer/consumer pipeline for parcel automation
+The browser thread only captures popups and submits them. Each stage
+(OCR, extraction, ...) has its own worker pool, and finished items are
+handed to a single sink thread in batches (DB/JSON writes). Queues between
+stages are bounded, so when a stage falls behind submit() waits instead of
+piling screenshots up in memory. Per-stage counters feed the progress UI.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PARCEL_PIPELINE_QUEUE_SIZE", "8"))
+PIPELINE_OCR_WORKERS = int(os.getenv("PARCEL_PIPELINE_OCR_WORKERS", "2"))
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PARCEL_PIPELINE_EXTRACT_WORKERS", "4"))
+# Sink gets a batch when this many items are ready or the oldest waited this long
+PIPELINE_BATCH_SIZE = int(os.getenv("PARCEL_PIPELINE_BATCH_SIZE", "10"))
+PIPELINE_BATCH_WAIT_SEC = float(os.getenv("PARCEL_PIPELINE_BATCH_WAIT_SEC", "5"))
+
+_STOP = object()
+
+# (name, fn, workers): fn(item) returns the item for the next stage, or None to drop it
+Stage = Tuple[str, Callable[[Any], Any], int]
+
+
+class _StageStats:
+    def __init__(self):
+        self.busy = 0
+        self.done = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+
+class StagePipeline:
+    def __init__(self, stages: Sequence[Stage], sink: Callable[[List[Any]], None],
+                 queue_size: int = PIPELINE_QUEUE_SIZE, batch_size: int = PIPELINE_BATCH_SIZE,
+                 batch_wait: float = PIPELINE_BATCH_WAIT_SEC,
+                 on_progress: Optional[Callable[["StagePipeline"], None]] = None):
+        self.stages = list(stages)
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.on_progress = on_progress
+        self.submitted = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(self.stages) + 1)]
+        self._stats = {name: _StageStats() for name, _, _ in self.stages}
+        self._stats["save"] = _StageStats()
+        self._alive = [max(1, workers) for _, _, workers in self.stages]
+        self._threads = []
+        for i, (name, fn, workers) in enumerate(self.stages):
+            for n in range(max(1, workers)):
+                t = threading.Thread(target=self._work, args=(i,), name=f"pipeline-{name}-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        t = threading.Thread(target=self._drain, name="pipeline-save", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def submit(self, item, cancel: Optional[Callable[[], bool]] = None) -> bool:
+        """Queue an item for the first stage, waiting while it is full.
+
+        Returns False if cancel() became true while waiting.
+        """
+        if self._closed:
+            raise RuntimeError("pipeline is closed")
+        while True:
+            try:
+                self._queues[0].put(item, timeout=0.5)
+                break
+            except queue.Full:
+                if cancel is not None and cancel():
+                    return False
+        with self._lock:
+            self.submitted += 1
+        self._notify()
+        return True
+
+    def close(self):
+        """No more submits; workers exit once everything queued is processed"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in range(self._alive[0] if self.stages else 1):
+            self._queues[0].put(_STOP)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every stage and the sink to finish; True when done"""
+        deadline = None if timeout is None else time.time() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.time()))
+        return not any(t.is_alive() for t in self._threads)
+
+    def _work(self, index: int):
+        name, fn, _ = self.stages[index]
+        stats = self._stats[name]
+        inbox, outbox = self._queues[index], self._queues[index + 1]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                break
+            with self._lock:
+                stats.busy += 1
+            started = time.time()
+            result, ok = None, True
+            try:
+                result = fn(item)
+            except Exception as e:
+                ok = False
+                logging.error(f"Pipeline stage '{name}' failed: {e}", exc_info=True)
+            with self._lock:
+                stats.busy -= 1
+                stats.seconds += time.time() - started
+                if ok:
+                    stats.done += 1
+                else:
+                    stats.failed += 1
+            if result is not None:
+                outbox.put(result)
+            self._notify()
+        # Last worker of this stage out tells the next stage (or the sink) to stop
+        with self._lock:
+            self._alive[index] -= 1
+            last = self._alive[index] == 0
+        if last:
+            nxt = self._alive[index + 1] if index + 1 < len(self.stages) else 1
+            for _ in range(nxt):
+                outbox.put(_STOP)
+
+    def _drain(self):
+        inbox = self._queues[-1]
+        stats = self._stats["save"]
+        batch, first_at, stopping = [], None, False
+        while not stopping:
+            wait = 0.5 if first_at is None else max(0.0, first_at + self.batch_wait - time.time())
+            try:
+                item = inbox.get(timeout=wait)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    first_at = first_at or time.time()
+            except queue.Empty:
+                pass
+            due = first_at is not None and time.time() - first_at >= self.batch_wait
+            if batch and (stopping or due or len(batch) >= self.batch_size):
+                started = time.time()
+                with self._lock:
+                    stats.busy += len(batch)
+                try:
+                    self.sink(batch)
+                    ok = True
+                except Exception as e:
+                    ok = False
+                    logging.error(f"Pipeline save of {len(batch)} items failed: {e}", exc_info=True)
+                with self._lock:
+                    stats.busy -= len(batch)
+                    stats.seconds += time.time() - started
+                    if ok:
+                        stats.done += len(batch)
+                    else:
+                        stats.failed += len(batch)
+                batch, first_at = [], None
+                self._notify()
+
+    def _notify(self):
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self)
+            except Exception:
+                pass
+
+    def progress(self) -> Dict[str, Dict[str, Any]]:
+        """{stage: {queued, busy, done, failed, avg_sec}} in pipeline order, sink last"""
+        out = {}
+        with self._lock:
+            names = [name for name, _, _ in self.stages] + ["save"]
+            for i, name in enumerate(names):
+                st = self._stats[name]
+                finished = st.done + st.failed
+                out[name] = {
+                    "queued": self._queues[i].qsize(),
+                    "busy": st.busy,
+                    "done": st.done,
+                    "failed": st.failed,
+                    "avg_sec": st.seconds / finished if finished else 0.0,
+                }
+        return out
+
+    def summary(self) -> str:
+        """One-line progress, e.g. 'captured 12 | ocr 10 (1 busy, 1 queued) | extract 8 | save 5'"""
+        parts = [f"captured {self.submitted}"]
+        for name, p in self.progress().items():
+            extra = [f"{p[k]} {k}" for k in ("busy", "queued", "failed") if p[k]]
+            parts.append(f"{name} {p['done']}" + (f" ({', '.join(extra)})" if extra else ""))
+        return " | ".join(parts)
@@ -1284,7 +1284,7 @@ def _fetch_once_or_reuse(url: str, source_id: int = 6) -> Path:
         log_file(f"[Parser] Triggering PHP processor for HTML: {dated_path}")
         # Import here to avoid circular dependency
         from worker import run_php_processor_for_html
-        run_php_processor_for_html(source_id=source_id, html_path=str(dated_path))
+        run_php_processor_for_html(source_id=source_id, html_path=str(dated_path), page_url=url)
     except Exception as e:
         log_file(f"[Parser] PHP processor trigger failed: {e}")
     
@@ -0,0 +1,224 @@
+"""
+Locate the King County parcel info popup in a screenshot
+Strong Sobel edges are labelled into connected components and every
+component's bounding box and pixel count come out of one pass
+(cv2.connectedComponentsWithStats, or ndimage.find_objects without
+OpenCV). Boxes are filtered by size with array operations. The last hit
+is remembered as a region of interest that is searched first next time.
+
+Benchmark on the sample screenshots:  python popup_locator.py [folder] [--skip-loop]
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom (inclusive max, as before)
+
+# Popup is roughly 260x200 pixels - look for boxes in this range
+POPUP_MIN_W, POPUP_MAX_W = 200, 400
+POPUP_MIN_H, POPUP_MAX_H = 150, 300
+MIN_COMPONENT_PIXELS = 100
+EDGE_PERCENTILE = 95
+# Padding around the remembered popup box when searching it first
+ROI_PAD = 120
+POPUP_ROI_PATH = Path(os.getenv("POPUP_ROI_PATH", str(Path(__file__).resolve().parent / "Captures" / "popup_roi.json")))
+
+
+def _to_gray(image) -> np.ndarray:
+    arr = np.asarray(image)
+    if arr.ndim == 3:
+        if cv2 is not None:
+            code = cv2.COLOR_RGBA2GRAY if arr.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(np.ascontiguousarray(arr), code)
+        # Same weights as PIL's convert('L')
+        arr = arr[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        return np.round(arr).astype(np.uint8)
+    return arr.astype(np.uint8, copy=False)
+
+
+def _component_boxes(mask: np.ndarray):
+    """(left, top, right, bottom, pixel_count) arrays for every component of mask"""
+    if cv2 is not None:
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=4)
+        stats = stats[1:]
+        left, top = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        right = left + stats[:, cv2.CC_STAT_WIDTH] - 1
+        bottom = top + stats[:, cv2.CC_STAT_HEIGHT] - 1
+        return left, top, right, bottom, stats[:, cv2.CC_STAT_AREA]
+    labeled, n = ndimage.label(mask)
+    slices = ndimage.find_objects(labeled)
+    counts = np.bincount(labeled.ravel(), minlength=n + 1)[1:]
+    top = np.array([s[0].start for s in slices])
+    bottom = np.array([s[0].stop - 1 for s in slices])
+    left = np.array([s[1].start for s in slices])
+    right = np.array([s[1].stop - 1 for s in slices])
+    return left, top, right, bottom, counts
+
+
+def find_popup_box(image) -> Optional[Box]:
+    """Largest edge component whose box has popup size, or None"""
+    gray = _to_gray(image)
+    if gray.size == 0:
+        return None
+    # Same edge map as the original detector (uint8 Sobel along x)
+    edges = ndimage.sobel(gray)
+    strong = edges > np.percentile(edges, EDGE_PERCENTILE)
+    left, top, right, bottom, count = _component_boxes(strong)
+    if len(count) == 0:
+        return None
+    width, height = right - left, bottom - top
+    ok = ((count >= MIN_COMPONENT_PIXELS)
+          & (width > POPUP_MIN_W) & (width < POPUP_MAX_W)
+          & (height > POPUP_MIN_H) & (height < POPUP_MAX_H))
+    if not ok.any():
+        return None
+    area = np.where(ok, width * height, -1)
+    i = int(np.argmax(area))
+    return int(left[i]), int(top[i]), int(right[i]), int(bottom[i])
+
+
+class PopupLocator:
+    """find_popup_box with a remembered region of interest.
+
+    The ROI (last hit in full-image coordinates) is persisted so that the
+    next run, and region-only screen capture, can start from it.
+    """
+
+    def __init__(self, roi_path: Path = POPUP_ROI_PATH, pad: int = ROI_PAD):
+        self.roi_path = Path(roi_path)
+        self.pad = pad
+        self._lock = threading.Lock()
+        self.last_box: Optional[Box] = None
+        self.hits = 0
+        self.roi_hits = 0
+        try:
+            if self.roi_path.exists():
+                data = json.loads(self.roi_path.read_text(encoding="utf-8"))
+                self.last_box = tuple(int(v) for v in data["box"])
+        except Exception:
+            self.last_box = None
+
+    def search_region(self, width: int, height: int) -> Optional[Box]:
+        """Padded last hit clipped to an image of the given size"""
+        with self._lock:
+            if self.last_box is None:
+                return None
+            l, t, r, b = self.last_box
+        l, t = max(0, l - self.pad), max(0, t - self.pad)
+        r, b = min(width, r + self.pad + 1), min(height, b + self.pad + 1)
+        if r - l <= POPUP_MIN_W or b - t <= POPUP_MIN_H:
+            return None
+        return l, t, r, b
+
+    def remember(self, box: Box):
+        with self._lock:
+            self.last_box = tuple(int(v) for v in box)
+            try:
+                self.roi_path.parent.mkdir(parents=True, exist_ok=True)
+                self.roi_path.write_text(json.dumps({"box": list(self.last_box), "time": time.time()}), encoding="utf-8")
+            except Exception as e:
+                logging.debug(f"Could not save popup ROI: {e}")
+
+    def locate(self, image, offset: Tuple[int, int] = (0, 0)) -> Optional[Box]:
+        """Popup box in image coordinates; ROI first, then the whole image.
+
+        `offset` is the image's position on screen, so that the remembered
+        box stays in screen coordinates when images are region captures.
+        """
+        arr = np.asarray(image)
+        h, w = arr.shape[:2]
+        ox, oy = offset
+        roi = None
+        region = self.search_region(ox + w, oy + h)
+        if region is not None:
+            l, t = max(0, region[0] - ox), max(0, region[1] - oy)
+            r, b = min(w, region[2] - ox), min(h, region[3] - oy)
+            if r - l > POPUP_MIN_W and b - t > POPUP_MIN_H:
+                roi = (l, t, r, b)
+        if roi is not None and (roi[2] - roi[0], roi[3] - roi[1]) != (w, h):
+            l, t, r, b = roi
+            box = find_popup_box(arr[t:b, l:r])
+            if box is not None:
+                box = (box[0] + l, box[1] + t, box[2] + l, box[3] + t)
+                self.roi_hits += 1
+                self._hit(box, offset)
+                return box
+        box = find_popup_box(arr)
+        if box is not None:
+            self._hit(box, offset)
+        return box
+
+    def _hit(self, box: Box, offset: Tuple[int, int]):
+        self.hits += 1
+        ox, oy = offset
+        self.remember((box[0] + ox, box[1] + oy, box[2] + ox, box[3] + oy))
+
+
+_locator = None
+_locator_lock = threading.Lock()
+
+
+def get_popup_locator() -> PopupLocator:
+    global _locator
+    with _locator_lock:
+        if _locator is None:
+            _locator = PopupLocator()
+        return _locator
+
+
+def _legacy_find_popup_box(gray: np.ndarray) -> Optional[Box]:
+    """The previous per-component argwhere loop, kept for the benchmark"""
+    edges = ndimage.sobel(gray)
+    strong = edges > np.percentile(edges, EDGE_PERCENTILE)
+    labeled, num = ndimage.label(strong)
+    best_box, best_area = None, 0
+    for label_id in range(1, num + 1):
+        coords = np.argwhere(labeled == label_id)
+        if len(coords) < MIN_COMPONENT_PIXELS:
+            continue
+        top, left = coords[:, 0].min(), coords[:, 1].min()
+        bottom, right = coords[:, 0].max(), coords[:, 1].max()
+        width, height = right - left, bottom - top
+        if POPUP_MIN_W < width < POPUP_MAX_W and POPUP_MIN_H < height < POPUP_MAX_H and width * height > best_area:
+            best_area = width * height
+            best_box = (int(left), int(top), int(right), int(bottom))
+    return best_box
+
+
+if __name__ == "__main__":
+    import sys
+    from PIL import Image
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    skip_loop = "--skip-loop" in sys.argv
+    folder = Path(args[0]) if args else Path(__file__).resolve().parent / "parcels"
+    files = sorted(folder.glob("*.png"))
+    print(f"{len(files)} screenshots in {folder} (backend: {'cv2' if cv2 is not None else 'ndimage.find_objects'})")
+    t_old = t_new = 0.0
+    for f in files:
+        gray = np.array(Image.open(f).convert("L"))
+        t0 = time.perf_counter()
+        old = None if skip_loop else _legacy_find_popup_box(gray)
+        t1 = time.perf_counter()
+        new = find_popup_box(gray)
+        t2 = time.perf_counter()
+        t_old += t1 - t0
+        t_new += t2 - t1
+        mark = "loop skipped" if skip_loop else ("same" if old == new else "DIFFERENT")
+        print(f"  {f.name:<22} {gray.shape[1]}x{gray.shape[0]}  loop {1000 * (t1 - t0):8.1f} ms  "
+              f"vectorized {1000 * (t2 - t1):6.1f} ms  {new} ({mark})")
+    if files and not skip_loop:
+        print(f"Total: loop {t_old:.2f}s, vectorized {t_new:.3f}s ({t_old / max(t_new, 1e-9):.0f}x)")
@@ -10,10 +10,13 @@ import json
 import os
 import sys
 import re
+import time
+import threading
 import requests
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
 from urllib.parse import urlparse, urljoin
 
@@ -25,15 +28,46 @@ IMAGES_DIR = SCRIPT_DIR / "Captures" / "images"
 # Ensure images directory exists
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Concurrency: HTML files in flight, simultaneous OpenAI calls (and their
+# per-minute cap), and parallel image downloads shared by all files
+FILE_WORKERS = int(os.getenv("DAILY_FILE_WORKERS", "4"))
+AI_CONCURRENCY = int(os.getenv("DAILY_AI_CONCURRENCY", "3"))
+AI_RATE_PER_MIN = float(os.getenv("DAILY_AI_RATE_PER_MIN", "60"))
+IMAGE_WORKERS = int(os.getenv("DAILY_IMAGE_WORKERS", "8"))
+# Model and prompt version for listing extraction; bump the version whenever
+# the prompt changes so cached responses for the old prompt are not reused
+AI_MODEL = "gpt-4o-mini"
+AI_PROMPT_VERSION = "daily-listings-v2"
+# Optional CSS selector/class term of the listings container on captured pages
+LISTINGS_CONTAINER = os.getenv("DAILY_LISTINGS_CONTAINER", "")
+
 # Import config utilities
 try:
     from config_utils import CFG
+    from rate_limiter import TokenBucket
+    from html_reducer import reduce_listing_html, merge_chunk_listings
+    from llm_cache import get_llm_cache, cache_key
+    from extraction_cascade import run_local_tiers, get_tier_stats, CONFIDENCE_THRESHOLD
     import mysql.connector as mysql
 except ImportError as e:
     print(f"Error importing dependencies: {e}")
     sys.exit(1)
 
 
+_ai_slots = threading.BoundedSemaphore(max(1, AI_CONCURRENCY))
+_ai_bucket = TokenBucket(AI_RATE_PER_MIN, burst=max(1, AI_CONCURRENCY))
+_image_pool: Optional[ThreadPoolExecutor] = None
+_image_pool_lock = threading.Lock()
+
+
+def _get_image_pool() -> ThreadPoolExecutor:
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ThreadPoolExecutor(max_workers=max(1, IMAGE_WORKERS), thread_name_prefix="daily-img")
+        return _image_pool
+
+
 def get_todays_capture_folder() -> Optional[Path]:
     """Get today's date folder in Captures"""
     today = datetime.now().strftime("%Y-%m-%d")
@@ -101,8 +135,62 @@ def download_image(url: str, listing_id: str) -> Optional[str]:
         return None
 
 
-def extract_listings_with_ai(html_content: str, source_file: str) -> List[Dict]:
-    """Use ChatGPT to extract apartment listings from HTML"""
+def extract_listings_with_ai(html_content: str, source_file: str, source_url: str = "",
+                             stats: Optional[Dict] = None) -> List[Dict]:
+    """Extract apartment listings from HTML, with ChatGPT only as the last tier.
+
+    Local extractors run first; if their result scores at least
+    CONFIDENCE_THRESHOLD it is used as is. Otherwise the page is reduced to
+    its listings container and split into card-aligned chunks, which are
+    extracted in parallel and merged. Tier and reduction stats (chars/tokens
+    before and after) go into `stats` if given.
+    """
+    stats = stats if stats is not None else {}
+    try:
+        local = run_local_tiers(html_content, source_url or "", LISTINGS_CONTAINER)
+    except Exception as e:
+        print(f"  ⚠ Local extraction failed: {e}", flush=True)
+        local = {"tier": None, "listings": [], "confidence": 0.0, "expected": 0}
+    if local["tier"] and local["confidence"] >= CONFIDENCE_THRESHOLD:
+        print(f"  ✓ {local['tier']}: {len(local['listings'])} listings locally "
+              f"(confidence {local['confidence']:.2f}, page shows ~{local['expected']}) - no AI call", flush=True)
+        stats['tier'] = local['tier']
+        get_tier_stats().record(local['tier'])
+        return local['listings']
+    print(f"  → Local extractors not confident ({local['tier'] or 'no match'}, "
+          f"{local['confidence']:.2f} < {CONFIDENCE_THRESHOLD}), escalating to AI", flush=True)
+    stats['tier'] = 'llm'
+    get_tier_stats().record('llm')
+
+    chunks, reduced = reduce_listing_html(html_content, source_url or "", LISTINGS_CONTAINER or None)
+    stats.update(reduced)
+    saved = 100.0 * (1 - reduced['chars_after'] / max(1, reduced['chars_before']))
+    print(f"  → Reduced HTML {reduced['chars_before']:,} → {reduced['chars_after']:,} chars "
+          f"(~{reduced['tokens_before']:,} → ~{reduced['tokens_after']:,} tokens, -{saved:.0f}%), "
+          f"{reduced['cards']} cards in {reduced['chunks']} chunk(s)", flush=True)
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        return _extract_chunk_with_ai(chunks[0], source_file)
+
+    # Concurrency is bounded by _ai_slots / _ai_bucket inside each call
+    with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="daily-chunk") as pool:
+        results = list(pool.map(lambda c: _extract_chunk_with_ai(c, source_file), chunks))
+    listings = merge_chunk_listings(results)
+    print(f"  ✓ Merged {sum(len(r) for r in results)} chunk results into {len(listings)} listings", flush=True)
+    return listings
+
+
+def _extract_chunk_with_ai(html_content: str, source_file: str) -> List[Dict]:
+    """Send one chunk of reduced listing HTML to ChatGPT and parse the JSON array"""
+    cache = get_llm_cache()
+    key = cache_key(AI_MODEL, AI_PROMPT_VERSION, html_content)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"  ✓ Cache hit: {len(cached)} listings (no API call)", flush=True)
+            return cached
+
     try:
         import openai
         
@@ -111,12 +199,8 @@ def extract_listings_with_ai(html_content: str, source_file: str) -> List[Dict]:
         if not api_key:
             raise Exception("OPENAI_API_KEY environment variable not set")
         
-        # Truncate HTML if too large (keep first 50k chars for context)
-        if len(html_content) > 50000:
-            html_content = html_content[:50000] + "\n... [truncated]"
-        
         # Create prompt
-        prompt = f"""Extract all apartment listings from this HTML page.
+        prompt = f"""Extract all apartment listings from this HTML (the listings section of a page, cleaned of scripts and styling).
 
 HTML Content:
 {html_content}
@@ -162,21 +246,24 @@ Return ONLY the JSON array, no other text. Example:
 ]"""
 
         print(f"  → Sending HTML to ChatGPT for analysis...", flush=True)
-        print(f"  → Using model: gpt-4o-mini", flush=True)
+        print(f"  → Using model: {AI_MODEL}", flush=True)
         print(f"  → HTML size: {len(html_content)} characters", flush=True)
         
         client = openai.OpenAI(api_key=api_key)
         
         print(f"  → Waiting for ChatGPT response...", flush=True)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert at extracting structured data from apartment listing HTML pages. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-            max_tokens=4000
-        )
+        # Bounded number of calls in flight, and no more than AI_RATE_PER_MIN started per minute
+        with _ai_slots:
+            _ai_bucket.acquire()
+            response = client.chat.completions.create(
+                model=AI_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are an expert at extracting structured data from apartment listing HTML pages. Always return valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+                max_tokens=4000
+            )
         
         print(f"  ✓ Received response from ChatGPT!", flush=True)
         
@@ -195,6 +282,8 @@ Return ONLY the JSON array, no other text. Example:
         
         listings = json.loads(response_text)
         print(f"  ✓ ChatGPT extracted {len(listings)} listings from HTML!", flush=True)
+        if cache is not None and isinstance(listings, list):
+            cache.put(key, listings, AI_MODEL, AI_PROMPT_VERSION)
         return listings
         
     except Exception as e:
@@ -202,13 +291,20 @@ Return ONLY the JSON array, no other text. Example:
         return []
 
 
-def process_html_file(html_file: Path) -> List[Dict]:
-    """Process a single HTML file and extract listings"""
+def process_html_file(html_file: Path, timings: Optional[Dict] = None) -> List[Dict]:
+    """Process a single HTML file and extract listings.
+
+    If `timings` is given it is filled with seconds spent reading, in AI
+    extraction and waiting for image downloads.
+    """
     print(f"\n📄 Processing: {html_file.name}", flush=True)
+    timings = timings if timings is not None else {}
     
     try:
         # Read HTML
+        t0 = time.perf_counter()
         html_content = html_file.read_text(encoding='utf-8', errors='ignore')
+        timings['read'] = time.perf_counter() - t0
         
         # Extract source URL from HTML comment if present
         source_url = None
@@ -218,20 +314,33 @@ def process_html_file(html_file: Path) -> List[Dict]:
             print(f"  📍 Source URL: {source_url}", flush=True)
         
         # Use AI to extract listings
-        listings = extract_listings_with_ai(html_content, str(html_file))
+        t0 = time.perf_counter()
+        listings = extract_listings_with_ai(html_content, str(html_file), source_url or "", timings)
+        timings['ai'] = time.perf_counter() - t0
         
         if not listings:
             print(f"  ⚠ No listings extracted")
             return []
         
-        # Process each listing
-        processed = []
-        for idx, listing in enumerate(listings, 1):
+        # Start all image downloads up front so they overlap each other
+        # (and the AI calls of other files) on the shared download pool
+        t0 = time.perf_counter()
+        unique_ids = []
+        downloads = {}
+        for idx, listing in enumerate(listings):
             # Use listing_id from JSON if available, otherwise extract from URL
             unique_id = listing.get('listing_id')
             if not unique_id:
                 listing_url = listing.get('listing_website') or listing.get('apply_now_link') or ''
                 unique_id = extract_unique_id_from_url(listing_url)
+            unique_ids.append(unique_id)
+            if not listing.get('image_filename') and listing.get('img_urls'):
+                downloads[idx] = _get_image_pool().submit(download_image, listing['img_urls'], unique_id)
+        
+        # Process each listing
+        processed = []
+        for idx, listing in enumerate(listings, 1):
+            unique_id = unique_ids[idx - 1]
             
             # Handle thumbnail_url from existing image_filename or download new image
             if listing.get('image_filename'):
@@ -239,11 +348,11 @@ def process_html_file(html_file: Path) -> List[Dict]:
                 listing['thumbnail_url'] = listing['image_filename']
                 listing['image_url'] = f"images/{listing['image_filename']}"
             else:
-                # Download image if present
+                # Downloaded image if present
                 original_img_url = listing.get('img_urls')
-                if original_img_url:
-                    # Download and get filename with extension (e.g., "listing_id.jpg")
-                    thumbnail_filename = download_image(original_img_url, unique_id)
+                if idx - 1 in downloads:
+                    # Filename with extension (e.g., "listing_id.jpg")
+                    thumbnail_filename = downloads[idx - 1].result()
                     if thumbnail_filename:
                         # Store just the filename in thumbnail_url
                         listing['thumbnail_url'] = thumbnail_filename
@@ -311,6 +420,7 @@ def process_html_file(html_file: Path) -> List[Dict]:
             processed.append(listing)
             print(f"  ✓ Listing {idx}: {listing.get('title', 'N/A')} - ID: {unique_id}")
         
+        timings['images'] = time.perf_counter() - t0
         return processed
         
     except Exception as e:
@@ -320,15 +430,66 @@ def process_html_file(html_file: Path) -> List[Dict]:
         return []
 
 
-def upsert_listings_to_db(listings: List[Dict]) -> int:
+# Rows per INSERT ... ON DUPLICATE KEY UPDATE statement
+UPSERT_CHUNK_SIZE = int(os.getenv("DAILY_UPSERT_CHUNK_SIZE", "200"))
+
+# Column names of apartment_listings, cached across runs in this process;
+# dropped whenever a write fails so a schema change is picked up on retry
+_listing_columns: Optional[List[str]] = None
+
+
+def get_listing_columns(cursor, refresh: bool = False) -> List[str]:
+    """Return (cached) apartment_listings column names"""
+    global _listing_columns
+    if _listing_columns is None or refresh:
+        cursor.execute("SHOW COLUMNS FROM apartment_listings")
+        _listing_columns = [row[0] for row in cursor.fetchall()]
+    return _listing_columns
+
+
+def invalidate_listing_columns():
+    global _listing_columns
+    _listing_columns = None
+
+
+def _upsert_chunk(cursor, chunk: List[Dict], valid_columns: set) -> int:
+    """Write one chunk with multi-row INSERT ... ON DUPLICATE KEY UPDATE.
+
+    Rows are grouped by their column set so an update only touches the
+    columns the listing actually carries (same as the old per-row UPDATE).
+    Returns how many of the chunk's ids already existed.
+    """
+    ids = [listing['id'] for listing in chunk]
+    cursor.execute(
+        f"SELECT id FROM apartment_listings WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+    existing = len(cursor.fetchall())
+
+    groups: Dict[tuple, List[list]] = {}
+    for listing in chunk:
+        cols = tuple(k for k in listing if k in valid_columns)
+        groups.setdefault(cols, []).append([listing[k] for k in cols])
+
+    for cols, values in groups.items():
+        col_sql = ", ".join(f"`{c}`" for c in cols)
+        placeholders = ", ".join(["%s"] * len(cols))
+        updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in cols if c not in ("id", "time_created"))
+        sql = (f"INSERT INTO apartment_listings ({col_sql}) VALUES ({placeholders}) "
+               f"ON DUPLICATE KEY UPDATE {updates}")
+        cursor.executemany(sql, values)
+    return existing
+
+
+def upsert_listings_to_db(listings: List[Dict], chunk_size: int = None) -> int:
     """Insert or update listings in the apartment_listings table"""
     if not listings:
         return 0
-    
-    print(f"\n💾 Upserting {len(listings)} listings to database...")
-    
+
+    chunk_size = max(1, chunk_size or UPSERT_CHUNK_SIZE)
+    print(f"\n💾 Upserting {len(listings)} listings to database (chunks of {chunk_size})...")
+
+    conn = None
     try:
-        # Connect to MySQL
+        t0 = time.perf_counter()
         conn = mysql.connect(
             host=CFG["MYSQL_HOST"],
             port=CFG["MYSQL_PORT"],
@@ -337,51 +498,44 @@ def upsert_listings_to_db(listings: List[Dict]) -> int:
             database=CFG["MYSQL_DB"]
         )
         cursor = conn.cursor()
-        
-        # Get table columns
-        cursor.execute("SHOW COLUMNS FROM apartment_listings")
-        valid_columns = {row[0] for row in cursor.fetchall()}
-        
+        valid_columns = set(get_listing_columns(cursor))
+        print(f"  → Connected and loaded schema in {time.perf_counter() - t0:.2f}s", flush=True)
+
+        # Duplicate ids are merged column by column: later non-null values win, as with
+        # the old sequential upserts, and columns only an earlier duplicate had are kept
+        by_id = {}
+        for listing in listings:
+            merged = by_id.setdefault(listing['id'], {})
+            merged.update((k, v) for k, v in listing.items() if v is not None or k not in merged)
+        rows = list(by_id.values())
+
         inserted = 0
         updated = 0
-        
-        for listing in listings:
-            # Filter to only valid columns
-            filtered = {k: v for k, v in listing.items() if k in valid_columns}
-            
-            # Check if exists
-            cursor.execute("SELECT id FROM apartment_listings WHERE id = %s", (filtered['id'],))
-            exists = cursor.fetchone()
-            
-            if exists:
-                # Update existing
-                set_clause = ", ".join([f"{k} = %s" for k in filtered.keys() if k != 'id'])
-                values = [v for k, v in filtered.items() if k != 'id']
-                values.append(filtered['id'])
-                
-                sql = f"UPDATE apartment_listings SET {set_clause} WHERE id = %s"
-                cursor.execute(sql, values)
-                updated += 1
-                print(f"  ↻ Updated: {filtered.get('title', 'N/A')} (ID: {filtered['id']})")
-            else:
-                # Insert new
-                columns = ", ".join(filtered.keys())
-                placeholders = ", ".join(["%s"] * len(filtered))
-                values = list(filtered.values())
-                
-                sql = f"INSERT INTO apartment_listings ({columns}) VALUES ({placeholders})"
-                cursor.execute(sql, values)
-                inserted += 1
-                print(f"  ✓ Inserted: {filtered.get('title', 'N/A')} (ID: {filtered['id']})")
-        
-        conn.commit()
+        for n, start in enumerate(range(0, len(rows), chunk_size), 1):
+            chunk = rows[start:start + chunk_size]
+            t_chunk = time.perf_counter()
+            chunk_updated = _upsert_chunk(cursor, chunk, valid_columns)
+            conn.commit()
+            inserted += len(chunk) - chunk_updated
+            updated += chunk_updated
+            print(f"  ✓ Chunk {n}: {len(chunk)} rows in {time.perf_counter() - t_chunk:.2f}s", flush=True)
+
         cursor.close()
         conn.close()
-        
-        print(f"\n✅ Database updated: {inserted} inserted, {updated} updated")
-        return inserted + updated
-        
+
+        print(f"\n✅ Database updated: {inserted} inserted, {updated} updated "
+              f"in {time.perf_counter() - t0:.2f}s")
+        # Listings processed (duplicates included), as before chunking
+        return len(listings)
+
     except Exception as e:
+        invalidate_listing_columns()
+        if conn is not None:
+            try:
+                conn.rollback()
+                conn.close()
+            except Exception:
+                pass
         print(f"\n❌ Database error: {e}")
         import traceback
         traceback.print_exc()
@@ -399,6 +553,36 @@ def save_json_backup(listings: List[Dict], folder: Path):
         print(f"\n⚠ Failed to save JSON backup: {e}")
 
 
+def print_timing_report(report: Dict[str, Dict], wall_seconds: float):
+    """Print one line per file: listings found and where the time went"""
+    print("\n⏱ Per-file report", flush=True)
+    print(f"  {'file':<32} {'listings':>8} {'read':>6} {'ai':>7} {'images':>7} {'total':>7}")
+    busy = 0.0
+    for name in sorted(report):
+        r = report[name]
+        busy += r.get('total', 0)
+        if 'error' in r:
+            print(f"  {name:<32} {'-':>8}  error: {r['error']}")
+            continue
+        print(f"  {name:<32} {r['listings']:>8} {r.get('read', 0):>6.2f} {r.get('ai', 0):>7.1f} "
+              f"{r.get('images', 0):>7.1f} {r.get('total', 0):>7.1f}")
+    print(f"  {len(report)} files in {wall_seconds:.1f}s wall ({busy:.1f}s summed per file)", flush=True)
+    tiers = {}
+    for r in report.values():
+        if r.get('tier'):
+            tiers[r['tier']] = tiers.get(r['tier'], 0) + 1
+    if tiers:
+        print(f"  Resolved by: {', '.join(f'{t} {c}' for t, c in sorted(tiers.items()))} "
+              f"(all runs: {get_tier_stats().summary()})", flush=True)
+    before = sum(r.get('chars_before', 0) for r in report.values())
+    after = sum(r.get('chars_after', 0) for r in report.values())
+    if before:
+        tokens_before = sum(r.get('tokens_before', 0) for r in report.values())
+        tokens_after = sum(r.get('tokens_after', 0) for r in report.values())
+        print(f"  HTML sent to AI: {before:,} → {after:,} chars, ~{tokens_before:,} → ~{tokens_after:,} tokens "
+              f"({100.0 * (1 - after / before):.0f}% saved)", flush=True)
+
+
 def main():
     """Main processing pipeline"""
     print("=" * 60, flush=True)
@@ -423,11 +607,38 @@ def main():
     
     print(f"Found {len(html_files)} HTML file(s)", flush=True)
     
-    # Process each file
+    # Process files concurrently; AI calls and image downloads are bounded
+    # separately inside process_html_file
+    t_start = time.perf_counter()
+    report = {}
+    results = {}
+
+    def run_one(html_file: Path):
+        timings = {}
+        t0 = time.perf_counter()
+        listings = process_html_file(html_file, timings)
+        timings['total'] = time.perf_counter() - t0
+        return listings, timings
+
+    with ThreadPoolExecutor(max_workers=max(1, FILE_WORKERS), thread_name_prefix="daily-file") as pool:
+        futures = {pool.submit(run_one, f): f for f in html_files}
+        for done, fut in enumerate(as_completed(futures), 1):
+            html_file = futures[fut]
+            try:
+                listings, timings = fut.result()
+            except Exception as e:
+                listings, timings = [], {'error': str(e)}
+            results[html_file] = listings
+            report[html_file.name] = dict(timings, listings=len(listings))
+            print(f"  [{done}/{len(html_files)}] {html_file.name}: {len(listings)} listings "
+                  f"in {timings.get('total', 0):.1f}s", flush=True)
+
+    # Keep the original file order for the backup and the upsert
     all_listings = []
     for html_file in html_files:
-        listings = process_html_file(html_file)
-        all_listings.extend(listings)
+        all_listings.extend(results.get(html_file, []))
+
+    print_timing_report(report, time.perf_counter() - t_start)
     
     if not all_listings:
         print(f"\n⚠ No listings extracted from any files", flush=True)
@@ -5,26 +5,35 @@ Processes images in batches of 20, extracts structured data, and saves to MySQL
 
 import os
 import json
-import base64
 import mysql.connector
 from pathlib import Path
 from datetime import datetime
 import openai
 from track_openai_costs import log_openai_cost
+from llm_cache import get_llm_cache, cache_key
+from vision_images import PREP_SIGNATURE, prepare_images, image_content, estimate_batch, format_estimate
+from parcel_manifest import get_parcel_manifest
 
 # OpenAI API key (set in environment variable)
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-def encode_image(image_path):
-    """Encode image to base64 for OpenAI API"""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# Bump when the extraction prompt changes so cached results are not reused
+VISION_MODEL = "gpt-4o"
+VISION_PROMPT_VERSION = "parcel-vision-v1"
 
 def extract_with_openai(image_paths):
     """
     Send images to OpenAI Vision API for structured data extraction
     Returns list of extracted parcel data
     """
+    cache = get_llm_cache()
+    key = cache_key(VISION_MODEL, VISION_PROMPT_VERSION, PREP_SIGNATURE, *[Path(p) for p in image_paths])
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"\n♻️ Cached result for these {len(image_paths)} images, skipping OpenAI call")
+            return cached
+
     print(f"\n📤 Sending {len(image_paths)} images to OpenAI Vision API...")
     
     # Prepare messages with all images
@@ -69,24 +78,15 @@ Example output format:
         }
     ]
     
-    # Add each image with progress tracking
+    # Crop to the popup, size for the model and encode all images in parallel
     import time
     start_time = time.time()
-    for idx, img_path in enumerate(image_paths, 1):
-        base64_image = encode_image(img_path)
-        content.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/png;base64,{base64_image}",
-                "detail": "high"
-            }
-        })
-        # Show progress
-        progress = int((idx / len(image_paths)) * 100)
-        print(f"\r💾 Encoding images: {idx}/{len(image_paths)} ({progress}%)", end='', flush=True)
+    prepared = prepare_images(image_paths)
+    content.extend(image_content(p) for p in prepared)
     
     encode_time = time.time() - start_time
-    print(f"\n✅ All images encoded in {encode_time:.1f}s")
+    print(f"✅ All images encoded in {encode_time:.1f}s ({sum(p.cropped for p in prepared)} cropped to popup)")
+    print(f"💵 Estimate: {format_estimate(estimate_batch(prepared, content[0]['text'], VISION_MODEL))}")
     
     # Call OpenAI API with time tracking
     try:
@@ -94,7 +94,7 @@ Example output format:
         api_start = time.time()
         
         response = openai.chat.completions.create(
-            model="gpt-4o",  # Use GPT-4 with vision
+            model=VISION_MODEL,  # Use GPT-4 with vision
             messages=[
                 {
                     "role": "user",
@@ -108,24 +108,17 @@ Example output format:
         api_time = time.time() - api_start
         print(f"✅ OpenAI response received in {api_time:.1f}s")
         
-        # Log to api_call_log table
+        # Log to api_call_log table (queued; written in batches by track_api_usage)
         try:
-            from config_hud_db import DB_CONFIG
-            log_conn = mysql.connector.connect(**DB_CONFIG)
-            log_cursor = log_conn.cursor()
-            log_cursor.execute("""
-                INSERT INTO api_call_log (endpoint, status, url, address, created_at)
-                VALUES (%s, %s, %s, %s, NOW())
-            """, (
-                'openai_vision',
-                'success',
-                'https://api.openai.com/v1/chat/completions',
-                f"gpt-4o | {len(image_paths)} images | {api_time:.1f}s | {response.usage.prompt_tokens}+{response.usage.completion_tokens} tokens"
-            ))
-            log_conn.commit()
-            log_cursor.close()
-            log_conn.close()
-            print(f"📊 Logged to api_call_log: {len(image_paths)} images, {response.usage.prompt_tokens + response.usage.completion_tokens} total tokens")
+            from track_api_usage import log_api_row
+            log_api_row("hud", "api_call_log", {
+                "endpoint": 'openai_vision',
+                "status": 'success',
+                "url": 'https://api.openai.com/v1/chat/completions',
+                "address": f"{VISION_MODEL} | {len(image_paths)} images | {api_time:.1f}s | {response.usage.prompt_tokens}+{response.usage.completion_tokens} tokens",
+                "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            print(f"📊 Queued for api_call_log: {len(image_paths)} images, {response.usage.prompt_tokens + response.usage.completion_tokens} total tokens")
         except Exception as log_err:
             print(f"⚠️ api_call_log insert failed: {log_err}")
         
@@ -134,7 +127,7 @@ Example output format:
             from track_api_usage import log_openai_call
             usage = response.usage
             log_openai_call(
-                model="gpt-4o",
+                model=VISION_MODEL,
                 input_tokens=usage.prompt_tokens,
                 output_tokens=usage.completion_tokens,
                 endpoint="chat.completions",
@@ -161,6 +154,8 @@ Example output format:
         total_time = time.time() - start_time
         print(f"✅ OpenAI extracted data from {len(extracted_data)} images in {total_time:.1f}s total")
         print(f"   ⏱️ Average: {total_time/len(extracted_data):.1f}s per image")
+        if cache is not None and isinstance(extracted_data, list):
+            cache.put(key, extracted_data, VISION_MODEL, VISION_PROMPT_VERSION)
         return extracted_data
         
     except Exception as e:
@@ -360,10 +355,10 @@ def process_parcel_images():
     
     parcels_dir = Path("Captures/parcels")
     
-    # Find all PNG images ready for processing (exclude DEBUG files)
-    all_images = list(parcels_dir.glob("parcels_*.png"))
-    image_files = sorted([img for img in all_images 
-                         if not img.stem.startswith('DEBUG_')])
+    # Pending images from the parcel manifest (DEBUG files are never registered)
+    manifest = get_parcel_manifest()
+    manifest.sync(parcels_dir)
+    image_files = manifest.pending()
     
     if not image_files:
         print("❌ No PNG images found in Captures/parcels/")
@@ -452,6 +447,12 @@ def process_parcel_images():
             linked = link_addresses_to_parcels(batch, extracted_data)
             print(f"✅ Linked {linked} addresses to parcels")
             
+            # Record results so these images are not sent again and the matcher knows what is linked
+            for img_path, record in zip(batch, extracted_data):
+                manifest.mark_extracted(img_path, record, batch_file)
+                if record.get('_db_id'):
+                    manifest.mark_linked(img_path, record['_db_id'])
+            
             # Move processed images to 'processed' folder (don't delete)
             processed_dir = parcels_dir / "processed"
             processed_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thread-safe token bucket
+Shared by the workers that call rate-limited APIs (OpenAI, Google Places) so a
+pool of threads stays under the provider's requests-per-minute quota.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow `rate_per_min` acquisitions per minute with bursts of up to `burst`.
+
+    A rate of 0 (or less) disables limiting.
+    """
+
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.rate = max(0.0, float(rate_per_min)) / 60.0
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0, cancel_event: threading.Event = None) -> bool:
+        """Block until `tokens` are available. Returns False if cancelled while waiting."""
+        if self.rate <= 0:
+            return True
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def set_rate(self, rate_per_min: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0.0, float(rate_per_min)) / 60.0
@@ -0,0 +1,136 @@
+"""
+Screen capture for the parcel popup
+Grabs only the region where the popup was last found (popup_locator's
+remembered box plus padding) and falls back to the whole browser area.
+Captures are numpy arrays with their screen offset, passed in memory to
+detection and OCR. PNG writes go through a background sink so they never
+block the automation; pure debug images are only written when
+PARCEL_DEBUG_CAPTURES=1.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+from popup_locator import get_popup_locator
+
+# Set PARCEL_DEBUG_CAPTURES=1 to also write full screenshots to disk
+DEBUG_CAPTURES = os.getenv("PARCEL_DEBUG_CAPTURES", "0") == "1"
+SINK_QUEUE_SIZE = int(os.getenv("PARCEL_SINK_QUEUE_SIZE", "32"))
+
+# image: numpy array, offset: (x, y) of its top-left on screen, is_region: predicted region only
+Capture = namedtuple("Capture", "image offset is_region")
+
+
+class DebugSink:
+    """Writes images to disk on a background thread"""
+
+    def __init__(self, debug: bool = DEBUG_CAPTURES, maxsize: int = SINK_QUEUE_SIZE):
+        self.debug_enabled = debug
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="capture-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def save(self, image, path: Path, on_saved: Optional[Callable[[Path], None]] = None):
+        """Queue an image that later steps read from disk (waits if the queue is full).
+        The file appears complete (temp file + rename); on_saved(path) runs once it is there."""
+        self._queue.put((image, Path(path), on_saved))
+
+    def debug(self, image, path: Path) -> bool:
+        """Queue a debug-only image; skipped when debug captures are off or the queue is full"""
+        if not self.debug_enabled:
+            return False
+        try:
+            self._queue.put_nowait((image, Path(path), None))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """Block until every queued image is written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            image, path, on_saved = self._queue.get()
+            try:
+                if isinstance(image, np.ndarray):
+                    image = Image.fromarray(image)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Readers polling the folder never see a half-written file
+                tmp = path.with_name(path.name + ".tmp")
+                image.save(tmp, format=Image.registered_extensions().get(path.suffix.lower(), "PNG"))
+                os.replace(tmp, path)
+                self.written += 1
+                if on_saved is not None:
+                    on_saved(path)
+            except Exception as e:
+                logging.warning(f"Could not write {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+def grab(bbox: Tuple[int, int, int, int]) -> np.ndarray:
+    """Screen pixels inside bbox (left, top, right, bottom exclusive) as an RGB array"""
+    return np.asarray(ImageGrab.grab(bbox=bbox).convert("RGB"))
+
+
+class RegionCapture:
+    """Capture the predicted popup region, or the full area when there is none"""
+
+    def __init__(self, locator=None):
+        self.locator = locator or get_popup_locator()
+        self.region_captures = 0
+        self.full_captures = 0
+
+    def predicted_region(self, area: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """Remembered popup box plus padding, clipped to area, in screen coordinates"""
+        region = self.locator.search_region(area[2], area[3])
+        if region is None:
+            return None
+        l, t = max(area[0], region[0]), max(area[1], region[1])
+        r, b = min(area[2], region[2]), min(area[3], region[3])
+        if r <= l or b <= t:
+            return None
+        return l, t, r, b
+
+    def capture(self, area: Tuple[int, int, int, int], full: bool = False) -> Capture:
+        region = None if full else self.predicted_region(area)
+        if region is not None:
+            self.region_captures += 1
+            return Capture(grab(region), (region[0], region[1]), True)
+        self.full_captures += 1
+        return Capture(grab(area), (area[0], area[1]), False)
+
+
+_sink = None
+_capture = None
+_lock = threading.Lock()
+
+
+def get_debug_sink() -> DebugSink:
+    global _sink
+    with _lock:
+        if _sink is None:
+            _sink = DebugSink()
+        return _sink
+
+
+def get_region_capture() -> RegionCapture:
+    global _capture
+    with _lock:
+        if _capture is None:
+            _capture = RegionCapture()
+        return _capture
@@ -0,0 +1,202 @@
+"""
+Template matching for the King County parcel popup
+Normalized cross-correlation (TM_CCOEFF_NORMED) of a small template over
+the whole screenshot in one call: cv2.matchTemplate when OpenCV is
+installed, otherwise an FFT correlation with integral-image window sums.
+The template is tried at several scales (browser zoom / DPI) and loaded
+once per file version. A match above the confidence threshold gives the
+popup box through a fixed offset from the template position.
+
+Benchmark on the sample screenshots:  python template_matcher.py [folder] [--with-loop]
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+from scipy.signal import fftconvolve
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom (inclusive max, as in popup_locator)
+Match = namedtuple("Match", "x y width height score scale")
+
+TEMPLATE_PATH = Path(os.getenv("POPUP_TEMPLATE_PATH", str(Path(__file__).resolve().parent / "popup_icon_template.png")))
+# Minimum TM_CCOEFF_NORMED score (-1..1) to accept a match
+MATCH_THRESHOLD = float(os.getenv("POPUP_TEMPLATE_THRESHOLD", "0.8"))
+# Stop trying further scales once a match is this good
+EARLY_EXIT_SCORE = 0.95
+# Template scales, most likely first
+MATCH_SCALES = tuple(float(s) for s in os.getenv("POPUP_TEMPLATE_SCALES", "1.0,0.9,1.1,0.8,1.25").split(","))
+# Popup box relative to the template's top-left at scale 1 (left, top, right, bottom).
+# popup_icon_template.png sits on the popup's bottom scrollbar (measured on parcels/parcels_655.png)
+POPUP_FROM_TEMPLATE = tuple(int(v) for v in os.getenv("POPUP_TEMPLATE_BOX", "-7,-148,216,33").split(","))
+
+
+def _to_gray(image) -> np.ndarray:
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("L"))
+    arr = np.asarray(image)
+    if arr.ndim == 3:
+        if cv2 is not None:
+            code = cv2.COLOR_RGBA2GRAY if arr.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(np.ascontiguousarray(arr), code)
+        arr = arr[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        return np.round(arr).astype(np.uint8)
+    return arr.astype(np.uint8, copy=False)
+
+
+def _window_sums(a: np.ndarray, h: int, w: int) -> np.ndarray:
+    """Sum of every h x w window (valid positions) from an integral image"""
+    ii = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return ii[h:, w:] - ii[:-h, w:] - ii[h:, :-w] + ii[:-h, :-w]
+
+
+def ncc_map(image: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """TM_CCOEFF_NORMED score for every template position (valid region)"""
+    if cv2 is not None:
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    img = image.astype(np.float64)
+    tpl = template.astype(np.float64)
+    h, w = tpl.shape
+    tpl = tpl - tpl.mean()
+    # Correlation = convolution with the flipped template; sum(tpl) == 0 so the window mean drops out
+    num = fftconvolve(img, tpl[::-1, ::-1], mode="valid")
+    s = _window_sums(img, h, w)
+    s2 = _window_sums(img * img, h, w)
+    img_var = np.maximum(s2 - s * s / (h * w), 0)
+    denom = np.sqrt(img_var * (tpl * tpl).sum())
+    return np.where(denom > 1e-6, num / np.maximum(denom, 1e-6), 0.0)
+
+
+class TemplateMatcher:
+    """Multi-scale NCC matcher for one template image"""
+
+    def __init__(self, template_path: Path = TEMPLATE_PATH, threshold: float = MATCH_THRESHOLD,
+                 scales: Sequence[float] = MATCH_SCALES, popup_offset: Box = POPUP_FROM_TEMPLATE):
+        self.template_path = Path(template_path)
+        self.threshold = threshold
+        self.scales = tuple(scales)
+        self.popup_offset = tuple(popup_offset)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._scaled = {}
+
+    def _templates(self):
+        """(scale, template) pairs, re-read only when the file changes"""
+        mtime = self.template_path.stat().st_mtime
+        with self._lock:
+            if mtime != self._mtime:
+                base = _to_gray(Image.open(self.template_path))
+                h, w = base.shape
+                scaled = {}
+                for scale in self.scales:
+                    size = (max(4, round(w * scale)), max(4, round(h * scale)))
+                    scaled[scale] = base if scale == 1.0 else _to_gray(
+                        Image.fromarray(base).resize(size, Image.LANCZOS))
+                self._scaled, self._mtime = scaled, mtime
+            return list(self._scaled.items())
+
+    def match(self, image, region: Optional[Box] = None) -> Optional[Match]:
+        """Best match at any scale with score >= threshold, in image coordinates.
+
+        `region` (left, top, right, bottom exclusive) limits the search.
+        """
+        gray = _to_gray(image)
+        ox = oy = 0
+        if region is not None:
+            ox, oy = max(0, region[0]), max(0, region[1])
+            gray = gray[oy:region[3], ox:region[2]]
+        best = None
+        for scale, tpl in self._templates():
+            th, tw = tpl.shape
+            if gray.shape[0] < th or gray.shape[1] < tw:
+                continue
+            scores = ncc_map(gray, tpl)
+            y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+            score = float(scores[y, x])
+            if best is None or score > best.score:
+                best = Match(int(x) + ox, int(y) + oy, tw, th, score, scale)
+            if score >= EARLY_EXIT_SCORE:
+                break
+        if best is None or best.score < self.threshold:
+            return None
+        return best
+
+    def popup_box(self, match: Match, width: int, height: int) -> Optional[Box]:
+        """Popup box for a match, scaled with the match and clipped to the image"""
+        l, t, r, b = (round(v * match.scale) for v in self.popup_offset)
+        left, top = max(0, match.x + l), max(0, match.y + t)
+        right, bottom = min(width - 1, match.x + r), min(height - 1, match.y + b)
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right, bottom
+
+    def locate_popup(self, image, region: Optional[Box] = None) -> Tuple[Optional[Box], Optional[Match]]:
+        """(popup box, match), or (None, None) when the template is not found"""
+        gray = _to_gray(image)
+        m = self.match(gray, region)
+        if m is None:
+            return None, None
+        return self.popup_box(m, gray.shape[1], gray.shape[0]), m
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_template_matcher() -> TemplateMatcher:
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = TemplateMatcher()
+        return _matcher
+
+
+def _legacy_sad_match(gray: np.ndarray, template: np.ndarray) -> Tuple[int, int]:
+    """The previous per-pixel sum-of-absolute-differences loop, kept for the benchmark"""
+    th, tw = template.shape
+    tpl = template.astype(int)
+    best_score, best_pos = float("inf"), None
+    for y in range(gray.shape[0] - th + 1):
+        for x in range(gray.shape[1] - tw + 1):
+            diff = np.sum(np.abs(gray[y:y + th, x:x + tw].astype(int) - tpl))
+            if diff < best_score:
+                best_score, best_pos = diff, (x, y)
+    return best_pos
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    with_loop = "--with-loop" in sys.argv
+    folder = Path(args[0]) if args else Path(__file__).resolve().parent / "parcels"
+    files = sorted(folder.glob("*.png"))
+    matcher = get_template_matcher()
+    print(f"{len(files)} screenshots in {folder}, template {matcher.template_path.name} "
+          f"(backend: {'cv2.matchTemplate' if cv2 is not None else 'FFT'}, threshold {matcher.threshold})")
+    total = 0.0
+    for f in files:
+        gray = _to_gray(Image.open(f))
+        t0 = time.perf_counter()
+        box, m = matcher.locate_popup(gray)
+        elapsed = time.perf_counter() - t0
+        total += elapsed
+        found = f"{box} score {m.score:.3f} scale {m.scale}" if m else "no match"
+        line = f"  {f.name:<22} {gray.shape[1]}x{gray.shape[0]}  {1000 * elapsed:6.1f} ms  {found}"
+        if with_loop:
+            t0 = time.perf_counter()
+            pos = _legacy_sad_match(gray, _to_gray(Image.open(matcher.template_path)))
+            line += f"  | loop {time.perf_counter() - t0:.1f}s at {pos}"
+        print(line)
+    if files:
+        print(f"Total: {total:.3f}s ({1000 * total / len(files):.1f} ms per screenshot)")
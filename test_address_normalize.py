@@ -0,0 +1,62 @@
+"""Test the shared address normalization rules"""
+import os
+import sys
+import time
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from address_normalize import (address_key, extract_zip, match_key, normalize, normalize_many,
+                               strip_unit, strip_units)
+
+print("=" * 60)
+print("strip_unit removes the unit and keeps city/state")
+cases = {
+    "2207 W. RAYE ST #503, Seattle, WA 98199": "2207 W. RAYE ST, Seattle, WA 98199",
+    "1017 E HARRISON ST #A, Seattle, WA 98102": "1017 E HARRISON ST, Seattle, WA 98102",
+    "123 Main St Apt. 4B, Seattle, WA 98101": "123 Main St, Seattle, WA 98101",
+    "123 Main St, Apt 302, Seattle, WA 98101": "123 Main St, Seattle, WA 98101",
+    "123 Main St 334, Seattle, WA": "123 Main St, Seattle, WA",
+    "123 Main St - 00A, Seattle, WA": "123 Main St, Seattle, WA",
+    "500 Aurora Ave N A101": "500 Aurora Ave N",
+    "100 Stewart St Suite 12, Seattle, WA": "100 Stewart St, Seattle, WA",
+    "123 Highway 99, Seattle, WA": "123 Highway 99, Seattle, WA",
+    "12 Floor St, Town, WA": "12 Floor St, Town, WA",
+    "1 Fl Way #2": "1 Fl Way",
+    "400 Suite Ave Apt 3, Town, WA": "400 Suite Ave, Town, WA",
+    "123 Main St Floor 3, Seattle, WA": "123 Main St, Seattle, WA",
+}
+for raw, expected in cases.items():
+    assert strip_unit(raw) == expected, (raw, strip_unit(raw))
+assert strip_unit("The Maverick, 123 Main St Unit 5, Seattle, WA") == "The Maverick, 123 Main St, Seattle, WA"
+assert strip_unit("The Maverick, 123 Main St Unit 5, Seattle, WA", drop_name=True) == "123 Main St, Seattle, WA"
+assert strip_unit("") == "" and strip_unit(None) is None
+print("✅ units stripped")
+
+print("=" * 60)
+print("Canonical key, city/state/ZIP")
+n = normalize("Celebrity Place, 4225 11th Avenue Northeast Apt 2B, Seattle, WA 98105-1234, USA")
+assert (n.name, n.unit, n.city, n.state, n.zip, n.key) == (
+    "Celebrity Place", "2B", "SEATTLE", "WA", "98105", "4225 11TH AVE NE"), n
+assert address_key("4225 11TH AVE NE #3") == n.key
+assert normalize("1 Fl Way #2").unit == "2" and normalize("12 Floor St").unit is None
+assert extract_zip("123 Main St, Seattle, 98101") == "98101"
+assert extract_zip("98101 Main St, Seattle, WA") is None, "a house number is not a ZIP"
+assert match_key("4225 11th Avenue NE, Seattle, WA 98105, USA") == match_key("4225 11th Ave NE #3, Seattle, WA 98105")
+print("✅ parsed")
+
+print("=" * 60)
+print("Batch API and LRU cache")
+addresses = [f"{100 + i % 500} Main Street Apt {i}, Seattle, WA 98101" for i in range(20000)]
+normalize.cache_clear()
+t0 = time.perf_counter()
+results = normalize_many(addresses)
+first = time.perf_counter() - t0
+t0 = time.perf_counter()
+strip_units(addresses)
+again = time.perf_counter() - t0
+assert len(results) == len(addresses) and len({r.key for r in results}) == 500
+assert normalize.cache_info().hits >= len(addresses)
+print(f"✅ {len(addresses)} addresses: {1000 * first:.1f} ms parsed, {1000 * again:.1f} ms from cache")
+
+print("\nAll address normalization tests passed")
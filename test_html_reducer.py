@@ -0,0 +1,45 @@
+"""Test the HTML reducer's card detection and chunking"""
+import os
+import sys
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html_reducer import merge_chunk_listings, reduce_listing_html
+
+
+def article(i):
+    return f'<article><a href="/l/{i}">Unit {i}</a><p>${1000 + i}/mo, 2 bd 1 ba, Seattle</p></article>'
+
+
+print("=" * 60)
+print("Real cards are chunked on card boundaries")
+page = ('<html><body><main><script>var x = 1;</script>'
+        + "".join(f'<div class="listing-item" style="x"><a href="/l/{i}">Unit {i}</a> $1{i:03d}</div>' for i in range(30))
+        + "</main></body></html>")
+chunks, stats = reduce_listing_html(page, max_chunk_chars=400)
+assert stats["cards"] == 30 and stats["chunks"] > 1, stats
+assert all(c.startswith("<div>") and c.endswith("</div>") for c in chunks), chunks
+assert "script" not in "".join(chunks) and 'style="' not in "".join(chunks)
+print(f"✅ {stats['cards']} cards in {stats['chunks']} chunks")
+
+print("=" * 60)
+print("Menu entries matching a card selector don't replace the listings")
+page = ('<html><body><main>'
+        '<div class="menu-item"><a href="/">Home</a></div><div class="menu-item"><a href="/a">About</a></div>'
+        + "".join(article(i) for i in range(30))
+        + "</main></body></html>")
+chunks, stats = reduce_listing_html(page)
+text = "".join(chunks)
+assert stats["cards"] == 0, stats
+assert all(f'href="/l/{i}"' in text for i in range(30)), text[:200]
+print(f"✅ all 30 listings kept ({stats['chars_after']} chars)")
+
+print("=" * 60)
+print("Chunk results merge without repeats")
+merged = merge_chunk_listings([[{"listing_website": "a"}, {"listing_website": "b"}],
+                               [{"listing_website": "b"}, {"full_address": "1 Main St"}, {}]])
+assert [m.get("listing_website") for m in merged] == ["a", "b", None, None]
+print("✅ merged")
+
+print("\nAll HTML reducer tests passed")
@@ -0,0 +1,105 @@
+"""Test the LLM response cache, including against a fake OpenAI endpoint"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+tmp = tempfile.mkdtemp()
+os.environ["LLM_CACHE_PATH"] = str(Path(tmp) / "llm_cache.sqlite")
+
+from llm_cache import LLMCache, cache_key, get_llm_cache
+
+print("=" * 60)
+print("LLMCache get/put, TTL and size eviction")
+cache = LLMCache(Path(tmp) / "unit.sqlite", ttl=3600, max_bytes=2000)
+k1 = cache_key("gpt-4o-mini", "v1", "<div>a</div>")
+assert k1 == cache_key("gpt-4o-mini", "v1", "<div>a</div>")
+assert k1 != cache_key("gpt-4o-mini", "v2", "<div>a</div>"), "prompt version must change the key"
+assert k1 != cache_key("gpt-4o", "v1", "<div>a</div>"), "model must change the key"
+assert cache.get(k1) is None
+cache.put(k1, [{"title": "A"}])
+assert cache.get(k1) == [{"title": "A"}]
+
+cache.ttl = 1
+time.sleep(1.1)
+assert cache.get(k1) is None, "expired entry should miss"
+cache.ttl = 3600
+
+for i in range(40):
+    cache.put(f"k{i}", {"blob": "x" * 100})
+cache.get("k39")
+cache.evict()
+st = cache.stats()
+assert st["bytes"] <= 2000, st
+assert cache.get("k39") is not None, "recently used entry should survive eviction"
+assert cache.get("k0") is None, "oldest entry should be evicted"
+print(f"✅ {st}")
+
+# Fake OpenAI: POST /v1/chat/completions returns one listing, counting calls
+calls = []
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        calls.append(body.get("model"))
+        content = json.dumps([{"listing_website": "https://example.com/l/1", "title": "Unit 1", "price": "$1,500"}])
+        payload = json.dumps({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_fake_endpoint_test():
+    """Daily processor extraction against a local fake OpenAI server"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-test"
+
+    print("=" * 60)
+    print("Daily processor chunk extraction hits the API once, then the cache")
+    from process_daily_captures import _extract_chunk_with_ai
+
+    chunk = '<div><a href="https://example.com/l/1">Unit 1</a><span>$1,500</span></div>'
+    first = _extract_chunk_with_ai(chunk, "networks_1.html")
+    second = _extract_chunk_with_ai(chunk, "networks_1.html")
+    assert first == second and first[0]["title"] == "Unit 1", (first, second)
+    assert len(calls) == 1, f"expected 1 API call, got {len(calls)}"
+    _extract_chunk_with_ai(chunk + "<p>changed</p>", "networks_1.html")
+    assert len(calls) == 2, "changed input must miss the cache"
+    print(f"✅ API calls: {len(calls)}, cache: {get_llm_cache().stats()}")
+
+    server.shutdown()
+
+
+try:
+    import openai  # noqa: F401
+    HAVE_OPENAI = True
+except ImportError:
+    HAVE_OPENAI = False
+
+if HAVE_OPENAI:
+    run_fake_endpoint_test()
+else:
+    print("\n⚠ openai package not installed, skipping fake endpoint test")
+
+print("\nAll LLM cache tests passed")
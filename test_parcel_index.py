@@ -0,0 +1,83 @@
+"""Test the offline parcel index with small CSV and DBF exports"""
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from parcel_index import ParcelIndex, address_key
+
+
+def write_dbf(path, fields, rows):
+    """Minimal dBase III writer (character fields only)"""
+    header_len = 32 + 32 * len(fields) + 1
+    record_len = 1 + sum(length for _, length in fields)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<B3xIHH20x", 3, len(rows), header_len, record_len))
+        for name, length in fields:
+            f.write(struct.pack("<11sc4xB15x", name.encode(), b"C", length))
+        f.write(b"\r")
+        for row in rows:
+            f.write(b" " + b"".join(str(v).ljust(length).encode("latin-1") for v, (_, length) in zip(row, fields)))
+        f.write(b"\x1a")
+
+
+print("=" * 60)
+print("address_key normalizes Google and assessor spellings the same way")
+assert address_key("4225 11th Avenue Northeast #3, Seattle, WA 98105, USA") == "4225 11TH AVE NE"
+assert address_key("Celebrity Place, 4225 11TH AVE NE Apt 2B") == "4225 11TH AVE NE"
+assert address_key("100 Stewart St") == "100 STEWART ST", "street names starting with STE are not units"
+print("✅ normalized")
+
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    index = ParcelIndex(tmp / "index.sqlite")
+
+    print("=" * 60)
+    print("CSV import, then a second file fills in missing columns")
+    (tmp / "address.csv").write_text(
+        "PIN,ADDR_FULL,CTYNAME,ZIP5,PREUSE_DESC,PROP_NAME,KCTP_NAME,APPRLNDVAL,APPR_IMPR,LOTSQFT,LEVYCODE\n"
+        "1142000875,4225 11TH AVE NE,SEATTLE,98105,Apartment,CELEBRITY PLACE 2,CLASSIC PROPERTIES LLC,1000000,1473000,\"4,120\",0013\n"
+        "2000000010,100 MAIN ST,KENT,98032,Retail,,,,,,\n"
+        "3000000010,100 MAIN ST,AUBURN,98002,Retail,,,,,,\n"
+        "4000000010,500 PINE ST,SEATTLE,98101,Condominium,,,,,,\n"
+        "4000000020,500 PINE ST,SEATTLE,98101,Condominium,,,,,,\n", encoding="utf-8")
+    (tmp / "EXTR_AptComplex.csv").write_text(
+        "Major,Minor,NbrUnits,NbrBldgs,ComplexDescr\n114200,0875,8,1,IGNORED NAME\n", encoding="utf-8")
+    assert index.import_file(tmp / "address.csv") == 5
+    assert index.import_file(tmp / "EXTR_AptComplex.csv") == 1
+    record = index.lookup("4225 11th Ave NE, Seattle, WA 98105, USA")
+    assert record["parcel_number"] == "1142000875", record
+    assert record["appraised_value"] == "2473000" and record["lot_area"] == "4120", record
+    assert record["num_units"] == "8" and record["num_buildings"] == "1", record
+    assert record["property_name"] == "CELEBRITY PLACE 2", "existing values are kept"
+    print("✅ merged by parcel_number")
+
+    print("=" * 60)
+    print("Ambiguous addresses fall back unless the city decides")
+    assert index.lookup("100 Main Street, Kent, WA 98032, USA")["parcel_number"] == "2000000010"
+    assert index.lookup("100 Main St") is None, "same street in two cities"
+    assert index.lookup("500 Pine St, Seattle, WA 98101, USA") is None, "condo: several parcels"
+    assert index.lookup("1 Nowhere Rd, Seattle, WA") is None
+    assert index.stats()["hits"] == 2 and index.stats()["ambiguous"] == 2, index.stats()
+    print("✅ only unique matches are answered locally")
+
+    print("=" * 60)
+    print("Shapefile attribute table (.dbf)")
+    write_dbf(tmp / "parcels.dbf", [("PIN", 10), ("ADDR_FULL", 30), ("CTYNAME", 20)],
+              [("5000000010", "77 W HARRISON ST", "SEATTLE")])
+    assert index.import_file(tmp / "parcels.shp") == 1
+    assert index.lookup("77 West Harrison Street, Seattle, WA 98119, USA")["parcel_number"] == "5000000010"
+    print("✅ DBF imported")
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index.lookup("4225 11th Ave NE, Seattle, WA 98105, USA")
+    print(f"\n⏱️ lookup: {(time.perf_counter() - t0) * 1000:.0f} µs per address")
+    index._conn.close()  # Windows can't remove an open database file
+
+print("\nAll parcel index tests passed")
@@ -0,0 +1,63 @@
+"""Test the parcel image manifest on a temporary folder"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from parcel_manifest import ParcelManifest, image_key, PENDING, EXTRACTED, LINKED, SKIPPED
+
+with tempfile.TemporaryDirectory() as tmp:
+    folder = Path(tmp) / "parcels"
+    folder.mkdir()
+    for name in ("parcels_1.png", "parcels_2_processed.png", "parcels_3_skipped.png", "DEBUG_4.png"):
+        (folder / name).write_bytes(b"png")
+    manifest = ParcelManifest(Path(tmp) / "manifest.sqlite")
+
+    print("=" * 60)
+    print("sync imports existing files once, legacy renames keep their state")
+    assert image_key("x/parcels_2_processed.png") == "parcels_2.png"
+    assert manifest.sync(folder) == 3
+    assert manifest.sync(folder) == 0, "unchanged folder should not be rescanned"
+    assert manifest.counts() == {PENDING: 1, EXTRACTED: 1, SKIPPED: 1}, manifest.counts()
+    assert manifest.pending() == [folder / "parcels_1.png"]
+    print("✅ synced")
+
+    print("=" * 60)
+    print("capture / extract / link, and re-extraction is idempotent")
+    (folder / "parcels_5.png").write_bytes(b"png")
+    manifest.capture(folder / "parcels_5.png")
+    assert [p.name for p in manifest.pending()] == ["parcels_1.png", "parcels_5.png"]
+    manifest.mark_extracted(folder / "parcels_5.png", {"parcel_number": "1142000875"})
+    assert manifest.unlinked() == [{"image": "parcels_5.png", "google_addresses_id": 5, "parcel_number": "1142000875"}]
+    assert manifest.extracted_ids() == [2, 5], "legacy _processed images are link candidates too"
+    manifest.mark_linked(folder / "parcels_5.png", 77)
+    manifest.mark_extracted(folder / "parcels_5.png", {"parcel_number": "1142000875"})
+    assert manifest.counts()[LINKED] == 1 and manifest.unlinked() == [] and manifest.extracted_ids() == [2]
+    manifest.capture(folder / "parcels_5.png")
+    assert folder / "parcels_5.png" in manifest.pending(), "a re-capture is pending again"
+    print("✅ statuses tracked")
+
+    print("=" * 60)
+    print("openai_batch_*.json files are imported once")
+    batch = folder / "openai_batch_20250101_1.json"
+    batch.write_text(json.dumps([{"google_addresses_id": 9, "parcel_number": "42"}, {"parcel_number": None}]))
+    assert manifest.import_batch_json(folder) == 1
+    assert manifest.import_batch_json(folder) == 0
+    assert {"image": "parcels_9.png", "google_addresses_id": 9, "parcel_number": "42"} in manifest.unlinked()
+    print("✅ JSON imported once")
+
+    print("=" * 60)
+    print("pending() on a large manifest")
+    manifest.register((folder / f"parcels_{i}_processed.png" for i in range(1000, 21000)), EXTRACTED)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        manifest.pending()
+    print(f"✅ pending() with 20k rows: {1000 * (time.perf_counter() - t0) / 20:.2f} ms")
+    manifest._conn.close()  # Windows can't remove an open database file
+
+print("\nAll manifest tests passed")
@@ -0,0 +1,74 @@
+"""Test the staged parcel pipeline with fake OCR/extract/save stages"""
+import os
+import sys
+import threading
+import time
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from parcel_pipeline import StagePipeline
+
+print("=" * 60)
+print("Stages run concurrently, bad items are dropped, sink gets batches")
+saved, batches = [], []
+peak = {"ocr": 0}
+active = {"ocr": 0}
+lock = threading.Lock()
+
+
+def fake_ocr(item):
+    with lock:
+        active["ocr"] += 1
+        peak["ocr"] = max(peak["ocr"], active["ocr"])
+    time.sleep(0.05)
+    with lock:
+        active["ocr"] -= 1
+    if item == 3:
+        raise ValueError("unreadable popup")
+    return item, f"text {item}"
+
+
+def fake_extract(item):
+    n, text = item
+    time.sleep(0.02)
+    return None if n == 5 else {"id": n, "raw_text": text}
+
+
+def fake_save(batch):
+    batches.append(len(batch))
+    saved.extend(batch)
+
+
+pipe = StagePipeline([("ocr", fake_ocr, 3), ("extract", fake_extract, 2)], fake_save,
+                     queue_size=2, batch_size=4, batch_wait=0.2)
+start = time.time()
+for i in range(12):
+    assert pipe.submit(i)
+submit_time = time.time() - start
+pipe.close()
+assert pipe.join(timeout=10), "pipeline did not finish"
+print(f"  {pipe.summary()}")
+ids = sorted(r["id"] for r in saved)
+assert ids == [i for i in range(12) if i not in (3, 5)], ids
+assert peak["ocr"] > 1, "OCR stage should run items in parallel"
+assert max(batches) <= 4 and sum(batches) == 10, batches
+prog = pipe.progress()
+assert prog["ocr"]["failed"] == 1 and prog["ocr"]["done"] == 11, prog
+assert prog["save"]["done"] == 10, prog
+print(f"✅ saved {len(saved)} in batches {batches}, OCR peak concurrency {peak['ocr']}")
+
+print("=" * 60)
+print("Backpressure: submit waits when the first stage is full, cancel stops it")
+gate = threading.Event()
+slow = StagePipeline([("ocr", lambda x: gate.wait() and x, 1)], lambda b: None, queue_size=1)
+assert slow.submit(1) and slow.submit(2)  # one in the worker, one queued
+t0 = time.time()
+cancelled = not slow.submit(3, cancel=lambda: time.time() - t0 > 0.6)
+assert cancelled and time.time() - t0 >= 0.5, "submit should block on a full queue"
+gate.set()
+slow.close()
+assert slow.join(timeout=5)
+print("✅ submit blocked until cancelled")
+
+print("\nAll pipeline tests passed")
@@ -0,0 +1,78 @@
+"""Test public-URL verification of uploaded images against a local stub HTTP server"""
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config_sftp import verify_public_urls, SFTPDirSync, SFTPSyncManifest
+
+# Stub "public site": serves /img/ok_*.jpg, 404s everything else, rejects HEAD on /img/nohead_*
+class StubHandler(BaseHTTPRequestHandler):
+    def _status(self):
+        name = self.path.rsplit("/", 1)[-1]
+        return 200 if name.startswith(("ok_", "nohead_")) else 404
+
+    def do_HEAD(self):
+        if "nohead_" in self.path:
+            self.send_response(405)
+        else:
+            self.send_response(self._status())
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_response(self._status())
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePool:
+    host, port = "stub", 0
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}/img"
+
+print("=" * 60)
+print("verify_public_urls")
+urls = [f"{base}/ok_{i}.jpg" for i in range(20)] + [f"{base}/missing.jpg", f"{base}/nohead_1.jpg"]
+statuses = verify_public_urls(urls, max_workers=4)
+assert all(statuses[u] == 200 for u in urls[:20]), statuses
+assert statuses[f"{base}/missing.jpg"] == 404
+assert statuses[f"{base}/nohead_1.jpg"] == 200, "HEAD 405 should fall back to GET"
+assert verify_public_urls(["http://127.0.0.1:1/x.jpg"])["http://127.0.0.1:1/x.jpg"] is None
+print(f"✅ {len(statuses)} URLs checked")
+
+print("=" * 60)
+print("SFTPDirSync.verify marks failures for re-upload")
+with tempfile.TemporaryDirectory() as tmp:
+    local = Path(tmp) / "img"
+    local.mkdir()
+    files = []
+    for name in ("ok_a.jpg", "ok_b.jpg", "broken.jpg"):
+        (local / name).write_bytes(b"x" * 10)
+        files.append(local / name)
+
+    manifest = SFTPSyncManifest(Path(tmp) / "manifest.json")
+    syncer = SFTPDirSync(FakePool(), local, "/remote/img", manifest=manifest, reconcile_every=0)
+    syncer.manifest.target(syncer.key)["last_reconcile"] = 0
+    syncer.mark_uploaded(files)
+
+    report = syncer.verify(files, base)
+    assert report["checked"] == 3 and report["ok"] == 2, report
+    assert report["failed"] == [(f"{base}/broken.jpg", 404)], report
+
+    # Only the broken file is pending again
+    pending = syncer.pending(files)
+    assert [p.name for p, _ in pending] == ["broken.jpg"], pending
+    print(f"✅ pending after verify: {[p.name for p, _ in pending]}")
+
+server.shutdown()
+print("\nAll verification tests passed")
@@ -0,0 +1,84 @@
+"""Test token-sized, concurrent vision batches with a fake extractor"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from vision_batcher import VisionBatcher, align_records
+
+images = sorted((Path(__file__).parent / "parcels").glob("*.png"))
+assert len(images) >= 4, "needs the sample screenshots in parcels/"
+
+print("=" * 60)
+print("align_records: by image_index, by position, or not at all")
+assert align_records([{"image_index": 2, "parcel_number": "b"}], 2) == [None, {"image_index": 2, "parcel_number": "b"}]
+assert align_records([{"parcel_number": "a"}, {"parcel_number": "b"}], 2)[1]["parcel_number"] == "b"
+assert align_records([{"parcel_number": "a"}], 2) == [None, None]
+assert align_records("not a list", 1) == [None]
+print("✅ records aligned")
+
+print("=" * 60)
+print("Batches follow the token budget, run concurrently, and only misses are retried")
+lock = threading.Lock()
+sizes, saved, active, peak = [], [], [0], [0]
+calls = {}
+
+
+def fake_extract(paths, batch_num, prepared):
+    with lock:
+        sizes.append(sum(p.tokens for p in prepared))
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+    time.sleep(0.1)
+    records = []
+    for i, p in enumerate(paths, 1):
+        with lock:
+            calls[p.name] = calls.get(p.name, 0) + 1
+            first_try = calls[p.name] == 1
+        # The first image is missed once, the second is never readable
+        if p == images[0] and first_try or p == images[1]:
+            continue
+        records.append({"image_index": i, "parcel_number": p.stem})
+    with lock:
+        active[0] -= 1
+    return records
+
+
+def fake_save(batch_num, paths, records):
+    assert [p.stem for p in paths] == [r["parcel_number"] for r in records]
+    with lock:
+        saved.extend(paths)
+
+
+batcher = VisionBatcher(fake_extract, fake_save, max_tokens=2300, max_images=10,
+                        concurrency=3, rate_per_min=0, max_wait=60, max_attempts=2)
+batcher.add(images)
+assert batcher.close(timeout=30), "batcher did not finish"
+print(f"  {batcher.summary()}, image tokens per request {sizes}")
+assert max(sizes) <= 2300, sizes
+assert peak[0] > 1, "requests should overlap"
+assert sorted(saved) == sorted(images[0:1] + images[2:]), saved
+assert calls[images[0].name] == 2 and calls[images[1].name] == 2, calls
+assert all(calls[p.name] == 1 for p in images[2:]), "successful images must not be resent"
+assert batcher.failed == [images[1]], batcher.failed
+print("✅ misses retried alone, unreadable image reported after max attempts")
+
+print("=" * 60)
+print("A partial batch is sent once it has waited max_wait")
+sent = []
+lazy = VisionBatcher(lambda paths, n, prepared: sent.append(len(paths)) or
+                     [{"parcel_number": p.stem} for p in paths], lambda *a: None,
+                     max_tokens=100000, max_images=25, concurrency=1, rate_per_min=0, max_wait=1.5)
+lazy.add(images[:2])
+time.sleep(0.5)
+assert sent == [], "should wait for more images"
+time.sleep(2.0)
+assert sent == [2], sent
+assert lazy.close(timeout=5)
+print("✅ partial batch flushed after max_wait")
+
+print("\nAll vision batcher tests passed")
@@ -1,11 +1,42 @@
 """
 Track API usage for OpenAI and Google APIs
-Logs all API calls to database for expense tracking
+Logs all API calls to database for expense tracking.
+Rows are queued and written by a background thread in multi-row inserts;
+when the database is unreachable they are spooled to a local file and
+replayed on the next successful flush.
 """
 
 import mysql.connector
 from datetime import datetime
+from pathlib import Path
+import atexit
 import json
+import os
+import queue
+import threading
+import time
+
+# Flush queued rows every FLUSH_INTERVAL_SEC seconds or FLUSH_MAX_EVENTS rows
+FLUSH_INTERVAL_SEC = float(os.getenv("API_LOG_FLUSH_SEC", "5"))
+FLUSH_MAX_EVENTS = int(os.getenv("API_LOG_FLUSH_EVENTS", "50"))
+# After a failed flush, wait this long before retrying spooled rows on their own
+RETRY_AFTER_SEC = float(os.getenv("API_LOG_RETRY_SEC", "60"))
+SPOOL_PATH = Path(os.getenv("API_LOG_SPOOL_PATH", str(Path(__file__).resolve().parent / "Captures" / "api_usage_spool.jsonl")))
+
+OFFTA_LOCAL_DB = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "database": "offta_local",
+}
+
+
+def _db_config(target):
+    """Connection settings per log target: offta_local (api_calls) or hud (api_call_log)"""
+    if target == "hud":
+        from config_hud_db import DB_CONFIG
+        return DB_CONFIG
+    return OFFTA_LOCAL_DB
 
 # Pricing constants (as of 2025)
 OPENAI_PRICING = {
@@ -24,6 +55,153 @@ GOOGLE_PRICING = {
 }
 
 
+class ApiUsageWriter:
+    """Background writer for API usage rows.
+
+    Rows carry their own timestamp so spooled rows keep the time of the call.
+    log() only queues; a daemon thread groups rows by (target, table, columns)
+    and writes each group with one executemany (a multi-row INSERT).
+    Connections are kept open between flushes. Rows that cannot be written
+    are appended to SPOOL_PATH and retried first on the next flush.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL_SEC, max_events=FLUSH_MAX_EVENTS, spool_path=SPOOL_PATH):
+        self.interval = interval
+        self.max_events = max_events
+        self.spool_path = Path(spool_path)
+        self._queue = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._conns = {}
+        self._retry_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="api-usage-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, target, table, row):
+        self._queue.put((target, table, row))
+        if self._queue.qsize() >= self.max_events:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            # Nothing new and the DB failed recently: leave the spool alone for now
+            if self._queue.empty() and time.time() < self._retry_at:
+                continue
+            self.flush()
+
+    def _connection(self, target):
+        conn = self._conns.get(target)
+        if conn is not None:
+            try:
+                conn.ping(reconnect=True, attempts=1, delay=0)
+                return conn
+            except Exception:
+                self._conns.pop(target, None)
+        conn = mysql.connector.connect(**_db_config(target), connect_timeout=10)
+        self._conns[target] = conn
+        return conn
+
+    def _read_spool(self):
+        rows = []
+        if self.spool_path.exists():
+            try:
+                with open(self.spool_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            rows.append(tuple(json.loads(line)))
+                self.spool_path.unlink()
+            except Exception as e:
+                print(f"[API Track] Could not read spool {self.spool_path}: {e}")
+        return rows
+
+    def _spool(self, rows):
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for target, table, row in rows:
+                    f.write(json.dumps([target, table, row], default=str) + "\n")
+            print(f"[API Track] Database unavailable, spooled {len(rows)} rows to {self.spool_path.name}")
+        except Exception as e:
+            print(f"[API Track] Lost {len(rows)} usage rows (spool failed: {e})")
+
+    def flush(self):
+        """Write everything queued (plus any spooled rows). Returns rows written."""
+        with self._flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = self._read_spool() + rows
+            if not rows:
+                return 0
+
+            groups = {}
+            for target, table, row in rows:
+                cols = tuple(row.keys())
+                groups.setdefault((target, table, cols), []).append((target, table, row))
+
+            written, failed = 0, []
+            for (target, table, cols), items in groups.items():
+                try:
+                    conn = self._connection(target)
+                    cursor = conn.cursor()
+                    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+                    cursor.executemany(sql, [tuple(r[c] for c in cols) for _, _, r in items])
+                    conn.commit()
+                    cursor.close()
+                    written += len(items)
+                except Exception as e:
+                    print(f"[API Track] Flush to {target}.{table} failed: {e}")
+                    self._conns.pop(target, None)
+                    failed.extend(items)
+            if failed:
+                self._spool(failed)
+                self._retry_at = time.time() + RETRY_AFTER_SEC
+            return written
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 5)
+        self.flush()
+        for conn in self._conns.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._conns.clear()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ApiUsageWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def log_api_row(target, table, row):
+    """Queue one usage row for the background writer (never blocks on the DB)"""
+    _get_writer().log(target, table, row)
+
+
+def flush_api_usage():
+    """Write queued usage rows now"""
+    if _writer is not None:
+        return _writer.flush()
+    return 0
+
+
 def log_openai_call(model, input_tokens, output_tokens, endpoint="chat.completions", metadata=None):
     """
     Log an OpenAI API call to the database
@@ -36,38 +214,22 @@ def log_openai_call(model, input_tokens, output_tokens, endpoint="chat.completio
         metadata: Optional dict with additional info
     """
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="offta_local"
-        )
-        cursor = conn.cursor()
-        
         # Calculate cost
         pricing = OPENAI_PRICING.get(model, {"input": 0.01 / 1000, "output": 0.03 / 1000})
         cost = (input_tokens * pricing["input"]) + (output_tokens * pricing["output"])
         total_tokens = input_tokens + output_tokens
         
-        # Insert record
-        cursor.execute("""
-            INSERT INTO api_calls 
-            (service, endpoint, tokens_used, input_tokens, output_tokens, model, cost_usd, metadata)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            "openai",
-            endpoint,
-            total_tokens,
-            input_tokens,
-            output_tokens,
-            model,
-            cost,
-            json.dumps(metadata) if metadata else None
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        log_api_row("offta_local", "api_calls", {
+            "service": "openai",
+            "endpoint": endpoint,
+            "call_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "tokens_used": total_tokens,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "model": model,
+            "cost_usd": cost,
+            "metadata": json.dumps(metadata) if metadata else None,
+        })
         
         print(f"[API Track] OpenAI: {total_tokens:,} tokens (${cost:.6f})")
         return cost
@@ -87,34 +249,18 @@ def log_google_call(endpoint, calls_count=1, metadata=None):
         metadata: Optional dict with additional info
     """
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="offta_local"
-        )
-        cursor = conn.cursor()
-        
         # Calculate cost
         cost_per_call = GOOGLE_PRICING.get(endpoint, 0.01)
         total_cost = cost_per_call * calls_count
         
-        # Insert record
-        cursor.execute("""
-            INSERT INTO api_calls 
-            (service, endpoint, calls_count, cost_usd, metadata)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            "google",
-            endpoint,
-            calls_count,
-            total_cost,
-            json.dumps(metadata) if metadata else None
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        log_api_row("offta_local", "api_calls", {
+            "service": "google",
+            "endpoint": endpoint,
+            "call_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "calls_count": calls_count,
+            "cost_usd": total_cost,
+            "metadata": json.dumps(metadata) if metadata else None,
+        })
         
         print(f"[API Track] Google {endpoint}: {calls_count} calls (${total_cost:.6f})")
         return total_cost
@@ -127,12 +273,9 @@ def log_google_call(endpoint, calls_count=1, metadata=None):
 def get_total_costs():
     """Get total costs for OpenAI and Google APIs"""
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="offta_local"
-        )
+        # Include rows still waiting in the queue
+        flush_api_usage()
+        conn = mysql.connector.connect(**OFFTA_LOCAL_DB)
         cursor = conn.cursor(dictionary=True)
         
         cursor.execute("""
@@ -0,0 +1,172 @@
+"""
+Token-budgeted, concurrent batching for parcel vision extraction
+Images are grouped into requests by their estimated image tokens (and a
+cap on images per request so the answers fit the completion budget)
+instead of a fixed count. Several requests run at once under a shared
+rate limiter. Images the model did not return a parcel for go back into
+the queue on their own and ride along with a later batch. A partial batch
+is sent once its oldest image has waited VISION_BATCH_MAX_WAIT_SEC, and
+close() sends whatever is left.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+from rate_limiter import TokenBucket
+from vision_images import prepare_images
+
+# Image tokens per request (a popup crop is 85, a full screenshot about 1105)
+VISION_BATCH_MAX_TOKENS = int(os.getenv("VISION_BATCH_MAX_TOKENS", "20000"))
+# 25 parcels x ~150 completion tokens stays inside max_tokens=4096
+VISION_BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "25"))
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "3"))
+VISION_RATE_PER_MIN = float(os.getenv("VISION_RATE_PER_MIN", "30"))
+VISION_BATCH_MAX_WAIT_SEC = float(os.getenv("VISION_BATCH_MAX_WAIT_SEC", "120"))
+# Requests an image may be part of before it is reported as failed
+VISION_MAX_ATTEMPTS = int(os.getenv("VISION_MAX_ATTEMPTS", "3"))
+
+_Item = namedtuple("_Item", "prepared attempts added_at")
+
+
+def align_records(records, count: int) -> List[Optional[dict]]:
+    """One record (or None) per image: by image_index when the model gave it, else by position"""
+    out = [None] * count
+    if not isinstance(records, list):
+        return out
+    indexed = [r for r in records if isinstance(r, dict) and r.get("image_index") is not None]
+    if indexed:
+        for r in indexed:
+            try:
+                i = int(r["image_index"]) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= i < count and out[i] is None:
+                out[i] = r
+        return out
+    if len(records) == count:
+        return [r if isinstance(r, dict) else None for r in records]
+    # Can't tell which image an answer belongs to: treat the whole batch as failed
+    return out
+
+
+def _usable(record) -> bool:
+    return isinstance(record, dict) and bool(record.get("parcel_number"))
+
+
+class VisionBatcher:
+    """Queue images and send them as token-sized batches on a worker pool.
+
+    extract(paths, batch_num, prepared) returns the model's records for a
+    batch; on_batch(batch_num, paths, records) gets the images that came
+    back with a parcel, paired with their records.
+    """
+
+    def __init__(self, extract: Callable, on_batch: Callable,
+                 max_tokens: int = VISION_BATCH_MAX_TOKENS, max_images: int = VISION_BATCH_MAX_IMAGES,
+                 concurrency: int = VISION_CONCURRENCY, rate_per_min: float = VISION_RATE_PER_MIN,
+                 max_wait: float = VISION_BATCH_MAX_WAIT_SEC, max_attempts: int = VISION_MAX_ATTEMPTS):
+        self.extract = extract
+        self.on_batch = on_batch
+        self.max_tokens = max(1, max_tokens)
+        self.max_images = max(1, max_images)
+        self.concurrency = max(1, concurrency)
+        self.max_wait = max_wait
+        self.max_attempts = max(1, max_attempts)
+        self.sent = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = []
+        self._bucket = TokenBucket(rate_per_min, burst=self.concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="vision-batch")
+        self._cond = threading.Condition()
+        self._pending: List[_Item] = []
+        self._in_flight = 0
+        self._closing = False
+        threading.Thread(target=self._watch, name="vision-batch-timer", daemon=True).start()
+
+    def add(self, paths: Sequence):
+        """Prepare images (in parallel) and queue them; full batches are sent right away"""
+        prepared = prepare_images(paths)
+        now = time.time()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("batcher is closed")
+            self._pending.extend(_Item(p, 0, now) for p in prepared)
+            self._dispatch()
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Send everything still queued and wait for all requests; True when done"""
+        with self._cond:
+            self._closing = True
+            self._dispatch()
+            done = self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+        self._pool.shutdown(wait=done)
+        return done
+
+    def summary(self) -> str:
+        return (f"{self.sent} requests, {self.succeeded} parcels extracted, "
+                f"{self.retried} image retries, {len(self.failed)} failed")
+
+    def _take_batch(self):
+        """Longest run of queued images within the token and image budget"""
+        batch, tokens = [], 0
+        for item in self._pending:
+            if batch and (len(batch) >= self.max_images or tokens + item.prepared.tokens > self.max_tokens):
+                break
+            batch.append(item)
+            tokens += item.prepared.tokens
+        return batch, tokens
+
+    def _dispatch(self):
+        # Caller holds self._cond. Batches are formed only when a worker is free,
+        # so retried images can join the next one.
+        while self._pending and self._in_flight < self.concurrency:
+            batch, tokens = self._take_batch()
+            full = len(batch) < len(self._pending) or len(batch) >= self.max_images
+            expired = time.time() - min(i.added_at for i in self._pending) >= self.max_wait
+            if not (full or expired or self._closing):
+                return
+            del self._pending[:len(batch)]
+            self._in_flight += 1
+            self.sent += 1
+            self._pool.submit(self._run, self.sent, batch, tokens)
+
+    def _watch(self):
+        """Sends partial batches whose oldest image has waited max_wait"""
+        with self._cond:
+            while not (self._closing and not self._pending and not self._in_flight):
+                self._cond.wait(timeout=1.0)
+                self._dispatch()
+
+    def _run(self, batch_num: int, batch: List[_Item], tokens: int):
+        paths = [i.prepared.path for i in batch]
+        records = []
+        try:
+            self._bucket.acquire()
+            logging.info(f"Vision batch {batch_num}: {len(batch)} images, ~{tokens} image tokens")
+            records = self.extract(paths, batch_num, [i.prepared for i in batch]) or []
+        except Exception as e:
+            logging.error(f"Vision batch {batch_num} failed: {e}", exc_info=True)
+        aligned = align_records(records, len(batch))
+        done = [(item.prepared.path, r) for item, r in zip(batch, aligned) if _usable(r)]
+        missed = [item for item, r in zip(batch, aligned) if not _usable(r)]
+        if done:
+            try:
+                self.on_batch(batch_num, [p for p, _ in done], [r for _, r in done])
+            except Exception as e:
+                logging.error(f"Saving vision batch {batch_num} failed: {e}", exc_info=True)
+        with self._cond:
+            self._in_flight -= 1
+            self.succeeded += len(done)
+            retry = [i._replace(attempts=i.attempts + 1) for i in missed if i.attempts + 1 < self.max_attempts]
+            self.failed.extend(i.prepared.path for i in missed if i.attempts + 1 >= self.max_attempts)
+            self.retried += len(retry)
+            # Retries go first so they are not starved by newer images
+            self._pending[:0] = retry
+            self._dispatch()
+            self._cond.notify_all()
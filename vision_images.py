@@ -0,0 +1,160 @@
+"""
+Image preparation for OpenAI vision batches
+Crops full screenshots to the parcel popup, never sends more pixels than
+the model will look at, and encodes a whole batch in parallel. The vision
+API uses a 512x512 view for detail=low (85 tokens) and, for detail=high,
+fits the image in 2048x2048, scales the short side down to 768 and charges
+85 + 170 tokens per 512px tile. A popup crop fits in 512x512, so it goes
+as detail=low at its captured size; anything larger is pre-resized exactly
+as the API would resize it. estimate_batch() prices a batch before sending.
+"""
+
+import base64
+import io
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from PIL import Image
+
+# low | high | auto (low when the image fits in 512x512, else high)
+VISION_DETAIL = os.getenv("VISION_DETAIL", "auto")
+# Extra downscale for crops; 1.0 keeps the popup text at its captured size
+VISION_SCALE = float(os.getenv("VISION_SCALE", "1.0"))
+VISION_ENCODE_WORKERS = int(os.getenv("VISION_ENCODE_WORKERS", "8"))
+# Expected completion tokens per parcel (one JSON object of 11 short fields)
+OUTPUT_TOKENS_PER_IMAGE = int(os.getenv("VISION_OUTPUT_TOKENS_PER_IMAGE", "150"))
+# Changes whenever preparation changes what the model sees (part of the cache key)
+PREP_SIGNATURE = f"prep-v1:{VISION_DETAIL}:{VISION_SCALE}"
+
+LOW_DETAIL_SIDE = 512
+HIGH_DETAIL_FIT = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+TILE = 512
+# Larger than this is a screenshot, not a popup crop
+POPUP_CROP_MAX_SIDE = 420
+CROP_MARGIN = 5
+
+PreparedImage = namedtuple("PreparedImage", "path data_url width height detail tokens bytes cropped")
+
+
+def image_tokens(width: int, height: int, detail: str) -> int:
+    """Prompt tokens the vision API charges for one image"""
+    if detail == "low":
+        return 85
+    scale = min(1.0, HIGH_DETAIL_FIT / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / TILE) * math.ceil(height / TILE)
+
+
+def _high_detail_size(width: int, height: int):
+    scale = min(1.0, HIGH_DETAIL_FIT / max(width, height))
+    scale *= min(1.0, HIGH_DETAIL_SHORT_SIDE / (min(width, height) * scale))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def crop_to_popup(image: Image.Image):
+    """(popup crop, True) for a screenshot with a detectable popup, else (image, False)"""
+    if max(image.size) <= POPUP_CROP_MAX_SIDE:
+        return image, False
+    import numpy as np
+    from popup_locator import find_popup_box
+    from template_matcher import get_template_matcher
+    gray = np.asarray(image.convert("L"))
+    box, _ = get_template_matcher().locate_popup(gray)
+    if box is None:
+        box = find_popup_box(gray)
+    if box is None:
+        return image, False
+    left, top, right, bottom = box
+    return image.crop((max(0, left - CROP_MARGIN), max(0, top - CROP_MARGIN),
+                       min(image.width, right + CROP_MARGIN + 1), min(image.height, bottom + CROP_MARGIN + 1))), True
+
+
+def prepare_image(path) -> PreparedImage:
+    """Crop, size and base64-encode one image for the vision API"""
+    path = Path(path)
+    image = Image.open(path)
+    image.load()
+    original = image
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image, cropped = crop_to_popup(image)
+    if VISION_SCALE < 1.0:
+        image = image.resize((max(1, round(image.width * VISION_SCALE)), max(1, round(image.height * VISION_SCALE))),
+                             Image.LANCZOS)
+
+    detail = VISION_DETAIL
+    if detail == "auto":
+        detail = "low" if max(image.size) <= LOW_DETAIL_SIDE else "high"
+    if detail == "low" and max(image.size) > LOW_DETAIL_SIDE:
+        image = image.copy()
+        image.thumbnail((LOW_DETAIL_SIDE, LOW_DETAIL_SIDE), Image.LANCZOS)
+    elif detail == "high":
+        size = _high_detail_size(*image.size)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+    if image.size == original.size and not cropped and original.format == "PNG":
+        # Nothing changed: send the file as captured instead of re-encoding it
+        data = path.read_bytes()
+    else:
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        data = buf.getvalue()
+    return PreparedImage(
+        path=path,
+        data_url=f"data:image/png;base64,{base64.b64encode(data).decode('ascii')}",
+        width=image.width,
+        height=image.height,
+        detail=detail,
+        tokens=image_tokens(image.width, image.height, detail),
+        bytes=len(data),
+        cropped=cropped,
+    )
+
+
+def prepare_images(paths: Sequence, workers: int = VISION_ENCODE_WORKERS) -> List[PreparedImage]:
+    """prepare_image for every path in parallel, results in input order"""
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [prepare_image(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        return list(pool.map(prepare_image, paths))
+
+
+def image_content(prepared: PreparedImage) -> Dict:
+    """Chat completions content part for a prepared image"""
+    return {"type": "image_url", "image_url": {"url": prepared.data_url, "detail": prepared.detail}}
+
+
+def estimate_batch(prepared: Sequence[PreparedImage], prompt: str, model: str,
+                   output_tokens_per_image: int = OUTPUT_TOKENS_PER_IMAGE) -> Dict:
+    """Expected tokens and USD cost of one request (text ~4 chars per token)"""
+    try:
+        from track_api_usage import OPENAI_PRICING
+        pricing = OPENAI_PRICING.get(model)
+    except Exception:
+        pricing = None
+    pricing = pricing or {"input": 0.0025 / 1000, "output": 0.01 / 1000}
+    image_tokens_total = sum(p.tokens for p in prepared)
+    input_tokens = len(prompt) // 4 + image_tokens_total
+    output_tokens = output_tokens_per_image * len(prepared)
+    return {
+        "images": len(prepared),
+        "image_tokens": image_tokens_total,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "payload_bytes": sum(len(p.data_url) for p in prepared),
+        "cost": input_tokens * pricing["input"] + output_tokens * pricing["output"],
+    }
+
+
+def format_estimate(est: Dict) -> str:
+    return (f"~{est['input_tokens']:,} input + {est['output_tokens']:,} output tokens, "
+            f"{est['payload_bytes'] / 1024:.0f} KB payload, est. ${est['cost']:.4f}")
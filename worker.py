@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import time, signal, threading, os, uuid
+import time, signal, threading, os, uuid, json, re
+from pathlib import Path
 from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
 
@@ -12,8 +13,8 @@ from config_utils import (
     hud_loader_show, hud_loader_update, hud_loader_hide,
     ensure_dir, log_file,
     # SFTP helpers and config for uploads
-    sftp_upload_dir, SFTP_ENABLED, SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS,
-    REMOTE_IMAGES_PARENT,
+    sftp_upload_file, sftp_upload_dir, sftp_sync_dir, SFTP_ENABLED, SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS,
+    REMOTE_JSON_DIR, REMOTE_IMAGES_PARENT, PUBLIC_IMAGES_URL,
 )
 from config_core import php_url
 from config_utils import ensure_session_before_hud
@@ -34,6 +35,9 @@ except ImportError as e:
 POOL_NAME = "th_poller_pool"
 POOL_SIZE = 2  # Reduced from 5 for faster startup - will expand as needed
 
+# PHP extraction method: "local" (no LLM calls), "auto" (extraction cascade, may call the LLM) or "ai"
+PHP_EXTRACTION_METHOD = os.getenv("PHP_EXTRACTION_METHOD", "local")
+
 db_config = {
     "host": CFG["MYSQL_HOST"],
     "port": CFG["MYSQL_PORT"],
@@ -428,12 +432,63 @@ def update_job_status(conn, job_id: int, status: str,
 def _today_dir_str() -> str:
     return datetime.now().strftime("%Y-%m-%d")
 
+def _php_extract(base_url: str, html_path: str, method: str, model: str,
+                 timeout_sec: int) -> Optional[Dict[str, Any]]:
+    """One headless call of the PHP processor; returns its JSON or None."""
+    params = {
+        "process": "1",
+        "headless": "1",
+        "file": html_path,
+        "method": method,
+        "model": model,
+    }
+    hud_push(f"[PHP] Running headless extraction ({method})...")
+    try:
+        # Headless mode can take a long time, use extended timeout
+        r = requests.get(base_url, params=params, timeout=timeout_sec)
+    except requests.exceptions.Timeout:
+        hud_push(f"[PHP] Timeout after {timeout_sec}s")
+        return None
+    except Exception as e:
+        hud_push(f"[PHP] Request failed: {e}")
+        return None
+    if not r.ok:
+        hud_push(f"[PHP] HTTP {r.status_code}")
+        return None
+    try:
+        return r.json()
+    except Exception as e:
+        hud_push(f"[PHP] Failed to parse result: {e}")
+        return None
+
+def _save_local_listings(html_path: str, listings: List[Dict[str, Any]], tier: str) -> Dict[str, Any]:
+    """Save listings from a Python tier where the PHP processor would (networks_<id>.json next to the
+    HTML), upload JSON and HTML like it does, and return the same result shape."""
+    html_file = Path(html_path)
+    m = re.search(r"networks_(\d+)", html_file.name, re.I)
+    network_id = int(m.group(1)) if m else None
+    for item in listings:
+        item.setdefault("network_id", network_id)
+        item.setdefault("html_filename", html_file.name)
+    save_path = html_file.with_suffix(".json")
+    save_path.write_text(json.dumps(listings, indent=4, ensure_ascii=False), encoding="utf-8")
+    result_data = {"savePath": str(save_path), "listingsCount": len(listings), "method": tier}
+    if SFTP_ENABLED:
+        auth = dict(host=SFTP_HOST, port=SFTP_PORT, user=SFTP_USER, password=SFTP_PASS, remote_dir=REMOTE_JSON_DIR)
+        result_data["sftp"] = {"success": sftp_upload_file(local_path=save_path, **auth)}
+        result_data["htmlSftp"] = {"success": sftp_upload_file(local_path=html_file, **auth)}
+    return {"ok": True, "status": {"status": "done", "result": result_data}}
+
 def run_php_processor_for_html(source_id: Optional[int], html_path: Optional[str] = None,
-                               method: str = "local", model: str = "gpt-4o-mini",
-                               timeout_sec: int = 600) -> Optional[Dict[str, Any]]:
+                               method: str = PHP_EXTRACTION_METHOD, model: str = "gpt-4o-mini",
+                               timeout_sec: int = 600, page_url: str = "") -> Optional[Dict[str, Any]]:
     """
     Fire the PHP processor for a specific HTML file in headless mode and stream status to the HUD.
     Uses headless=1 mode which processes immediately and returns the result.
+    method="auto" runs the extraction cascade: the Python local tiers first (their
+    listings are saved as is when confident), then PHP's local parser, and the LLM
+    (method=ai) only when PHP finds under half of the listings counted on the page.
+    page_url resolves relative links in the Python tiers.
     Returns the final status JSON (dict) on success, or None on failure/timeout.
     """
     try:
@@ -452,33 +507,48 @@ def run_php_processor_for_html(source_id: Optional[int], html_path: Optional[str
         hud_push(f"[PHP] Processing {os.path.basename(html_path)}...")
         base_url = php_url("process_html_with_openai.php")
 
-        # Use headless mode - processes immediately and returns result
-        params = {
-            "process": "1",
-            "headless": "1",
-            "file": html_path,
-            "method": method,
-            "model": model,
-        }
-        
-        hud_push(f"[PHP] Running headless extraction...")
-        try:
-            # Headless mode can take a long time, use extended timeout
-            r = requests.get(base_url, params=params, timeout=timeout_sec)
-        except requests.exceptions.Timeout:
-            hud_push(f"[PHP] Timeout after {timeout_sec}s")
-            return None
-        except Exception as e:
-            hud_push(f"[PHP] Request failed: {e}")
-            return None
-            
-        if not r.ok:
-            hud_push(f"[PHP] HTTP {r.status_code}")
+        tier = method
+        if method == "auto":
+            from extraction_cascade import (run_local_tiers, get_tier_stats, CONFIDENCE_THRESHOLD,
+                                            PHP_LOCAL_MIN_COVERAGE)
+            try:
+                with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+                    local = run_local_tiers(f.read(), page_url or "")
+            except Exception as e:
+                log_file(f"[Cascade] Local extractors failed: {e}")
+                local = {"tier": None, "listings": [], "expected": 0, "confidence": 0.0}
+            expected = local["expected"]
+            hud_push(f"[Cascade] Local: {local['tier'] or 'no match'} "
+                     f"{len(local['listings'])}/{expected} listings, confidence {local['confidence']:.2f}")
+            result = None
+            if local["tier"] and local["confidence"] >= CONFIDENCE_THRESHOLD:
+                try:
+                    result = _save_local_listings(html_path, local["listings"], local["tier"])
+                    tier = local["tier"]
+                except Exception as e:
+                    log_file(f"[Cascade] Saving {local['tier']} listings failed: {e}")
+            if result is None:
+                result = _php_extract(base_url, html_path, "local", model, timeout_sec)
+                if result is None:
+                    return None
+                count = (((result or {}).get("status") or {}).get("result") or {}).get("listingsCount") or 0
+                # The page count is a heuristic: only a clear shortfall is worth an LLM call
+                if count > 0 and count >= PHP_LOCAL_MIN_COVERAGE * expected:
+                    tier = "php-local"
+                else:
+                    hud_push(f"[Cascade] Local parse gave {count} of ~{expected} listings, escalating to {model}")
+                    result = _php_extract(base_url, html_path, "ai", model, timeout_sec)
+                    tier = "llm"
+            stats = get_tier_stats()
+            stats.record(tier)
+            hud_push(f"[Cascade] Resolved by {tier} ({stats.summary()})")
+        else:
+            result = _php_extract(base_url, html_path, method, model, timeout_sec)
+        if result is None:
             return None
 
         # Parse the JSON response
         try:
-            result = r.json()
             # Extract nested result from status
             status = result.get("status", {})
             result_data = status.get("result", {})
@@ -537,8 +607,13 @@ def download_images_from_html(html_path: str, network_id: int) -> None:
         images_dir = IMAGES_DIR
         images_dir.mkdir(parents=True, exist_ok=True)
 
-        downloaded = failed = skipped = 0
+        downloaded = failed = skipped = placeholders = aliased = 0
         first_filename: Optional[str] = None
+
+        # Perceptual-hash filter: drop placeholders, alias repeats of an image we already have
+        from image_phash import get_image_hash_db, link_image_aliases
+        hash_db = get_image_hash_db()
+        remote_img_dir = f"{REMOTE_IMAGES_PARENT.rstrip('/')}/img"
         for idx, item in enumerate(listing_items, 1):
             img_tag = item.find('img', class_=lambda x: x and 'listing-item__image' in x)
             if not img_tag:
@@ -587,9 +662,29 @@ def download_images_from_html(html_path: str, network_id: int) -> None:
             filename = f"{base}.{ext}"
             save_path = images_dir / filename
 
+            verdict, canonical = hash_db.check_url(img_url, remote_img_dir)
+            if verdict == "placeholder":
+                placeholders += 1
+                continue
+            if verdict == "duplicate" and canonical != filename:
+                hash_db.alias(filename, canonical, remote_img_dir)
+                aliased += 1
+                continue
+
             try:
                 resp = requests.get(img_url, timeout=15)
                 if resp.ok:
+                    try:
+                        verdict, canonical = hash_db.check(resp.content, name=filename, url=img_url, remote_dir=remote_img_dir)
+                    except Exception:
+                        verdict = "new"
+                    if verdict == "placeholder":
+                        placeholders += 1
+                        continue
+                    if verdict == "duplicate":
+                        hash_db.alias(filename, canonical, remote_img_dir)
+                        aliased += 1
+                        continue
                     save_path.write_bytes(resp.content)
                     downloaded += 1
                     if not first_filename:
@@ -602,31 +697,40 @@ def download_images_from_html(html_path: str, network_id: int) -> None:
                 failed += 1
                 continue
 
-        hud_push(f"[Images] Complete: {downloaded} downloaded, {failed} failed, {skipped} skipped")
+        hash_db.save()
+        hud_push(f"[Images] Complete: {downloaded} downloaded, {failed} failed, {skipped} skipped, "
+                 f"{placeholders} placeholders, {aliased} aliased")
 
         # Upload the images folder via SFTP
         if SFTP_ENABLED:
             try:
-                hud_push("[Images] Uploading images folder to server…")
+                hud_push("[Images] Syncing images folder to server…")
                 # Upload directly into /home/daniel/trustyhousing.com/app/public/img
-                ok = sftp_upload_dir(
+                # (only files not already recorded in the sync manifest are sent)
+                sync_result = sftp_sync_dir(
                     images_dir,
                     SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS,
                     REMOTE_IMAGES_PARENT,
-                    remote_subdir="img"
+                    remote_subdir="img",
+                    verify_base_url=PUBLIC_IMAGES_URL,
                 )
-                hud_push("[Images] SFTP upload OK → /img" if ok else "[Images] SFTP upload failed")
-                # Quick public URL check for the first file
-                if ok and first_filename:
-                    try:
-                        public_url = f"https://trustyhousing.com/img/{first_filename}"
-                        resp = requests.get(public_url, timeout=10)
-                        if resp.status_code == 200:
-                            hud_push(f"[Images] Verified public: {public_url}")
+                if sync_result is None:
+                    hud_push("[Images] SFTP upload failed")
+                else:
+                    hud_push(f"[Images] SFTP sync OK → /img ({sync_result['uploaded']} sent, {sync_result['unchanged']} unchanged)")
+                    # Every sync, so aliases whose link failed in an earlier run are retried
+                    from config_sftp import get_sftp_pool
+                    pool = get_sftp_pool(SFTP_HOST, SFTP_PORT, SFTP_USER, SFTP_PASS)
+                    linked = link_image_aliases(pool, remote_img_dir)
+                    if linked:
+                        hud_push(f"[Images] Linked {linked} duplicate image(s) on server")
+                    # Public URL check for every file sent; failures are re-uploaded next sync
+                    verify = sync_result.get("verify")
+                    if verify:
+                        if verify["failed"]:
+                            hud_push(f"[Images] Public check: {verify['ok']}/{verify['checked']} OK, {len(verify['failed'])} queued for re-upload")
                         else:
-                            hud_push(f"[Images] Public check HTTP {resp.status_code}: {public_url}")
-                    except Exception as ce:
-                        hud_push(f"[Images] Public check failed: {ce}")
+                            hud_push(f"[Images] Verified public: {verify['ok']}/{verify['checked']} under {PUBLIC_IMAGES_URL}")
             except Exception as e:
                 hud_push(f"[Images] SFTP error: {e}")
         else: